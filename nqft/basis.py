@@ -0,0 +1,454 @@
+"""This module contains the occupation number (bitstring) machinery used to
+build fermionic many-body operators without tensor products.
+
+Conventions
+-----------
+A Fock state of N sites is an integer whose binary string (2N digits) reads
+the occupations of modes (0 up, ..., N-1 up, 0 down, ..., N-1 down) from left
+to right, as in 'Network.get_state'. It splits into an up word (high N bits)
+and a down word (low N bits) in which site i is bit N - 1 - i. Fermionic
+signs follow the same mode order (Jordan-Wigner strings).
+"""
+
+import numpy as np
+from scipy.sparse import coo_matrix, csr_matrix
+
+_M1 = np.uint64(0x5555555555555555)
+_M2 = np.uint64(0x3333333333333333)
+_M4 = np.uint64(0x0f0f0f0f0f0f0f0f)
+_H01 = np.uint64(0x0101010101010101)
+
+
+def popcount(words: np.ndarray) -> np.ndarray:
+    """Counts set bits of unsigned integers ('np.bitwise_count' hardware
+    instruction, or SWAR algorithm for numpy < 2.0).
+
+    Parameters
+    ----------
+    words: np.ndarray, default=None
+        Unsigned integers.
+
+    Returns
+    -------
+    -: np.ndarray[np.int64]
+        Number of set bits of each integer.
+
+    Examples
+    --------
+    >>> popcount(np.array([0, 1, 3, 255], dtype=np.uint64))
+    array([0, 1, 2, 8])
+    """
+    x = np.asarray(words, dtype=np.uint64)
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(x).astype(np.int64)
+
+    return _swar_popcount(x)
+
+
+def _swar_popcount(x: np.ndarray) -> np.ndarray:
+    # Bits are summed in parallel inside 2, 4 and 8 bits fields
+    x = x - ((x >> np.uint64(1)) & _M1)
+    x = (x & _M2) + ((x >> np.uint64(2)) & _M2)
+    x = (x + (x >> np.uint64(4))) & _M4
+
+    return ((x * _H01) >> np.uint64(56)).astype(np.int64)
+
+
+def site_bit(site: int, n_sites: int) -> int:
+    """Bit position of a site inside a spin word.
+
+    Parameters
+    ----------
+    site: int, default=None
+        Site index.
+
+    n_sites: int, default=None
+        Number of sites.
+
+    Returns
+    -------
+    -: int
+    """
+    return n_sites - 1 - site
+
+
+def occupations(words: np.ndarray, n_sites: int) -> np.ndarray:
+    """Occupation numbers of every site of spin words.
+
+    Parameters
+    ----------
+    words: np.ndarray[np.uint64], default=None
+        Spin words.
+
+    n_sites: int, default=None
+        Number of sites.
+
+    Returns
+    -------
+    -: np.ndarray[np.uint8], shape=(len(words), n_sites)
+        Column i is the occupation of site i.
+
+    Examples
+    --------
+    >>> occupations(np.array([0b110, 0b011], dtype=np.uint64), n_sites=3)
+    array([[1, 1, 0],
+           [0, 1, 1]], dtype=uint8)
+    """
+    bits = np.arange(n_sites - 1, -1, -1, dtype=np.uint64)
+    words = np.asarray(words, dtype=np.uint64)
+
+    return ((words[..., None] >> bits) & np.uint64(1)).astype(np.uint8)
+
+
+def hop(words: np.ndarray, dest: int, source: int,
+        n_sites: int) -> tuple[np.ndarray]:
+    """Applies c_dest^dag c_source on spin words.
+
+    Parameters
+    ----------
+    words: np.ndarray[np.uint64], default=None
+        Spin words.
+
+    dest: int, default=None
+        Site on which a fermion is created.
+
+    source: int, default=None
+        Site from which a fermion is destroyed.
+
+    n_sites: int, default=None
+        Number of sites.
+
+    Returns
+    -------
+    allowed, new_words, signs: tuple[np.ndarray], size=3
+        Mask of words on which the hopping acts, resulting words and
+        fermionic signs (for masked words only).
+    """
+    p_d, p_s = site_bit(dest, n_sites), site_bit(source, n_sites)
+    bit_d, bit_s = np.uint64(1 << p_d), np.uint64(1 << p_s)
+
+    allowed = ((words & bit_s) != 0) & ((words & bit_d) == 0)
+    active = words[allowed]
+
+    # Fermions between both modes give the sign of the Jordan-Wigner string
+    low, high = min(p_d, p_s), max(p_d, p_s)
+    between = np.uint64(((1 << high) - 1) ^ ((1 << (low + 1)) - 1))
+    signs = 1 - 2 * (popcount(active & between) & 1)
+
+    return allowed, active ^ (bit_d | bit_s), signs
+
+
+def add_particle(words: np.ndarray, site: int,
+                 n_sites: int) -> tuple[np.ndarray]:
+    """Applies c_site^dag on spin words.
+
+    Parameters
+    ----------
+    words: np.ndarray[np.uint64], default=None
+        Spin words.
+
+    site: int, default=None
+        Site on which a fermion is created.
+
+    n_sites: int, default=None
+        Number of sites.
+
+    Returns
+    -------
+    allowed, new_words, signs: tuple[np.ndarray], size=3
+        Mask of words on which the operator acts, resulting words and
+        fermionic signs coming from the sites of the word that precede
+        'site' (for masked words only).
+    """
+    bit = site_bit(site, n_sites)
+    mask = np.uint64(1 << bit)
+
+    allowed = (words & mask) == 0
+    active = words[allowed]
+    before = np.uint64(((1 << n_sites) - 1) ^ ((1 << (bit + 1)) - 1))
+    signs = 1 - 2 * (popcount(active & before) & 1)
+
+    return allowed, active | mask, signs
+
+
+def remove_particle(words: np.ndarray, site: int,
+                    n_sites: int) -> tuple[np.ndarray]:
+    """Applies c_site on spin words (see 'add_particle').
+
+    Parameters
+    ----------
+    words: np.ndarray[np.uint64], default=None
+        Spin words.
+
+    site: int, default=None
+        Site from which a fermion is destroyed.
+
+    n_sites: int, default=None
+        Number of sites.
+
+    Returns
+    -------
+    allowed, new_words, signs: tuple[np.ndarray], size=3
+    """
+    bit = site_bit(site, n_sites)
+    mask = np.uint64(1 << bit)
+
+    allowed = (words & mask) != 0
+    active = words[allowed]
+    before = np.uint64(((1 << n_sites) - 1) ^ ((1 << (bit + 1)) - 1))
+    signs = 1 - 2 * (popcount(active & before) & 1)
+
+    return allowed, active ^ mask, signs
+
+
+def hopping_matrix(n_sites: int, bonds: list[tuple], words=None,
+                   index=None) -> csr_matrix:
+    """Builds the hopping operator of one spin species,
+
+            sum_bonds amplitude * (c_i^dag c_j + c_j^dag c_i),
+
+    on a basis of spin words.
+
+    Parameters
+    ----------
+    n_sites: int, default=None
+        Number of sites.
+
+    bonds: list[tuple], default=None
+        Bonds as (i, j, amplitude).
+
+    words: np.ndarray[np.uint64], default=all 2^N words
+        Sorted basis of spin words.
+
+    index: callable, default=None
+        Gives the positions of words inside the basis (default uses binary
+        search in 'words').
+
+    Returns
+    -------
+    -: scipy.sparse.csr_matrix, shape=(len(words), len(words))
+    """
+    if words is None:
+        words = np.arange(2**n_sites, dtype=np.uint64)
+    if index is None:
+        def index(targets):
+            return np.searchsorted(words, targets)
+
+    columns = np.arange(words.size)
+    rows, cols, vals = [], [], []
+    for i, j, amplitude in bonds:
+        for dest, source in ((i, j), (j, i)):
+            allowed, new_words, signs = hop(words, dest, source, n_sites)
+            rows.append(index(new_words))
+            cols.append(columns[allowed])
+            vals.append(amplitude * signs)
+
+    dim = words.size
+    if not rows:
+        return csr_matrix((dim, dim))
+
+    matrix = coo_matrix(
+        (np.concatenate(vals).astype(np.float64),
+         (np.concatenate(rows), np.concatenate(cols))), shape=(dim, dim))
+
+    return matrix.tocsr()
+
+
+def binomial_table(n: int) -> np.ndarray:
+    """Pascal triangle of binomial coefficients C(p, m) for p, m <= n.
+
+    Parameters
+    ----------
+    n: int, default=None
+        Largest argument.
+
+    Returns
+    -------
+    -: np.ndarray[np.int64], shape=(n + 1, n + 1)
+    """
+    table = np.zeros((n + 1, n + 1), dtype=np.int64)
+    table[:, 0] = 1
+    for p in range(1, n + 1):
+        table[p, 1:] = table[p - 1, 1:] + table[p - 1, :-1]
+
+    return table
+
+
+def spin_words(n_sites: int, n_particles: int) -> np.ndarray:
+    """Enumerates the spin words of N sites containing a given number of
+    particles, in increasing order (which is also their combinatorial rank
+    order).
+
+    Parameters
+    ----------
+    n_sites: int, default=None
+        Number of sites.
+
+    n_particles: int, default=None
+        Number of particles (set bits).
+
+    Returns
+    -------
+    -: np.ndarray[np.uint64], size=C(N, n_particles)
+    """
+    words = np.arange(2**n_sites, dtype=np.uint64)
+
+    return words[popcount(words) == n_particles]
+
+
+def rank(words: np.ndarray, n_sites: int) -> np.ndarray:
+    """Combinatorial number system rank of spin words: the set bits
+    p_1 < ... < p_n of a word give the index sum_m C(p_m, m) inside the
+    ordered list of words with the same number of particles.
+
+    Parameters
+    ----------
+    words: np.ndarray[np.uint64], default=None
+        Spin words (of any particle numbers).
+
+    n_sites: int, default=None
+        Number of sites.
+
+    Returns
+    -------
+    -: np.ndarray[np.int64]
+        Rank of each word among the words of its particle number.
+
+    Examples
+    --------
+    >>> rank(np.array([0b0011, 0b0101, 0b0110, 0b1001]), n_sites=4)
+    array([0, 1, 2, 3])
+    """
+    table = binomial_table(n_sites)
+    words = np.asarray(words, dtype=np.uint64)
+
+    ranks = np.zeros(words.shape, dtype=np.int64)
+    count = np.zeros(words.shape, dtype=np.int64)
+    for bit in range(n_sites):
+        occupied = ((words >> np.uint64(bit)) & np.uint64(1)).astype(bool)
+        count += occupied
+        ranks += np.where(occupied, table[bit, count], 0)
+
+    return ranks
+
+
+def unrank(ranks: np.ndarray, n_sites: int, n_particles: int) -> np.ndarray:
+    """Inverse of 'rank' for words containing a given number of particles.
+
+    Parameters
+    ----------
+    ranks: np.ndarray[np.int64], default=None
+        Ranks of the words.
+
+    n_sites: int, default=None
+        Number of sites.
+
+    n_particles: int, default=None
+        Number of particles of the words.
+
+    Returns
+    -------
+    -: np.ndarray[np.uint64]
+        Spin words.
+    """
+    table = binomial_table(n_sites)
+    remainder = np.array(ranks, dtype=np.int64)
+
+    words = np.zeros(remainder.shape, dtype=np.uint64)
+    left = np.full(remainder.shape, n_particles, dtype=np.int64)
+    for bit in reversed(range(n_sites)):
+        # Highest remaining bit is the largest p such that C(p, m) <= rank
+        place = (left > 0) & (table[bit, left] <= remainder)
+        remainder -= np.where(place, table[bit, left], 0)
+        words |= place.astype(np.uint64) << np.uint64(bit)
+        left -= place
+
+    return words
+
+
+class Sector:
+    """Basis of the Fock states containing fixed numbers of spin up and spin
+    down fermions. States are ordered as (up word rank, down word rank), so
+    operators acting on one spin species are Kronecker products.
+
+    Attributes
+    ----------
+    n_sites: int, default=None
+        Number of sites.
+
+    n_up: int, default=None
+        Number of spin up fermions.
+
+    n_down: int, default=None
+        Number of spin down fermions.
+    """
+
+    def __init__(self, n_sites: int, n_up: int, n_down: int) -> None:
+        """Sets attributes to given values and enumerates spin words.
+        """
+        self.n_sites = n_sites
+        self.n_up = n_up
+        self.n_down = n_down
+        self.up_words = spin_words(n_sites, n_up)
+        self.down_words = spin_words(n_sites, n_down)
+        return
+
+    def __repr__(self) -> str:
+        return (f"Sector(n_sites={self.n_sites}, n_up={self.n_up}, "
+                f"n_down={self.n_down}, dim={self.dim})")
+
+    @property
+    def dim(self) -> int:
+        """Number of states of the sector.
+        """
+        return self.up_words.size * self.down_words.size
+
+    def index(self, states: np.ndarray) -> np.ndarray:
+        """Positions of Fock states (as 'Network.get_state' integers) inside
+        the sector basis.
+
+        Parameters
+        ----------
+        states: np.ndarray, default=None
+            Integer representations of states belonging to the sector.
+
+        Returns
+        -------
+        -: np.ndarray[np.int64]
+        """
+        states = np.asarray(states, dtype=np.uint64)
+        shift = np.uint64(self.n_sites)
+        up = states >> shift
+        down = states & np.uint64(2**self.n_sites - 1)
+
+        # Ranks of words of other sectors would be wrong but in range
+        outside = (popcount(up) != self.n_up) | (popcount(down) != self.n_down)
+        if np.any(outside):
+            raise ValueError(f"States {states[outside].tolist()} don't "
+                             f"belong to sector {self}")
+
+        return (rank(up, self.n_sites) * self.down_words.size
+                + rank(down, self.n_sites))
+
+    def states(self, indices=None) -> np.ndarray:
+        """Fock states (as 'Network.get_state' integers) at given positions
+        of the sector basis.
+
+        Parameters
+        ----------
+        indices: np.ndarray, default=every state
+            Positions inside the sector basis.
+
+        Returns
+        -------
+        -: np.ndarray[np.uint64]
+        """
+        if indices is None:
+            indices = np.arange(self.dim)
+
+        up_ranks, down_ranks = np.divmod(np.asarray(indices, dtype=np.int64),
+                                         self.down_words.size)
+        up = unrank(up_ranks, self.n_sites, self.n_up)
+        down = unrank(down_ranks, self.n_sites, self.n_down)
+
+        return (up << np.uint64(self.n_sites)) | down
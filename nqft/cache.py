@@ -0,0 +1,573 @@
+"""This module contains a content-addressed on-disk cache used to store
+computed spectral functions, Hall coefficients and exact diagonalization
+results (hamiltonians and ground states) so repeated sweeps and re-plots
+don't need to recompute them.
+"""
+
+import os
+import json
+import time
+import hashlib
+import numpy as np
+from scipy.sparse import csr_matrix, load_npz, save_npz
+
+from nqft.krylov import lanczos
+
+
+def hash_array(array: np.ndarray) -> str:
+    """Gives a digest of an array content (shape, dtype and data).
+
+    Parameters
+    ----------
+    array: np.ndarray, default=None
+        Array to hash.
+
+    Returns
+    -------
+    -: str
+        Hexadecimal sha256 digest.
+    """
+    array = np.ascontiguousarray(array)
+    digest = hashlib.sha256()
+    digest.update(f"{array.shape}{array.dtype.str}".encode())
+    digest.update(array.tobytes())
+
+    return digest.hexdigest()
+
+
+def canonical(value):
+    """Converts a parameter value into a JSON serializable object that
+    doesn't depend on the way the value was typed (ex: 2 and 2.0 or (1, 2)
+    and [1, 2] give the same output).
+
+    Parameters
+    ----------
+    value: any, default=None
+        Parameter value.
+
+    Returns
+    -------
+    -: bool, float, str, list, dict or None
+    """
+    if value is None:
+        return value
+
+    elif isinstance(value, (bool, np.bool_)):
+        return bool(value)
+
+    elif isinstance(value, (int, float, np.integer, np.floating)):
+        return float(value)
+
+    elif isinstance(value, np.ndarray):
+        return hash_array(value)
+
+    elif isinstance(value, (tuple, list)):
+        return [canonical(elem) for elem in value]
+
+    elif isinstance(value, dict):
+        return {str(key): canonical(val) for key, val in value.items()}
+
+    return str(value)
+
+
+def hash_params(**params) -> str:
+    """Gives the key under which a computation is stored in the cache.
+
+    Parameters
+    ----------
+    **params:
+        Full parameter set of the computation.
+
+    Returns
+    -------
+    -: str
+        Hexadecimal sha256 digest of the canonical parameter set.
+
+    Examples
+    --------
+    >>> hash_params(U=2, hoppings=(1, -0.3)) == hash_params(
+    ...     hoppings=[1.0, -0.3], U=2.0)
+    True
+    """
+    text = json.dumps(canonical(params), sort_keys=True)
+
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class DiskCache:
+    """Content-addressed cache storing spectral functions as compressed numpy
+    archives and scalar results (ex: Hall coefficients) as JSON records.
+
+    Entries are evicted in least recently used order when the total size of
+    the cache exceeds 'max_size'. Reads only update access times in memory:
+    the index is written on puts and evictions, or by 'flush' which cached
+    computations call before returning.
+
+    Attributes
+    ----------
+    path: str, default="./nqft/Data/cache"
+        Directory in which the cache is stored.
+
+    max_size: int, default=2**30
+        Maximum size of the cache in bytes.
+    """
+
+    def __init__(self, path="./nqft/Data/cache", max_size=2**30) -> None:
+        """Creates cache directory if needed and reads its index.
+        """
+        self.path = path
+        self.max_size = max_size
+        self.index_file = f"{path}/index.json"
+
+        os.makedirs(path, exist_ok=True)
+        self._dirty = False
+
+        try:
+            with open(self.index_file, "r") as file:
+                self.index = json.load(file)
+
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.index = {}
+
+        return
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.index
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def size(self) -> int:
+        """Total size of the cached entries in bytes.
+        """
+        return sum(entry["size"] for entry in self.index.values())
+
+    def get_spectrum(self, key: str) -> np.ndarray:
+        """Reads a cached spectral function.
+
+        Parameters
+        ----------
+        key: str, default=None
+            Key given by 'hash_params'.
+
+        Returns
+        -------
+        -: np.ndarray or None
+            Cached array or None if the key isn't in the cache.
+        """
+        entry = self.index.get(key)
+        if not entry or not entry.get("file"):
+            return None
+
+        try:
+            with np.load(f"{self.path}/{entry['file']}") as archive:
+                array = archive["spectrum"]
+
+        except FileNotFoundError:
+            self._remove(key)
+            self._write_index()
+            return None
+
+        self._touch(key)
+
+        return array
+
+    def put_spectrum(self, key: str, array: np.ndarray,
+                     params=None) -> None:
+        """Stores a spectral function as a compressed numpy archive.
+
+        Parameters
+        ----------
+        key: str, default=None
+            Key given by 'hash_params'.
+
+        array: np.ndarray, default=None
+            Spectral function to store.
+
+        params: dict, default=None
+            Parameter set to keep alongside the entry (for inspection only).
+        """
+        tmp = f"{self.path}/{key}.tmp.npz"
+        np.savez_compressed(tmp, spectrum=array)
+        self._put_file(key, tmp, f"{key}.npz", params)
+
+        return
+
+    def get_record(self, key: str) -> dict:
+        """Reads a cached record.
+
+        Parameters
+        ----------
+        key: str, default=None
+            Key given by 'hash_params'.
+
+        Returns
+        -------
+        -: dict or None
+            Cached record or None if the key isn't in the cache.
+        """
+        entry = self.index.get(key)
+        if not entry or entry.get("record") is None:
+            return None
+
+        self._touch(key)
+
+        return entry["record"]
+
+    def put_record(self, key: str, record: dict, params=None) -> None:
+        """Stores a small JSON record (ex: {'n_h': 0.9}).
+
+        Parameters
+        ----------
+        key: str, default=None
+            Key given by 'hash_params'.
+
+        record: dict, default=None
+            JSON serializable record.
+
+        params: dict, default=None
+            Parameter set to keep alongside the entry (for inspection only).
+        """
+        # A replaced entry stored as a file doesn't keep it
+        if key in self.index:
+            self._remove(key)
+
+        self.index[key] = {
+            "file": None,
+            "size": len(json.dumps(record)),
+            "params": canonical(params) if params else None,
+            "record": canonical(record),
+        }
+        self._touch(key)
+        self.evict()
+
+        return
+
+    def evict(self) -> None:
+        """Removes least recently used entries until the cache fits in
+        'max_size' bytes.
+        """
+        total = self.size()
+        by_access = sorted(
+            self.index, key=lambda key: self.index[key]["last_access"])
+
+        for key in by_access:
+            if total <= self.max_size:
+                break
+            total -= self.index[key]["size"]
+            self._remove(key)
+
+        self._write_index()
+
+        return
+
+    def clear(self) -> None:
+        """Removes every entry of the cache.
+        """
+        for key in list(self.index):
+            self._remove(key)
+        self._write_index()
+
+        return
+
+    def _put_file(self, key: str, tmp: str, file: str, params=None,
+                  record=None) -> None:
+        # Moves a written file into place (removing the entry it replaces),
+        # then indexes it
+        if key in self.index:
+            self._remove(key)
+        os.replace(tmp, f"{self.path}/{file}")
+
+        self.index[key] = {
+            "file": file,
+            "size": os.path.getsize(f"{self.path}/{file}"),
+            "params": canonical(params) if params else None,
+            "record": canonical(record) if record else None,
+        }
+        self._touch(key)
+        self.evict()
+
+        return
+
+    def flush(self) -> None:
+        """Writes access times of entries read since the last write of the
+        index (they are otherwise written along with the next put or
+        eviction, or lost).
+        """
+        if self._dirty:
+            self._write_index()
+
+        return
+
+    def _touch(self, key: str) -> None:
+        # Access times are kept in memory, the index isn't rewritten on reads
+        self.index[key]["last_access"] = time.time()
+        self._dirty = True
+
+    def _remove(self, key: str) -> None:
+        entry = self.index.pop(key)
+        if entry.get("file"):
+            try:
+                os.remove(f"{self.path}/{entry['file']}")
+            except FileNotFoundError:
+                pass
+
+    def _write_index(self) -> None:
+        tmp = f"{self.index_file}.tmp"
+        with open(tmp, "w") as file:
+            json.dump(self.index, file)
+        os.replace(tmp, self.index_file)
+        self._dirty = False
+
+
+class EDCache(DiskCache):
+    """Disk cache of exact diagonalization results of 'Network' objects.
+
+    Hopping and interaction terms of the hamiltonian (H = U * H1 - t * H2)
+    are stored separately as sparse matrices, so any (U, t) reuses them.
+    Ground states are stored as raw numpy files read back as memory maps
+    (the vector isn't loaded until used) with their energy in the index. A
+    missing ground state is computed from the closest cached one (same
+    network and sector, nearest U / t) as initial Lanczos vector.
+
+    Attributes
+    ----------
+    path: str, default="./nqft/Data/cache"
+        Directory in which the cache is stored.
+
+    max_size: int, default=2**30
+        Maximum size of the cache in bytes.
+
+    Examples
+    --------
+    >>> from nqft.hamiltonian import Network
+    >>> cache, N = EDCache(), Network(shape=(3, 4))
+    >>> energy, state = cache.ground_state(N, U=8, t=1,
+    ...                                    sector=N.get_sector(6, 6))
+    """
+
+    def get_sparse(self, key: str) -> csr_matrix:
+        """Reads a cached sparse matrix.
+
+        Parameters
+        ----------
+        key: str, default=None
+            Key given by 'hash_params'.
+
+        Returns
+        -------
+        -: scipy.sparse.csr_matrix or None
+            Cached matrix or None if the key isn't in the cache.
+        """
+        entry = self.index.get(key)
+        if not entry or not entry.get("file"):
+            return None
+
+        try:
+            matrix = load_npz(f"{self.path}/{entry['file']}").tocsr()
+
+        except FileNotFoundError:
+            self._remove(key)
+            self._write_index()
+            return None
+
+        self._touch(key)
+
+        return matrix
+
+    def put_sparse(self, key: str, matrix: csr_matrix, params=None) -> None:
+        """Stores a sparse matrix as a numpy archive.
+
+        Parameters
+        ----------
+        key: str, default=None
+            Key given by 'hash_params'.
+
+        matrix: scipy.sparse.csr_matrix, default=None
+            Matrix to store.
+
+        params: dict, default=None
+            Parameter set to keep alongside the entry (for inspection only).
+        """
+        tmp = f"{self.path}/{key}.tmp.npz"
+        save_npz(tmp, matrix.tocsr())
+        self._put_file(key, tmp, f"{key}.npz", params)
+
+        return
+
+    def get_state(self, key: str) -> tuple:
+        """Reads a cached eigenpair, the vector being memory mapped.
+
+        Parameters
+        ----------
+        key: str, default=None
+            Key given by 'hash_params'.
+
+        Returns
+        -------
+        energy, state: tuple, size=2
+            Energy and read-only memory mapped vector, or (None, None) if
+            the key isn't in the cache.
+        """
+        entry = self.index.get(key)
+        if not entry or not entry.get("file") or not entry.get("record"):
+            return None, None
+
+        try:
+            state = np.load(f"{self.path}/{entry['file']}", mmap_mode='r')
+
+        except FileNotFoundError:
+            self._remove(key)
+            self._write_index()
+            return None, None
+
+        self._touch(key)
+
+        return entry["record"]["energy"], state
+
+    def put_state(self, key: str, energy: float, state: np.ndarray,
+                  params=None) -> None:
+        """Stores an eigenpair (the vector as a raw numpy file).
+
+        Parameters
+        ----------
+        key: str, default=None
+            Key given by 'hash_params'.
+
+        energy: float, default=None
+            Eigenvalue.
+
+        state: np.ndarray, default=None
+            Eigenvector.
+
+        params: dict, default=None
+            Parameter set kept alongside the entry (used to find initial
+            vectors of nearby parameters).
+        """
+        tmp = f"{self.path}/{key}.tmp.npy"
+        np.save(tmp, np.asarray(state))
+        self._put_file(key, tmp, f"{key}.npy", params,
+                       record={"energy": energy})
+
+        return
+
+    @staticmethod
+    def _system_params(network, sector=None) -> dict:
+        # Everything the hamiltonian terms depend on
+        return {
+            "model": type(network).__name__,
+            "sites": network.sites,
+            "bonds": np.array(network.bonds, dtype=np.float64),
+            "onsite": np.asarray(network.onsite, dtype=np.float64),
+            "sector": (sector.n_up, sector.n_down) if sector else None
+        }
+
+    def hamiltonian_terms(self, network, sector=None) -> tuple[csr_matrix]:
+        """Cached 'Network.get_hamiltonian_terms'.
+
+        Parameters
+        ----------
+        network: Network, default=None
+            Fermions network.
+
+        sector: Sector, default=None
+            Restricts the terms to a (N_up, N_down) sector.
+
+        Returns
+        -------
+        H1, H2: tuple[scipy.sparse.csr_matrix], shape=(dim, dim)
+            Interaction (double occupancy) and hopping operators.
+        """
+        system = self._system_params(network, sector)
+        keys = [hash_params(term=term, **system)
+                for term in ("interaction", "hopping")]
+        terms = [self.get_sparse(key) for key in keys]
+
+        if any(term is None for term in terms):
+            terms = network.get_hamiltonian_terms(sector)
+            for key, term, name in zip(keys, terms,
+                                       ("interaction", "hopping")):
+                self.put_sparse(key, term, dict(term=name, **system))
+        self.flush()
+
+        return tuple(terms)
+
+    def hamiltonian(self, network, U: float, t: float,
+                    sector=None) -> csr_matrix:
+        """Hubbard hamiltonian U * H1 - t * H2 from cached terms.
+
+        Parameters
+        ----------
+        network: Network, default=None
+            Fermions network.
+
+        U: float, default=None
+            Module of interaction between fermions.
+
+        t: float, default=None
+            Probability amplitude for fermions to jump.
+
+        sector: Sector, default=None
+            Restricts the hamiltonian to a (N_up, N_down) sector.
+
+        Returns
+        -------
+        -: scipy.sparse.csr_matrix, shape=(dim, dim)
+        """
+        H1, H2 = self.hamiltonian_terms(network, sector)
+
+        return (U * H1 - t * H2).tocsr()
+
+    def ground_state(self, network, U: float, t: float, sector=None,
+                     tol=1e-10) -> tuple:
+        """Cached ground state of the Hubbard hamiltonian (matrix-free
+        Lanczos on a miss).
+
+        Parameters
+        ----------
+        network: Network, default=None
+            Fermions network.
+
+        U: float, default=None
+            Module of interaction between fermions.
+
+        t: float, default=None
+            Probability amplitude for fermions to jump.
+
+        sector: Sector, default=None
+            Restricts the hamiltonian to a (N_up, N_down) sector.
+
+        tol: float, default=1e-10
+            Convergence threshold of Lanczos.
+
+        Returns
+        -------
+        energy, state: tuple, size=2
+            Ground state energy and memory mapped ground state.
+        """
+        system = hash_params(**self._system_params(network, sector))
+        params = {"system": system, "U": U, "t": t, "tol": tol}
+        key = hash_params(**params)
+
+        energy, state = self.get_state(key)
+        if state is not None:
+            self.flush()
+            return energy, state
+
+        # Ground state of the closest parameters as initial vector
+        nearby = [(abs(entry["params"]["U"] - U)
+                   + abs(entry["params"]["t"] - t), other)
+                  for other, entry in self.index.items()
+                  if entry.get("params")
+                  and entry["params"].get("system") == system]
+        v0 = self.get_state(min(nearby)[1])[1] if nearby else None
+
+        energy, state, _ = lanczos(network.get_operator(U, t, sector), v0=v0,
+                                   tol=tol)
+        self.put_state(key, energy, state, params)
+
+        # Entries larger than the cache are evicted right away
+        cached = self.get_state(key)
+        self.flush()
+
+        return cached if cached[1] is not None else (energy, state)
@@ -0,0 +1,368 @@
+"""This module implements Cluster Perturbation Theory (CPT) on top of cluster
+Green's functions in Lehmann representation (see 'nqft.lehmann'), together
+with a Matsubara-axis engine computing lattice densities and one-body
+averages without 'pyqcm'.
+"""
+
+import os
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+from nqft.lehmann import LehmannGF
+from nqft.functions import (
+    LINKS,
+    build_matrix,
+    build_superlattice,
+    cluster_bonds,
+    high_symmetry_path,
+    write_path_spectrum
+)
+
+
+class CPTModel:
+    """Lattice model obtained by embedding a cluster Green's function with
+    Cluster Perturbation Theory,
+
+                G(k, z)^-1 = G_c(z)^-1 - V(k),
+
+    V(k) being the inter-cluster hopping matrix.
+
+    Attributes
+    ----------
+    cluster_gf: LehmannGF, default=None
+        Cluster Green's function.
+
+    shape: tuple[int], size=2, default=None
+        Shape of the source cluster as: (rows, columns).
+
+    hoppings: tuple[float], size=3, default=None
+        Hopping amplitudes coefficients (t, tp, tpp).
+
+    tiling_shift: bool, default=False
+        Determines if super-vectors are shifted or exactly orthogonals.
+    """
+
+    def __init__(self, cluster_gf: LehmannGF, shape: tuple[int],
+                 hoppings: tuple[float], tiling_shift=False) -> None:
+        """Builds cluster geometry and bond lists.
+        """
+        self.cluster_gf = cluster_gf
+        self.shape = shape
+        self.hops = dict(zip(LINKS, hoppings))
+        self.sites = shape[0] * shape[1]
+
+        self.positions = np.array(build_matrix(shape))[:, :2]
+        self.super_vecs = np.array(
+            build_superlattice(shape, tiling_shift))[:, :2]
+        self.reciprocal = 2 * np.pi * np.linalg.inv(self.super_vecs).T
+        self.bonds = cluster_bonds(shape, tiling_shift)
+
+        return
+
+    def hopping_matrix(self, k: np.ndarray, names=('t', 'tp', 'tpp'),
+                       inter=True, unit=False) -> np.ndarray:
+        """Hopping matrices T_ij(k) = sum_R -t e^{ik.R} between cluster
+        sites (pyqcm convention for hopping operators amplitudes).
+
+        Parameters
+        ----------
+        k: np.ndarray, shape=(K, 2), default=None
+            Wavevectors.
+
+        names: tuple[str], default=('t', 'tp', 'tpp')
+            Hopping operators to include.
+
+        inter: bool, default=True
+            Keeps only inter-cluster hoppings (R != 0), i.e. V(k).
+
+        unit: bool, default=False
+            Uses unit parameters instead of model hoppings (gives the matrix
+            of the operators themselves).
+
+        Returns
+        -------
+        T: np.ndarray, shape=(K, d, d)
+        """
+        k = np.atleast_2d(k)
+        T = np.zeros((k.shape[0], self.sites**2), dtype=np.complex128)
+
+        for name in names:
+            bonds = self.bonds[name]
+            if inter:
+                bonds = bonds[np.any(bonds[:, 2:] != 0, axis=1)]
+
+            amplitude = -1.0 if unit else -self.hops[name]
+            phases = amplitude * np.exp(1j * k @ bonds[:, 2:].T)
+            flat = bonds[:, 0] * self.sites + bonds[:, 1]
+            for col, idx in enumerate(flat):
+                T[:, idx] += phases[:, col]
+
+        return T.reshape(-1, self.sites, self.sites)
+
+    def reduced_grid(self, nk: int) -> np.ndarray:
+        """Uniform grid of nk x nk wavevectors inside the reduced Brillouin
+        zone of the superlattice.
+
+        Parameters
+        ----------
+        nk: int, default=None
+            Number of points along each reciprocal super-vector.
+
+        Returns
+        -------
+        -: np.ndarray, shape=(nk**2, 2)
+        """
+        m_1, m_2 = np.meshgrid(np.arange(nk), np.arange(nk), indexing='ij')
+        fractions = np.stack([m_1.ravel(), m_2.ravel()], axis=1) / nk
+
+        return fractions @ self.reciprocal
+
+    def inverse_cluster_gf(self, z, mu_shift=0.0) -> np.ndarray:
+        """Inverse cluster Green's function. A shift of the chemical potential
+        (inside the same ground state sector) amounts to a frequency shift.
+
+        Parameters
+        ----------
+        z: array-like, shape=(Z,), default=None
+            Complex frequencies.
+
+        mu_shift: float, default=0.0
+            Chemical potential relative to the one of the cluster solution.
+
+        Returns
+        -------
+        -: np.ndarray, shape=(Z, d, d)
+        """
+        z = np.atleast_1d(np.asarray(z, dtype=np.complex128))
+
+        return np.linalg.inv(self.cluster_gf(z + mu_shift))
+
+    def green_function(self, z, k: np.ndarray, mu_shift=0.0) -> np.ndarray:
+        """CPT Green's function between cluster sites.
+
+        Parameters
+        ----------
+        z: array-like, shape=(Z,), default=None
+            Complex frequencies.
+
+        k: np.ndarray, shape=(K, 2), default=None
+            Wavevectors.
+
+        mu_shift: float, default=0.0
+            Chemical potential relative to the one of the cluster solution.
+
+        Returns
+        -------
+        -: np.ndarray, shape=(K, Z, d, d)
+        """
+        inv_gc = self.inverse_cluster_gf(z, mu_shift)
+        V = self.hopping_matrix(k)
+
+        return np.linalg.inv(inv_gc[None, ...] - V[:, None, ...])
+
+    def periodize(self, G: np.ndarray, k: np.ndarray) -> np.ndarray:
+        """Periodized lattice Green's function
+
+            G(k) = 1/d sum_ij e^{-ik.(r_i - r_j)} G_ij(k).
+
+        Parameters
+        ----------
+        G: np.ndarray, shape=(K, ..., d, d), default=None
+            CPT Green's function at wavevectors k.
+
+        k: np.ndarray, shape=(K, 2), default=None
+            Wavevectors.
+
+        Returns
+        -------
+        -: np.ndarray, shape=(K, ...)
+        """
+        u = np.exp(1j * np.atleast_2d(k) @ self.positions.T)
+        u = u.reshape(u.shape[0], *[1] * (G.ndim - 3), self.sites)
+
+        return np.einsum('...i,...ij,...j->...', u.conj(), G, u) / self.sites
+
+    def spectral_path(self, k: np.ndarray, omegas: np.array, eta: float,
+                      mu_shift=0.0, chunk_size=8):
+        """Yields periodized CPT spectral function A(k, w) along a path, one
+        wavevector at a time, for a dense frequency grid. Only wavevectors of
+        the path are evaluated and the inverse cluster Green's function is
+        shared between them.
+
+        Parameters
+        ----------
+        k: np.ndarray, shape=(K, 2), default=None
+            Wavevectors of the path (see 'nqft.functions.high_symmetry_path').
+
+        omegas: np.array, size=Z, default=None
+            Frequencies.
+
+        eta: float, default=None
+            Lorentzian broadening module.
+
+        mu_shift: float, default=0.0
+            Chemical potential relative to the one of the cluster solution.
+
+        chunk_size: int, default=8
+            Number of wavevectors computed at once.
+
+        Yields
+        ------
+        -: np.array, size=Z
+            Spectral function of each wavevector.
+        """
+        inv_gc = self.inverse_cluster_gf(omegas + eta * 1j, mu_shift)
+
+        for idx in range(0, k.shape[0], chunk_size):
+            k_chunk = k[idx:idx + chunk_size]
+            V = self.hopping_matrix(k_chunk)
+            G = np.linalg.inv(inv_gc[None, ...] - V[:, None, ...])
+
+            yield from -1 / np.pi * self.periodize(G, k_chunk).imag
+
+
+class MatsubaraEngine:
+    """Computes lattice densities and one-body averages of a CPT model by
+    summing its Green's function over the reduced Brillouin zone and
+    fermionic Matsubara frequencies.
+
+    The high frequency tail (i w_n - H_1(k))^-1, H_1(k) being the first
+    spectral moment, is subtracted from the sum and added back exactly as the
+    Fermi function of H_1(k). The frequency grid and the inverse cluster
+    Green's function are shared between every wavevector, wavevectors are
+    summed in chunks on several threads.
+
+    Attributes
+    ----------
+    model: CPTModel, default=None
+        Lattice model.
+
+    beta: float, default=50.0
+        Inverse temperature.
+
+    n_matsubara: int, default=1024
+        Number of positive Matsubara frequencies.
+
+    nk: int, default=32
+        Number of wavevectors along each reciprocal super-vector.
+
+    chunk_size: int, default=64
+        Number of wavevectors treated at once by a worker.
+
+    workers: int, default=None
+        Number of threads (defaults to the number of cores).
+    """
+
+    def __init__(self, model: CPTModel, beta=50.0, n_matsubara=1024, nk=32,
+                 chunk_size=64, workers=None) -> None:
+        """Builds frequency and wavevector grids.
+        """
+        self.model = model
+        self.beta = beta
+        self.iw = 1j * (2 * np.arange(n_matsubara) + 1) * np.pi / beta
+        self.k = model.reduced_grid(nk)
+        self.chunk_size = chunk_size
+        self.workers = workers if workers else os.cpu_count()
+        return
+
+    def _chunk_sums(self, k: np.ndarray, inv_gc: np.ndarray,
+                    moment: np.ndarray) -> tuple:
+        """Density matrices of a chunk of wavevectors, summed over them and
+        contracted with every hopping operator.
+        """
+        model = self.model
+        V = model.hopping_matrix(k)
+        G = np.linalg.inv(inv_gc[None, ...] - V[:, None, ...])
+
+        # High frequency tail (i w_n - H_1)^-1 is diagonal in the eigenbasis
+        # of H_1 and its exact Matsubara sum is f(H_1)
+        H_1 = moment[None, ...] + V
+        vals, vecs = np.linalg.eigh(H_1)
+        fermi = 0.5 * (1.0 - np.tanh(0.5 * self.beta * vals))
+        tail = (1 / (self.iw[:, None, None] - vals[None, ...])).sum(axis=0)
+
+        vecs_dag = vecs.conj().transpose(0, 2, 1)
+        X = G.sum(axis=1) - (vecs * tail[:, None, :]) @ vecs_dag
+        rho = (vecs * fermi[:, None, :]) @ vecs_dag
+        rho = rho + (X + X.conj().transpose(0, 2, 1)) / self.beta
+
+        # < c_i^dag c_j > contracted with hopping operators: Tr(T(k) rho(k))
+        hoppings = {
+            name: np.einsum('kij,kji->', model.hopping_matrix(
+                k, (name,), inter=False, unit=True), rho).real
+            for name in model.hops
+        }
+
+        return rho.sum(axis=0), hoppings
+
+    def averages(self, mu_shift=0.0) -> dict:
+        """Lattice averages per site (both spins) of the density ('mu', as in
+        'pyqcm.averages') and of the t, tp, tpp hopping operators
+        -sum_<ij> (c_i^dag c_j + h.c.).
+
+        Parameters
+        ----------
+        mu_shift: float, default=0.0
+            Chemical potential relative to the one of the cluster solution.
+
+        Returns
+        -------
+        avgs: dict
+            Operator names as keys and averages as values.
+        """
+        model = self.model
+        inv_gc = model.inverse_cluster_gf(self.iw, mu_shift)
+        moment = model.cluster_gf.moments(order=1) - mu_shift * np.identity(
+            model.sites)
+
+        chunks = [self.k[idx:idx + self.chunk_size]
+                  for idx in range(0, self.k.shape[0], self.chunk_size)]
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            results = list(pool.map(
+                lambda k: self._chunk_sums(k, inv_gc, moment), chunks))
+
+        norm = 2.0 / (self.k.shape[0] * model.sites)
+        rho = sum(result[0] for result in results)
+        avgs = {'mu': float(norm * np.trace(rho).real)}
+
+        for name in results[0][1]:
+            avgs[name] = float(
+                norm * sum(result[1][name] for result in results))
+
+        return avgs
+
+    def density(self, mu_shifts=0.0) -> np.array:
+        """Lattice density per site (both spins) for one or many chemical
+        potential shifts sharing the same frequency and wavevector grids.
+
+        Parameters
+        ----------
+        mu_shifts: float or array-like, default=0.0
+            Chemical potentials relative to the one of the cluster solution.
+
+        Returns
+        -------
+        -: float or np.array
+        """
+        densities = np.array(
+            [self.averages(mu)['mu'] for mu in np.atleast_1d(mu_shifts)])
+
+        return densities if np.ndim(mu_shifts) else float(densities[0])
+
+
+if __name__ == "__main__":
+    from nqft.lehmann import read_solution
+
+    gf = read_solution('./nqft/Data/model_2x2/model_2x2_n4_U8.py')
+    model = CPTModel(gf, shape=(2, 2), hoppings=(1.0, -0.3, 0.2))
+    engine = MatsubaraEngine(model, beta=50.0, nk=32)
+
+    print(engine.averages())
+
+    # Spectral function along Gamma-X-M-Gamma
+    k, distance = high_symmetry_path(n_points=100)
+    omegas = np.linspace(-8, 8, 800)
+    write_path_spectrum(
+        './nqft/Data/path_2x2_n4_U8.txt', distance, omegas,
+        model.spectral_path(k, omegas, eta=0.1))
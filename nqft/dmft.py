@@ -0,0 +1,366 @@
+"""This module contains a single-site dynamical mean-field theory (DMFT) loop
+for the t-tp-tpp Hubbard model, solved at zero temperature by exact
+diagonalization of an Anderson impurity with a discrete bath
+('nqft.hamiltonian.AndersonImpurity').
+
+Each iteration goes through Matsubara frequencies of a fictitious inverse
+temperature beta:
+
+        Sigma(iw) = iw + mu - Delta(iw) - G_imp(iw)^-1,
+        G_loc(iw) = 1 / Nk sum_k (iw + mu - e_k - Sigma(iw))^-1,
+        Delta_new(iw) = iw + mu - Sigma(iw) - G_loc(iw)^-1,
+
+and the bath is refitted to Delta_new. Bath parameters are mixed with
+Anderson (DIIS) acceleration, which keeps the number of impurity solves
+small.
+"""
+
+import numpy as np
+from rich import print
+from scipy.optimize import minimize
+
+from nqft.hall_effect import get_dispersion
+from nqft.hamiltonian import AndersonImpurity
+
+
+def bath_hybridization(iw: np.array, energies: np.array,
+                       hybridizations: np.array) -> np.array:
+    """Hybridization function of a discrete bath,
+
+            Delta(iw) = sum_l V_l^2 / (iw - e_l).
+
+    Parameters
+    ----------
+    iw: np.array, size=n, default=None
+        Imaginary frequencies.
+
+    energies: np.array, size=L, default=None
+        Bath energies e_l.
+
+    hybridizations: np.array, size=L, default=None
+        Hybridizations V_l.
+
+    Returns
+    -------
+    -: np.array, size=n
+    """
+    resolvent = 1 / (iw[:, None] - np.asarray(energies)[None, :])
+
+    return resolvent @ np.asarray(hybridizations)**2
+
+
+def fit_bath(iw: np.array, target: np.array, energies: np.array,
+             hybridizations: np.array, weights=None) -> tuple:
+    """Fits a discrete bath to a hybridization function by least squares,
+
+            chi^2 = sum_n w_n |Delta(iw_n) - target_n|^2,
+
+    with analytic gradients (L-BFGS-B). Bath sites are sorted by energy
+    and hybridizations made positive (the fit is invariant under both).
+
+    Parameters
+    ----------
+    iw: np.array, size=n, default=None
+        Imaginary frequencies.
+
+    target: np.array, size=n, default=None
+        Hybridization function to fit.
+
+    energies: np.array, size=L, default=None
+        Initial bath energies.
+
+    hybridizations: np.array, size=L, default=None
+        Initial hybridizations.
+
+    weights: np.array, size=n, default=1 / |w_n|
+        Weights of the frequencies.
+
+    Returns
+    -------
+    energies, hybridizations, chi2: tuple, size=3
+    """
+    if weights is None:
+        weights = 1 / np.abs(iw)
+    weights = weights / weights.sum()
+    n_bath = len(energies)
+
+    def objective(x):
+        e, V = x[:n_bath], x[n_bath:]
+        resolvent = 1 / (iw[:, None] - e[None, :])
+        residual = resolvent @ V**2 - target
+        a = weights * residual.conj()
+
+        # d Delta / d e_l = V_l^2 R_l^2 and d Delta / d V_l = 2 V_l R_l
+        grad_e = 2 * (a @ resolvent**2).real * V**2
+        grad_V = 4 * (a @ resolvent).real * V
+
+        return (weights * np.abs(residual)**2).sum(), np.concatenate(
+            [grad_e, grad_V])
+
+    result = minimize(objective, np.concatenate([energies, hybridizations]),
+                      jac=True, method='L-BFGS-B',
+                      options={'ftol': 1e-15, 'gtol': 1e-10, 'maxiter': 10000})
+    e, V = result.x[:n_bath], np.abs(result.x[n_bath:])
+    order = np.argsort(e)
+
+    return e[order], V[order], float(result.fun)
+
+
+class DIIS:
+    """Anderson (DIIS) acceleration of a fixed point iteration x = F(x): the
+    next guess combines previous ones,
+
+            x_next = sum_i c_i (x_i + mixing * r_i),   r_i = F(x_i) - x_i,
+
+    with coefficients (sum_i c_i = 1) minimizing || sum_i c_i r_i ||. The
+    history is cleared when the residual grows.
+
+    Attributes
+    ----------
+    history: int, default=5
+        Number of previous iterations kept.
+
+    mixing: float, default=1.0
+        Fraction of the residual added to the guesses.
+    """
+
+    def __init__(self, history=5, mixing=1.0) -> None:
+        """Sets attributes to given values.
+        """
+        self.history = history
+        self.mixing = mixing
+        self.guesses = []
+        self.residuals = []
+        return
+
+    def update(self, x: np.array, fx: np.array) -> np.array:
+        """Next guess of the iteration.
+
+        Parameters
+        ----------
+        x: np.array, default=None
+            Current guess.
+
+        fx: np.array, default=None
+            Image F(x) of the current guess.
+
+        Returns
+        -------
+        -: np.array
+        """
+        residual = fx - x
+        if self.residuals and (np.linalg.norm(residual)
+                               > np.linalg.norm(self.residuals[-1])):
+            # Restarts from the last guess when the iteration diverges
+            self.guesses, self.residuals = [], []
+
+        self.guesses = (self.guesses + [x])[-self.history:]
+        self.residuals = (self.residuals + [residual])[-self.history:]
+        X, R = np.array(self.guesses), np.array(self.residuals)
+
+        # Lagrange system of the constrained least squares problem
+        m = len(R)
+        system = np.ones((m + 1, m + 1))
+        system[:m, :m] = R @ R.T
+        system[m, m] = 0
+        rhs = np.zeros(m + 1)
+        rhs[m] = 1
+        coefficients = np.linalg.lstsq(system, rhs, rcond=None)[0][:m]
+
+        return coefficients @ (X + self.mixing * R)
+
+
+class DMFT:
+    """Zero temperature single-site DMFT of the t-tp-tpp Hubbard model with
+    an exact diagonalization impurity solver.
+
+    Attributes
+    ----------
+    U: float, default=None
+        Module of interaction between fermions.
+
+    mu: float, default=None
+        Chemical potential (U / 2 is half filling for tp = tpp = 0).
+
+    hops: tuple[float], size=3, default=(1.0, 0.0, 0.0)
+        Hopping amplitudes (t, tp, tpp) of the lattice dispersion.
+
+    n_bath: int, default=4
+        Number of bath sites.
+
+    beta: float, default=50.0
+        Fictitious inverse temperature of the Matsubara grid.
+
+    n_matsubara: int, default=200
+        Number of positive Matsubara frequencies.
+
+    nk: int, default=64
+        Number of wavevectors along each direction of the Brillouin zone.
+
+    Examples
+    --------
+    >>> dmft = DMFT(U=2, mu=1, n_bath=4)
+    >>> solution = dmft.run()
+    >>> solution['converged'], solution['solves']
+    (True, 4)
+    """
+
+    def __init__(self, U: float, mu: float, hops=(1.0, 0.0, 0.0), n_bath=4,
+                 beta=50.0, n_matsubara=200, nk=64) -> None:
+        """Sets attributes to given values and builds the frequency grid and
+        the (unique) lattice energies.
+        """
+        self.U = U
+        self.mu = mu
+        self.hops = tuple(hops)
+        self.n_bath = n_bath
+        self.beta = beta
+        self.iw = 1j * (2 * np.arange(n_matsubara) + 1) * np.pi / beta
+
+        # The lattice sum only depends on energies: equal ones are merged
+        ks = 2 * np.pi * np.arange(nk) / nk
+        kx, ky = np.meshgrid(ks, ks)
+        dispersion = get_dispersion(self.hops, kx, ky).ravel()
+        self.dispersion, counts = np.unique(np.round(dispersion, 12),
+                                            return_counts=True)
+        self.weights = counts / dispersion.size
+        return
+
+    def initial_bath(self) -> tuple[np.array]:
+        """Bath spread over the band with the high frequency tail of the
+        non-interacting hybridization (sum_l V_l^2 = variance of e_k),
+        shifted by the Hartree energy U / 2 of a half filled impurity.
+
+        Returns
+        -------
+        energies, hybridizations: tuple[np.array], size=2
+        """
+        mean = self.weights @ self.dispersion
+        variance = self.weights @ (self.dispersion - mean)**2
+        half_width = np.abs(self.dispersion - mean).max() / 2
+
+        # Lattice poles (hence bath energies) are at e_k + Sigma - mu, the
+        # Hartree self-energy being U n / 2 (U / 2 at half filling)
+        center = mean - self.mu + self.U / 2
+        energies = center + np.linspace(-half_width, half_width, self.n_bath)
+
+        return energies, np.full(self.n_bath, np.sqrt(variance / self.n_bath))
+
+    def lattice_green_function(self, sigma: np.array) -> np.array:
+        """Local lattice Green's function for a local self-energy.
+
+        Parameters
+        ----------
+        sigma: np.array, size=n_matsubara, default=None
+            Self-energy on the Matsubara grid.
+
+        Returns
+        -------
+        -: np.array, size=n_matsubara
+        """
+        zeta = self.iw + self.mu - sigma
+
+        return (1 / (zeta[:, None] - self.dispersion[None, :])) @ self.weights
+
+    def solve_impurity(self, energies: np.array,
+                       hybridizations: np.array) -> tuple:
+        """Solves the impurity model of a bath.
+
+        Parameters
+        ----------
+        energies: np.array, size=n_bath, default=None
+            Bath energies.
+
+        hybridizations: np.array, size=n_bath, default=None
+            Hybridizations.
+
+        Returns
+        -------
+        sigma, G_imp: tuple, size=2
+            Self-energy on the Matsubara grid and impurity Green's function
+            (LehmannGF).
+        """
+        impurity = AndersonImpurity(energies, hybridizations, self.mu)
+        G_imp = impurity.impurity_green_function(self.U)
+
+        delta = bath_hybridization(self.iw, energies, hybridizations)
+        sigma = self.iw + self.mu - delta - 1 / G_imp(self.iw)[:, 0, 0]
+
+        return sigma, G_imp
+
+    def run(self, bath=None, tol=1e-5, max_iter=30, history=5,
+            mixing=1.0) -> dict:
+        """Iterates the self-consistency loop until bath parameters stop
+        changing.
+
+        Parameters
+        ----------
+        bath: tuple[np.array], size=2, default='initial_bath'
+            Initial bath energies and hybridizations.
+
+        tol: float, default=1e-5
+            Convergence threshold on the change of the bath hybridization
+            function (max norm).
+
+        max_iter: int, default=30
+            Maximum number of impurity solves.
+
+        history: int, default=5
+            Number of iterations kept by DIIS.
+
+        mixing: float, default=1.0
+            DIIS mixing fraction.
+
+        Returns
+        -------
+        -: dict
+            Keys 'energies', 'hybridizations' (bath), 'sigma', 'G_loc',
+            'G_imp', 'density' (impurity, both spins), 'chi2' (last fit),
+            'solves', 'converged' and 'residuals'.
+        """
+        energies, hybridizations = bath if bath else self.initial_bath()
+        x = np.concatenate([energies, hybridizations])
+        diis = DIIS(history, mixing)
+
+        residuals, converged = [], False
+        for solves in range(1, max_iter + 1):
+            energies, hybridizations = x[:self.n_bath], x[self.n_bath:]
+            sigma, G_imp = self.solve_impurity(energies, hybridizations)
+            G_loc = self.lattice_green_function(sigma)
+
+            target = self.iw + self.mu - sigma - 1 / G_loc
+            new_energies, new_hybridizations, chi2 = fit_bath(
+                self.iw, target, energies, hybridizations)
+            fx = np.concatenate([new_energies, new_hybridizations])
+
+            # Bath parameters can be ill-defined (ex: V_l ~ 0), their
+            # hybridization function isn't
+            residuals.append(float(np.abs(
+                bath_hybridization(self.iw, new_energies, new_hybridizations)
+                - bath_hybridization(self.iw, energies, hybridizations)
+            ).max()))
+            if residuals[-1] < tol:
+                converged = True
+                x = fx
+                break
+
+            x = diis.update(x, fx)
+
+        return {
+            'energies': x[:self.n_bath],
+            'hybridizations': x[self.n_bath:],
+            'sigma': sigma,
+            'G_loc': G_loc,
+            'G_imp': G_imp,
+            'density': G_imp.info['density'],
+            'chi2': chi2,
+            'solves': solves,
+            'converged': converged,
+            'residuals': residuals
+        }
+
+
+if __name__ == "__main__":
+    dmft = DMFT(U=4, mu=2, hops=(1.0, 0.0, 0.0), n_bath=5)
+    solution = dmft.run()
+    print(solution['solves'], solution['density'], solution['residuals'])
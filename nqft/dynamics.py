@@ -0,0 +1,261 @@
+"""This module contains the real-time evolution of 'nqft.hamiltonian.Network'
+states with Krylov (short Lanczos) propagators, which only apply the
+hamiltonian to vectors.
+
+Over a time step tau, exp(-i H tau)|v> is approximated in the Krylov space
+of |v> of dimension m,
+
+        exp(-i H tau)|v> ~ ||v|| V_m exp(-i T_m tau) e_1,
+
+with the a posteriori error estimate beta_m |[exp(-i T_m tau) e_1]_m|. Each
+Krylov space is used for the largest step whose error estimate stays below
+the tolerance, and its Lanczos vectors are rebuilt by a second pass of the
+recurrence instead of being stored.
+"""
+
+import numpy as np
+from rich import print
+from scipy.linalg import eigh_tridiagonal
+
+from nqft.krylov import lanczos, lanczos_chain, lanczos_combination
+
+
+def krylov_evolve(H, state: np.ndarray, times: np.ndarray, probes=None,
+                  shift=0.0, krylov_dim=40, tol=1e-8) -> tuple:
+    """Evolves a state with exp(-i (H - shift) t) using adaptive Krylov time
+    steps and records its overlaps with probe vectors at given times.
+
+    Parameters
+    ----------
+    H: scipy.sparse matrix or LinearOperator, shape=(n, n), default=None
+        Hermitian operator.
+
+    state: np.ndarray, size=n, default=None
+        State at t = 0.
+
+    times: np.ndarray, default=None
+        Increasing output times (>= 0). Time steps don't depend on them:
+        outputs inside a step only cost a small matrix exponential.
+
+    probes: np.ndarray, shape=(n, p), default=None
+        Vectors |w> whose overlaps <w|state(t)> are recorded.
+
+    shift: float, default=0.0
+        Energy subtracted from H (ex: the ground state energy).
+
+    krylov_dim: int, default=40
+        Dimension of the Krylov spaces.
+
+    tol: float, default=1e-8
+        Error tolerance per unit time (relative to the norm of the state).
+
+    Returns
+    -------
+    state, overlaps, info: tuple, size=3
+        State at times[-1], overlaps (len(times), p) (None without probes)
+        and a dict with keys 'steps', 'matvecs' and 'error' (sum of the
+        error estimates).
+
+    Examples
+    --------
+    >>> from nqft.hamiltonian import Network
+    >>> N = Network(sites_nb=2)
+    >>> H = N.get_hamiltonian(model="Hubbard", U=4, t=1)
+    >>> times = np.linspace(0, 50, 501)
+    >>> psi, _, info = krylov_evolve(H, np.eye(16)[5], times)
+    >>> info['steps'], round(float(np.linalg.norm(psi)), 10)
+    (1, 1.0)
+    """
+    times = np.asarray(times, dtype=np.float64)
+    psi = np.asarray(state, dtype=np.complex128).ravel()
+    if probes is not None:
+        probes = np.asarray(probes).reshape(psi.size, -1)
+        overlaps = np.empty((times.size, probes.shape[1]),
+                            dtype=np.complex128)
+    else:
+        overlaps = None
+
+    info = {'steps': 0, 'matvecs': 0, 'error': 0.0}
+    t_now, done = 0.0, 0
+    while done < times.size:
+        norm = np.linalg.norm(psi)
+        alphas, betas, products = lanczos_chain(H, psi, krylov_dim, probes)
+        info['matvecs'] += alphas.size
+
+        if alphas.size > 1:
+            theta, S = eigh_tridiagonal(alphas, betas[:-1])
+        else:
+            theta, S = alphas, np.ones((1, 1))
+        theta = theta - shift
+
+        def coefficients(tau):
+            phases = np.exp(-1j * np.multiply.outer(tau, theta))
+            return norm * (phases * S[0]) @ S.T
+
+        def error(tau):
+            return betas[-1] * np.abs(coefficients(tau)[..., -1])
+
+        # Largest step (up to the last output) with error below tol * tau
+        remaining = times[-1] - t_now
+        tau = remaining
+        if error(remaining) > tol * norm * remaining:
+            low, high = 0.0, remaining
+            for _ in range(50):
+                middle = (low + high) / 2
+                if error(middle) <= tol * norm * middle:
+                    low = middle
+                else:
+                    high = middle
+            tau = low
+
+        t_next = times[-1] if tau == remaining else t_now + tau
+        stop = np.searchsorted(times, t_next, side='right')
+        if probes is not None and stop > done:
+            overlaps[done:stop] = (coefficients(times[done:stop] - t_now)
+                                   @ products)
+
+        psi = lanczos_combination(H, psi, alphas, betas, coefficients(tau))
+        info['matvecs'] += alphas.size - 1
+        info['steps'] += 1
+        info['error'] += float(error(tau))
+        t_now, done = t_next, stop
+
+    return psi, overlaps, info
+
+
+def time_green_function(network, U: float, t: float, times: np.ndarray,
+                        n_up=None, n_down=None, mu=0.0, spin="up",
+                        sites=None, krylov_dim=40, tol=1e-8) -> np.ndarray:
+    """Retarded cluster Green's function in real time,
+
+        G_ij(t) = -i <{c_i(t), c_j^dag}>
+                = -i <c_i e^-i(H-E0)t c_j^dag> - i <c_j^dag e^i(H-E0)t c_i>,
+
+    from the Krylov evolution of c_j^dag|GS> and c_j|GS> (see
+    'Network.get_green_function' for its Lehmann counterpart).
+
+    Parameters
+    ----------
+    network: Network, default=None
+        Fermions network.
+
+    U: float, default=None
+        Module of interaction between fermions.
+
+    t: float, default=None
+        Probability amplitude for fermions to jump.
+
+    times: np.ndarray, default=None
+        Increasing times (>= 0).
+
+    n_up: int, default=half filling
+        Number of spin up fermions of the ground state sector.
+
+    n_down: int, default=half filling
+        Number of spin down fermions of the ground state sector.
+
+    mu: float, default=0.0
+        Chemical potential (energies are measured from it).
+
+    spin: str, default='up'
+        Spin of the Green's function.
+
+    sites: list[int], default=every site
+        Sites j of the columns G_ij (one evolution per site and part).
+
+    krylov_dim: int, default=40
+        Dimension of the Krylov spaces.
+
+    tol: float, default=1e-8
+        Error tolerance per unit time.
+
+    Returns
+    -------
+    -: np.ndarray, shape=(len(times), N, len(sites))
+    """
+    n_up = network.sites // 2 if n_up is None else n_up
+    n_down = network.sites // 2 if n_down is None else n_down
+    sites = range(network.sites) if sites is None else sites
+    times = np.asarray(times, dtype=np.float64)
+
+    sector = network.get_sector(n_up, n_down)
+    E0, ground_state, _ = lanczos(network.get_operator(U, t, sector))
+
+    G = np.zeros((times.size, network.sites, len(sites)),
+                 dtype=np.complex128)
+    for dagger in (True, False):
+        excited = [network.apply_fermion(ground_state, sector, site, spin,
+                                         dagger)
+                   for site in range(network.sites)]
+        new_sector = excited[0][1]
+        if new_sector is None:
+            continue
+
+        H = network.get_operator(U, t, new_sector)
+        probes = np.column_stack([state for state, _ in excited])
+        for col, site in enumerate(sites):
+            _, overlaps, _ = krylov_evolve(H, probes[:, site], times,
+                                           probes, E0, krylov_dim, tol)
+
+            # Hole part is the conjugate of <c_i^dag e^-i(H-E0)t c_j>
+            G[:, :, col] += overlaps if dagger else overlaps.conj()
+
+    return -1j * np.exp(1j * mu * times)[:, None, None] * G
+
+
+def fourier_transform(times: np.ndarray, signal: np.ndarray, eta=0.1,
+                      padding=4) -> tuple[np.ndarray]:
+    """Fourier transform of a retarded function sampled on a uniform time
+    grid (trapezoidal rule, FFT),
+
+            G(w) = int_0^T dt G(t) exp(i (w + i eta) t),
+
+    so that -Im G(w) / pi is the spectral function broadened by eta.
+
+    Parameters
+    ----------
+    times: np.ndarray, size=n, default=None
+        Uniform times starting at 0.
+
+    signal: np.ndarray, shape=(n, ...), default=None
+        Function of time (ex: output of 'time_green_function').
+
+    eta: float, default=0.1
+        Damping (Lorentzian broadening). Truncation at times[-1] is
+        negligible when eta * times[-1] >> 1.
+
+    padding: int, default=4
+        Zero padding factor (frequency resolution 2 pi / (padding T)).
+
+    Returns
+    -------
+    omega, values: tuple[np.ndarray], size=2
+        Increasing frequencies and transformed signal (same trailing
+        shape).
+    """
+    times = np.asarray(times, dtype=np.float64)
+    dt = times[1] - times[0]
+
+    weights = np.full(times.size, dt)
+    weights[[0, -1]] = dt / 2
+    weights *= np.exp(-eta * times)
+
+    signal = np.asarray(signal)
+    damped = signal * weights.reshape(-1, *(1,) * (signal.ndim - 1))
+
+    n = padding * times.size
+    values = np.fft.ifft(damped, n=n, axis=0) * n
+    omega = 2 * np.pi * np.fft.fftfreq(n, dt)
+    order = np.argsort(omega)
+
+    return omega[order], values[order]
+
+
+if __name__ == "__main__":
+    from nqft.hamiltonian import Network
+
+    N = Network(shape=(2, 2))
+    times = np.linspace(0, 50, 2001)
+    G = time_green_function(N, U=8, t=1, times=times, mu=4)
+    omega, G_w = fourier_transform(times, G, eta=0.2)
+    print(-np.trace(G_w, axis1=1, axis2=2).imag / np.pi)
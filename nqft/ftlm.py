@@ -0,0 +1,248 @@
+"""This module contains the finite-temperature Lanczos method (FTLM) giving
+thermodynamic averages of the clusters of 'nqft.hamiltonian.Network'.
+
+Traces over a (N_up, N_down) sector of dimension D are sampled with R random
+vectors |r>,
+
+        Tr[A exp(-beta H)] ~ D / R sum_r sum_j <r|psi_j> <psi_j|A|r>
+                                               exp(-beta e_j),
+
+where (e_j, psi_j) are the Ritz pairs of a short Lanczos chain started from
+|r>. The chains don't depend on temperature (nor on the chemical potential,
+N being conserved), so one set of chains gives a whole temperature grid.
+"""
+
+import numpy as np
+from rich import print
+from concurrent.futures import ProcessPoolExecutor
+from scipy.linalg import eigh_tridiagonal
+
+from nqft.krylov import lanczos_chain
+
+
+def _sector_chains(task: tuple) -> tuple[np.ndarray]:
+    """Lanczos chains of one sector (run in a separate process).
+
+    Parameters
+    ----------
+    task: tuple, size=8, default=None
+        Network, N_up, N_down, U, t, number of Lanczos steps, number of
+        random vectors and seed.
+
+    Returns
+    -------
+    energies, weights, double_occ, replicas: tuple[np.ndarray], size=4
+        Ritz energies, their trace weights D |<r|psi_j>|^2, the weighted
+        double occupancies D <r|psi_j><psi_j|D|r> and the index of the
+        random vector of each Ritz pair (-1 for exact traces).
+    """
+    network, n_up, n_down, U, t, steps, samples, seed = task
+    sector = network.get_sector(n_up, n_down)
+    H = network.get_operator(U, t, sector)
+    dim = sector.dim
+    double_occ = H.double_occ.ravel().astype(np.float64)
+
+    # Krylov spaces as large as the sector: the trace is computed exactly
+    if dim <= steps:
+        energies, states = np.linalg.eigh(H @ np.eye(dim))
+        return (energies, np.ones(dim), double_occ @ np.abs(states)**2,
+                np.full(dim, -1))
+
+    rng = np.random.default_rng(seed)
+    energies, weights, occupations, replicas = [], [], [], []
+    for replica in range(samples):
+        v = rng.standard_normal(dim)
+        v /= np.linalg.norm(v)
+
+        alphas, betas, overlaps = lanczos_chain(
+            H, v, steps, probes=(double_occ * v)[:, None])
+        if alphas.size > 1:
+            theta, S = eigh_tridiagonal(alphas, betas[:-1])
+        else:
+            theta, S = alphas, np.ones((1, 1))
+
+        energies.append(theta)
+        weights.append(dim * S[0]**2)
+        occupations.append(dim * S[0] * (S.T @ overlaps[:, 0]))
+        replicas.append(np.full(theta.size, replica))
+
+    return tuple(np.concatenate(array) for array in
+                 (energies, weights, occupations, replicas))
+
+
+class FTLM:
+    """Finite-temperature Lanczos sampling of the grand canonical ensemble of
+    a cluster (every (N_up, N_down) sector). Sectors are handled in parallel
+    processes, largest first, and sectors related by spin flip are computed
+    once.
+
+    Attributes
+    ----------
+    network: Network, default=None
+        Fermions network.
+
+    U: float, default=None
+        Module of interaction between fermions.
+
+    t: float, default=None
+        Probability amplitude for fermions to jump.
+
+    steps: int, default=50
+        Number of Lanczos steps of each chain. Sectors of dimension up
+        to 'steps' are diagonalized exactly.
+
+    samples: int, default=20
+        Number of random vectors per sector (also the number of
+        jackknife blocks of the error bars).
+
+    seed: int, default=None
+        Seed of the random vectors.
+
+    Examples
+    --------
+    >>> from nqft.hamiltonian import Network
+    >>> ftlm = FTLM(Network(shape=(2, 2)), U=8, t=1, seed=0).run()
+    >>> obs = ftlm.thermodynamics([0.5], mu=4)
+    >>> obs['double_occupancy'].round(4), obs['double_occupancy_err'].round(4)
+    (array([0.0237]), array([0.]))
+
+    (2x2 sectors are smaller than 'steps': traces are exact, without error
+    bars.)
+    """
+
+    def __init__(self, network, U: float, t: float, steps=50, samples=20,
+                 seed=None) -> None:
+        """Sets attributes to given values.
+        """
+        self.network = network
+        self.U = U
+        self.t = t
+        self.steps = steps
+        self.samples = samples
+        self.seed = seed
+        self.energies = None
+        return
+
+    def run(self, workers=None) -> "FTLM":
+        """Computes the Lanczos chains of every sector.
+
+        Parameters
+        ----------
+        workers: int, default=None
+            Number of processes (default is the number of processors).
+
+        Returns
+        -------
+        self: FTLM
+            Sampler with attributes 'energies', 'weights', 'double_occ',
+            'particles' and 'replicas' (one entry per Ritz pair).
+        """
+        n = self.network.sites
+        sectors = [(n_up, n_down) for n_up in range(n + 1)
+                   for n_down in range(n_up + 1)]
+        dims = [self.network.get_sector(*s).dim for s in sectors]
+        sectors = [sectors[idx] for idx in np.argsort(dims)[::-1]]
+
+        seeds = np.random.SeedSequence(self.seed).spawn(len(sectors))
+        tasks = [(self.network, n_up, n_down, self.U, self.t, self.steps,
+                  self.samples, seed) for (n_up, n_down), seed in
+                 zip(sectors, seeds)]
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            chains = list(executor.map(_sector_chains, tasks))
+
+        columns = [[], [], [], [], []]
+        for (n_up, n_down), chain in zip(sectors, chains):
+            # (N_down, N_up) sector has the same spectrum
+            multiplicity = 1 if n_up == n_down else 2
+            energies, weights, double_occ, replicas = chain
+
+            columns[0].append(energies)
+            columns[1].append(multiplicity * weights)
+            columns[2].append(multiplicity * double_occ)
+            columns[3].append(np.full(energies.size, n_up + n_down))
+            columns[4].append(replicas)
+
+        (self.energies, self.weights, self.double_occ, self.particles,
+         self.replicas) = (np.concatenate(column) for column in columns)
+
+        return self
+
+    def thermodynamics(self, temperatures: np.ndarray, mu=0.0) -> dict:
+        """Thermal averages on a temperature grid, with jackknife error bars
+        over the random vectors.
+
+        Parameters
+        ----------
+        temperatures: np.ndarray, default=None
+            Temperatures (in units of t).
+
+        mu: float, default=0.0
+            Chemical potential.
+
+        Returns
+        -------
+        -: dict
+            Arrays over temperatures, per site: 'energy' (<H>), 'density',
+            'double_occupancy', 'specific_heat' and 'entropy' (both of
+            H - mu N), each with its '_err' counterpart, plus
+            'temperature'.
+        """
+        if self.energies is None:
+            self.run()
+
+        temperatures = np.atleast_1d(np.asarray(temperatures, dtype=float))
+        beta = 1 / temperatures
+
+        # Energies are shifted by the lowest one to avoid overflows
+        grand = self.energies - mu * self.particles
+        e_min = grand.min()
+        table = np.column_stack([
+            self.weights, self.weights * grand, self.weights * grand**2,
+            self.double_occ, self.weights * self.particles
+        ])
+
+        def moments(entries):
+            boltzmann = np.exp(-np.outer(beta, grand[entries] - e_min))
+            return boltzmann @ table[entries]
+
+        exact = moments(self.replicas == -1)
+        sums = np.array([moments(self.replicas == replica) + exact
+                         for replica in range(self.samples)])
+
+        sites = self.network.sites
+        total = sums.sum(axis=0)
+
+        def averages(sums, count):
+            Z, K, K2, D, N = np.moveaxis(sums, -1, 0)
+            K, K2 = K / Z, K2 / Z
+            N = N / Z
+            return {
+                'energy': (K + mu * N) / sites,
+                'density': N / sites,
+                'double_occupancy': D / Z / sites,
+                'specific_heat': beta**2 * (K2 - K**2) / sites,
+                'entropy': (np.log(Z / count) + beta * (K - e_min)) / sites
+            }
+
+        observables = averages(total, self.samples)
+        if self.samples > 1:
+            blocks = [averages(total - block, self.samples - 1)
+                      for block in sums]
+        for key in list(observables):
+            if self.samples > 1:
+                values = np.array([block[key] for block in blocks])
+                observables[key + '_err'] = np.sqrt(
+                    (self.samples - 1) * values.var(axis=0))
+            else:
+                observables[key + '_err'] = np.zeros_like(temperatures)
+        observables['temperature'] = temperatures
+
+        return observables
+
+
+if __name__ == "__main__":
+    from nqft.hamiltonian import Network
+
+    ftlm = FTLM(Network(shape=(2, 2)), U=8, t=1, seed=0).run()
+    print(ftlm.thermodynamics(np.linspace(0.2, 2, 10), mu=4))
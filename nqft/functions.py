@@ -16,6 +16,14 @@ from scipy.constants import pi
 from matplotlib.colors import LinearSegmentedColormap
 
 
+# Hopping links of the t, t' and t'' operators (as in 'qcm.QcmModel')
+LINKS = {
+    't': [(1, 0), (0, 1)],
+    'tp': [(1, 1), (-1, 1)],
+    'tpp': [(2, 0), (0, 2)],
+}
+
+
 def timeit(func):
     @wraps(func)
     def timeit_wrapper(*args, **kwargs):
@@ -78,6 +86,161 @@ def delta(j: int, k: int) -> float:
     return 1.0 if j == k else 0.0
 
 
+def build_matrix(shape: tuple) -> list:
+    """Gives a coordinates matrix of a cluster having
+    shape[0]*shape[1] sites.
+
+    Parameters
+    ----------
+    shape: tuple, shape=(2, 1), default=None
+        Shape of sites network.
+
+    Returns
+    -------
+    array: list, shape=(*shape)
+        Nested lists of coordinates.
+
+    Examples
+    --------
+    >>> build_matrix(shape=(2, 2))
+    [[0, 0, 0], [1, 0, 0], [0, 1, 0], [1, 1, 0]]
+    """
+    array, idty = [], np.identity(3, dtype=np.int16)
+    for i in range(shape[0]):
+        for j in range(shape[1]):
+            elem = i * idty[1] + j * idty[0]
+            array.append(elem.tolist())
+
+    return array
+
+
+def build_superlattice(shape: tuple, tiling_shift: bool) -> list:
+    """Gives the super-vectors tiling the lattice with clusters of given
+    shape.
+
+    Parameters
+    ----------
+    shape: tuple, shape=(2, 1), default=None
+        Shape of sites network.
+
+    tiling_shift: bool, default=None
+        Determines if super-vectors are shifted or exactly orthogonals.
+
+    Returns
+    -------
+    -: list, shape=(2, 3)
+        Super-vectors coordinates.
+
+    Examples
+    --------
+    >>> build_superlattice(shape=(3, 4), tiling_shift=True)
+    [[4, 0, 0], [1, 3, 0]]
+    """
+    if tiling_shift:
+        return [[shape[1], 0, 0], [1, shape[0], 0]]
+
+    return [[shape[1], 0, 0], [0, shape[0], 0]]
+
+
+def cluster_bonds(shape: tuple, tiling_shift: bool) -> dict:
+    """Lists every hopping of the lattice starting from a site of the
+    reference cluster, as (site i, site j, super-vector R) such that the
+    hopping links r_i to r_j + R.
+
+    Parameters
+    ----------
+    shape: tuple[int], size=2, default=None
+        Shape of the source cluster as: (rows, columns).
+
+    tiling_shift: bool, default=None
+        Determines if super-vectors are shifted or exactly orthogonals.
+
+    Returns
+    -------
+    bonds: dict
+        Operator names ('t', 'tp', 'tpp') as keys and integer arrays of shape
+        (M, 4) as values, each row being (i, j, R_x, R_y).
+    """
+    positions = np.array(build_matrix(shape))[:, :2]
+    super_vecs = np.array(build_superlattice(shape, tiling_shift))[:, :2]
+
+    # Every lattice position as (cluster site, super-vector)
+    lookup = {}
+    for n_1 in range(-3, 4):
+        for n_2 in range(-3, 4):
+            R = n_1 * super_vecs[0] + n_2 * super_vecs[1]
+            for site, r in enumerate(positions):
+                lookup[tuple(r + R)] = (site, *R)
+
+    bonds = {}
+    for name, links in LINKS.items():
+        rows = []
+        for link in links:
+            for sign in (1, -1):
+                for site, r in enumerate(positions):
+                    rows.append(
+                        (site, *lookup[tuple(r + sign * np.array(link))]))
+
+        bonds[name] = np.array(rows, dtype=np.int64)
+
+    return bonds
+
+
+def network_bonds(shape: tuple, hoppings=(1.0, 0.0, 0.0),
+                  boundary="open") -> tuple:
+    """Lists the hoppings between sites of a single cluster, as used by the
+    exact diagonalization solver ('nqft.hamiltonian.Network').
+
+    With open boundaries only the links inside the cluster are kept. With
+    periodic (or tilted, using shifted super-vectors) boundaries links
+    leaving the cluster are folded back onto it, as with 'boundary="wrap"'
+    in 'nqft.monte_carlo.build_h': equivalent links are summed and links
+    from a site onto itself become on-site energies.
+
+    Parameters
+    ----------
+    shape: tuple[int], size=2, default=None
+        Shape of the cluster as: (rows, columns).
+
+    hoppings: tuple[float], size=3, default=(1.0, 0.0, 0.0)
+        Amplitudes of the (t, t', t'') links.
+
+    boundary: str, default='open'
+        Boundary conditions ('open', 'periodic' or 'tilted').
+
+    Returns
+    -------
+    bonds, onsite: tuple, size=2
+        Bonds as a list of (i, j, amplitude) with i < j, each standing for
+        amplitude * (c_i^dag c_j + c_j^dag c_i), and on-site amplitudes
+        (np.array, size=sites).
+
+    Examples
+    --------
+    >>> network_bonds((1, 3), hoppings=(1.0, 0.0, 0.2))
+    ([(0, 1, 1.0), (0, 2, 0.2), (1, 2, 1.0)], array([0., 0., 0.]))
+    """
+    if boundary not in ("open", "periodic", "tilted"):
+        raise ValueError(f"Unknown boundary conditions: {boundary}")
+
+    sites = shape[0] * shape[1]
+    amplitudes = np.zeros((sites, sites))
+    for name, hop in zip(LINKS, hoppings):
+        rows = cluster_bonds(shape, boundary == "tilted")[name]
+        if boundary == "open":
+            rows = rows[(rows[:, 2] == 0) & (rows[:, 3] == 0)]
+
+        # Each directed link c_i^dag c_j of the lattice appears once
+        np.add.at(amplitudes, (rows[:, 0], rows[:, 1]), hop)
+
+    i, j = np.triu_indices(sites, k=1)
+    nonzero = amplitudes[i, j] != 0
+    bonds = [(int(a), int(b), float(amp)) for a, b, amp in
+             zip(i[nonzero], j[nonzero], amplitudes[i, j][nonzero])]
+
+    return bonds, np.diag(amplitudes).copy()
+
+
 def read_fermi_arc(path="./nqft/Data/fermi_arc_data", size=36,
                    res=200) -> dict:
     """Reads Peter's data on spectral weight at Fermi
@@ -250,6 +413,179 @@ def add_column(file: str, column: np.array, idx: int) -> None:
     return
 
 
+def irreducible_quadrant(array: np.ndarray) -> np.ndarray:
+    """Gives the irreducible quadrant (k_x >= 0, k_y >= 0) of a spectral
+    function computed on a 'np.linspace(-pi, pi, N)' momentum grid and
+    symmetric under both mirrors k_x -> -k_x and k_y -> -k_y ('RXY').
+
+    Parameters
+    ----------
+    array: np.ndarray, shape=(..., N, N), default=None
+        Spectral function(s) over the full Brillouin zone.
+
+    Returns
+    -------
+    -: np.ndarray, shape=(..., N - N // 2, N - N // 2)
+        View of the irreducible quadrant.
+
+    Examples
+    --------
+    >>> irreducible_quadrant(np.arange(9).reshape(3, 3))
+    array([[4, 5],
+           [7, 8]])
+    """
+    half = array.shape[-1] // 2
+
+    return array[..., half:, half:]
+
+
+def unfold_quadrant(quadrant: np.ndarray, resolution: int) -> np.ndarray:
+    """Rebuilds the full Brillouin zone from its irreducible quadrant (see
+    'irreducible_quadrant') using mirror symmetries.
+
+    Parameters
+    ----------
+    quadrant: np.ndarray, shape=(..., M, M), default=None
+        Irreducible quadrant of the spectral function(s).
+
+    resolution: int, default=None
+        Resolution N of the full momentum grid (M = N - N // 2).
+
+    Returns
+    -------
+    -: np.ndarray, shape=(..., N, N)
+        Spectral function(s) over the full Brillouin zone.
+
+    Examples
+    --------
+    >>> unfold_quadrant(np.array([[4, 5], [7, 8]]), 3)
+    array([[8, 7, 8],
+           [5, 4, 5],
+           [8, 7, 8]])
+    """
+    start = resolution % 2
+    rows = np.concatenate(
+        [quadrant[..., start:, :][..., ::-1, :], quadrant], axis=-2)
+
+    return np.concatenate(
+        [rows[..., start:][..., ::-1], rows], axis=-1)
+
+
+def quadrant_weights(resolution: int) -> np.ndarray:
+    """Multiplicity of each point of the irreducible quadrant inside the full
+    momentum grid, used to compute Brillouin zone sums on the reduced domain.
+
+    Parameters
+    ----------
+    resolution: int, default=None
+        Resolution N of the full momentum grid.
+
+    Returns
+    -------
+    weights: np.ndarray, shape=(N - N // 2, N - N // 2)
+        Multiplicities (1, 2 or 4).
+
+    Examples
+    --------
+    >>> quadrant_weights(3)
+    array([[1., 2.],
+           [2., 4.]])
+    """
+    weights = np.full(resolution - resolution // 2, 2.0)
+    weights[0] = 1.0 if resolution % 2 else 2.0
+
+    return np.outer(weights, weights)
+
+
+def append_lines(file: str, lines: list[str]) -> None:
+    """Appends lines to a text file, joined into one string. The file is
+    opened in append mode, so the cost doesn't depend on its size. Writes of
+    concurrent processes aren't synchronized.
+
+    Parameters
+    ----------
+    file: str, default=None
+        Text file in which append lines.
+
+    lines: list[str], default=None
+        Lines to append (without line breaks).
+    """
+    with open(file, "a") as target:
+        target.write("".join(f"{line}\n" for line in lines))
+
+    return
+
+
+def high_symmetry_path(points=((0, 0), (pi, 0), (pi, pi), (0, 0)),
+                       n_points=100) -> tuple[np.ndarray, np.array]:
+    """Gives wavevectors along a path joining high symmetry points of the
+    Brillouin zone (Gamma-X-M-Gamma by default).
+
+    Parameters
+    ----------
+    points: array-like, shape=(P, 2), default=((0, 0), (pi, 0), (pi, pi),
+    (0, 0))
+        Corners of the path.
+
+    n_points: int, default=100
+        Number of wavevectors on each segment of the path.
+
+    Returns
+    -------
+    k, distance: tuple[np.ndarray, np.array], size=2
+        Wavevectors of shape (K, 2) and their distance along the path.
+
+    Examples
+    --------
+    >>> k, d = high_symmetry_path(((0, 0), (pi, 0)), n_points=2)
+    >>> k
+    array([[0.        , 0.        ],
+           [1.57079633, 0.        ],
+           [3.14159265, 0.        ]])
+    """
+    points = np.asarray(points, dtype=np.float64)
+    steps = np.linspace(0, 1, n_points, endpoint=False)[:, None]
+
+    segments = [start + steps * (stop - start)
+                for start, stop in zip(points[:-1], points[1:])]
+    k = np.concatenate(segments + [points[-1:]])
+
+    jumps = np.linalg.norm(np.diff(k, axis=0), axis=1)
+    distance = np.concatenate([[0.0], np.cumsum(jumps)])
+
+    return k, distance
+
+
+def write_path_spectrum(file: str, distance: np.array, omegas: np.array,
+                        rows) -> None:
+    """Writes spectral functions along a path as they are computed, in
+    gnuplot 'pm3d' format (one block of 'distance w A' lines per wavevector).
+
+    Parameters
+    ----------
+    file: str, default=None
+        Path to output text file.
+
+    distance: np.array, size=K, default=None
+        Distance of each wavevector along the path.
+
+    omegas: np.array, size=Z, default=None
+        Frequencies.
+
+    rows: iterable, size=K, default=None
+        Spectral function A(k, w) of each wavevector (ex: a generator).
+    """
+    with open(file, "w") as output:
+        output.write("# distance w A\n")
+        for dist, row in zip(distance, rows):
+            np.savetxt(output, np.column_stack(
+                [np.full(omegas.size, dist), omegas, row]))
+            output.write("\n")
+            output.flush()
+
+    return
+
+
 def make_cmap(ramp_colors: list) -> LinearSegmentedColormap:
     """Makes a custom colormap to use in matplotlib 'contourf' or any plot
     using a colorbar.
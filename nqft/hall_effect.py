@@ -4,11 +4,18 @@ spin-density wave.
 
 import numpy as np
 from rich import print
+from functools import lru_cache
 from scipy.constants import pi
 import matplotlib.pyplot as plt
 from numpy import arange, meshgrid, sin, cos, exp, linspace
 
-from nqft.functions import read_fermi_arc, find_nearest, make_cmap, timeit
+from nqft.functions import (
+    read_fermi_arc,
+    find_nearest,
+    make_cmap,
+    timeit,
+    quadrant_weights
+)
 
 
 @timeit
@@ -65,13 +72,94 @@ def get_energies(hops: tuple[float], kx: np.ndarray, ky: np.ndarray,
     )
     """
     # Energy
+    E = (get_dispersion(hops, kx, ky)[..., None] - mus).T
+
+    return E, get_derivatives(hops, kx, ky)
+
+
+def get_dispersion(hops: tuple[float], kx: np.ndarray,
+                   ky: np.ndarray) -> np.ndarray:
+    """Outputs non-interacting dispersion of the t-tp-tpp model.
+
+    Parameters
+    ----------
+    hops: tuple, default=None
+        Hopping amplitudes coefficients.
+
+    kx: np.ndarray, default=None
+        kx coordinates (any shape).
+
+    ky: np.ndarray, default=None
+        ky coordinates (same shape as kx).
+
+    Returns
+    -------
+    -: np.ndarray
+        Energies at given wavevectors.
+    """
     t, tp, tpp = hops
     a = -2 * t * (cos(kx) + cos(ky))
     b = -2 * tp * (cos(kx + ky) + cos(kx - ky))
     c = -2 * tpp * (cos(2 * kx) + cos(2 * ky))
 
-    E = ((a + b + c)[..., None] - mus).T
+    return a + b + c
 
+
+def path_spectral_weight(hops: tuple[float], k: np.ndarray,
+                         omegas: np.array, eta: float, mu=0.0):
+    """Yields non-interacting spectral function A(k, w) along a path, one
+    wavevector at a time, for a dense frequency grid.
+
+    Parameters
+    ----------
+    hops: tuple, default=None
+        Hopping amplitudes coefficients.
+
+    k: np.ndarray, shape=(K, 2), default=None
+        Wavevectors of the path (see 'nqft.functions.high_symmetry_path').
+
+    omegas: np.array, size=Z, default=None
+        Frequencies.
+
+    eta: float, default=None
+        Lorentzian broadening module.
+
+    mu: float, default=0.0
+        Chemical potential.
+
+    Yields
+    ------
+    -: np.array, size=Z
+        Spectral function of each wavevector.
+    """
+    energies = get_dispersion(hops, k[:, 0], k[:, 1]) - mu
+
+    for energy in energies:
+        yield -1 / pi * (1 / (omegas + eta * 1j - energy)).imag
+
+
+def get_derivatives(hops: tuple[float], kx: np.ndarray,
+                    ky: np.ndarray) -> dict:
+    """Outputs model's energy derivatives.
+
+    Parameters
+    ----------
+    hops: tuple, default=None
+        Hopping amplitudes coefficients.
+
+    kx: np.ndarray, shape=(N, N), default=None
+        kx space as a 2D array.
+
+    ky: np.ndarray, shape=(N, N), default=None
+        ky space as a 2D array.
+
+    Returns
+    -------
+    dEs: dict, size=5
+        First and second derivatives of energy ('dE_dx', 'ddE_dxx', 'dE_dy',
+        'ddE_dyy', 'ddE_dxdy').
+    """
+    t, tp, tpp = hops
     dEs = {
         'dE_dx': None,
         'ddE_dxx': None,
@@ -101,7 +189,74 @@ def get_energies(hops: tuple[float], kx: np.ndarray, ky: np.ndarray,
     # Mixed derivative
     dEs['ddE_dxdy'] = 2 * tp * (cos(kx + ky) - cos(kx - ky))
 
-    return E, dEs
+    return dEs
+
+
+@lru_cache(maxsize=16)
+def _hall_kernels(resolution: int, hops: tuple[float],
+                  quadrant: bool) -> np.ndarray:
+    """Conductivity kernels (dE_dx^2, dE_dy^2, sigma_xy kernel) flattened
+    over the momentum grid and cached by (resolution, hoppings, quadrant).
+    """
+    momentum = linspace(-pi, pi, resolution)
+    if quadrant:
+        momentum = momentum[resolution // 2:]
+        weights = quadrant_weights(resolution)
+    else:
+        weights = 1.0
+
+    kx, ky = meshgrid(momentum, momentum)
+    dEs = get_derivatives(hops, kx, ky)
+
+    c1 = -2 * dEs['dE_dx'] * dEs['dE_dy'] * dEs['ddE_dxdy']
+    c2 = dEs['dE_dx']**2 * dEs['ddE_dyy']
+    c3 = dEs['dE_dy']**2 * dEs['ddE_dxx']
+
+    kernels = weights * np.array([dEs['dE_dx']**2, dEs['dE_dy']**2,
+                                  c1 + c2 + c3])
+    kernels = kernels.reshape(3, -1)
+    kernels.flags.writeable = False
+
+    return kernels
+
+
+def get_hall_numbers(spectral_weights: np.ndarray, hops: tuple[float],
+                     resolution=None) -> np.array:
+    """Computes Hall numbers of a stack of spectral weights with a single
+    vectorized reduction, reusing conductivity kernels cached by resolution
+    and hoppings.
+
+    Parameters
+    ----------
+    spectral_weights: np.ndarray, shape=(M, N, N), default=None
+        Spectral weights on the 'linspace(-pi, pi, N)' momentum grid.
+
+    hops: tuple, size=3, default=None
+        Hopping amplitudes coefficients.
+
+    resolution: int, default=None
+        Resolution of the full momentum grid when 'spectral_weights' are only
+        its irreducible quadrants (see 'nqft.functions.irreducible_quadrant').
+
+    Returns
+    -------
+    n_H: np.array, size=M
+        Hall numbers.
+    """
+    spectral_weights = np.asarray(spectral_weights)
+    quadrant = bool(resolution)
+    resolution = resolution or spectral_weights.shape[-1]
+    kernels = _hall_kernels(
+        resolution, tuple(float(hop) for hop in hops), quadrant)
+
+    A = spectral_weights.reshape(spectral_weights.shape[0], -1)
+    A_2 = A**2
+
+    s_xx, s_yy = -1 * (A_2 @ kernels[:2].T).T
+    s_xy = -1 * ((A_2 * A) @ kernels[2])
+    n_H = 6 / resolution**2 * s_xx * s_yy / s_xy
+
+    return n_H
 
 
 @timeit
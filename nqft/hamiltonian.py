@@ -1,14 +1,21 @@
-"""This module tests Qutip python library functions, objects and
-attributes in the context of Hubbard model using square fermion
-networks.
+"""This module contains the exact diagonalization solver of Hubbard model
+on square fermion networks, working on Fock states stored as integer
+bitmasks (see 'nqft.basis').
 """
 
 import numpy as np
 from rich import print
-from rich.progress import track
-from qutip import Qobj, basis, create, destroy, num, tensor, identity
+from scipy.sparse.linalg import LinearOperator, eigsh
+from scipy.sparse import csc_matrix, csr_matrix, diags, kron
+from scipy.sparse import identity as sparse_identity
 
-from nqft.functions import scalar, delta
+from nqft.lehmann import LehmannGF
+from nqft.functions import network_bonds
+from nqft.basis import (Sector, add_particle, hopping_matrix, occupations,
+                        popcount, rank, remove_particle, site_bit)
+from nqft.krylov import block_lanczos, block_tridiagonal, lanczos
+from nqft.symmetry import momentum_spectra
+from nqft.sectors import ground_state_sector, sector_spectra
 
 
 class Network:
@@ -17,79 +24,191 @@ class Network:
     Attributes
     ----------
     sites_nb: int, default=None
-        Number of sites of the network
+        Number of sites of the network (a chain if 'shape' isn't given).
 
-    vaccum: Qobj, shape=(2, 1)
-        Vaccum state of 2D Fock space.
+    shape: tuple[int], size=2, default=(1, sites_nb)
+        Shape of the square lattice cluster as: (rows, columns).
 
-    creation: Qobj, shape=(2, 2)
-        Creation operator in second quantization formalism.
+    hoppings: tuple[float], size=3, default=(1.0, 0.0, 0.0)
+        Amplitudes of the (t, t', t'') links in units of 't'.
 
-    anihilation: Qobj, shape=(2, 2)
-        Anihilation operator in second quantization formalism.
+    boundary: str, default='open'
+        Boundary conditions ('open', 'periodic' or 'tilted').
 
-    number: Qobj, shape=(2, 2)
-        Number operator in second quantization formalism.
+    bonds: list[tuple]
+        Hoppings between sites as (i, j, amplitude) (see
+        'nqft.functions.network_bonds').
 
-    I: Qobj, shape=(2, 2)
-        Identity operator.
+    onsite: np.array, size=sites
+        On-site amplitudes coming from links folded by boundary conditions.
+
+    amplitudes: np.ndarray, shape=(sites, sites)
+        Hopping amplitudes between sites (on-site ones on the diagonal).
     """
 
-    def __init__(self, sites_nb: int) -> None:
+    def __init__(self, sites_nb=None, shape=None, hoppings=(1.0, 0.0, 0.0),
+                 boundary="open") -> None:
         """Sets Network attributes to given values and computes
         the other ones.
         """
-        self.sites = sites_nb
-        self.vaccum = basis(2)
-        self.creation = create(2)
-        self.anihilation = destroy(2)
-        self.number = num(2)
-        self.idty = identity(2)
+        self.shape = tuple(shape) if shape else (1, sites_nb)
+        self.sites = self.shape[0] * self.shape[1]
+        self.hoppings = tuple(hoppings)
+        self.boundary = boundary
+        self.bonds, self.onsite = network_bonds(self.shape, self.hoppings,
+                                                boundary)
+
+        self.amplitudes = np.diag(self.onsite)
+        for i, j, amplitude in self.bonds:
+            self.amplitudes[i, j] = self.amplitudes[j, i] = amplitude
         return
 
-    def get_state(self, state: int, type="ket") -> Qobj:
-        """Gives array-like representation of given state using
-        Qutip 'tensor' operation.
+    def get_state(self, state: int, type="ket", sector=None):
+        """Gives the sparse vector representation of a Fock state.
 
         Parameters
         ----------
         state: int, default=None
-            Integer representing state number in Fock space.
+            Integer representing state number in Fock space (its binary
+            string reads the occupations of sites 0 up, ..., N-1 up,
+            0 down, ..., N-1 down).
 
         type: str, default='ket'
             Type of vector outputed (bra, ket)
 
+        sector: Sector, default=None
+            Basis of the vector (full Fock space if None).
+
         Returns
         -------
-        bra, ket: qutip.Qobj, shape=(4^SITES, 1)
-            Full vector representation.
+        bra, ket: scipy.sparse.csr_matrix or csc_matrix, shape=(1, dim)
+            or (dim, 1)
+            Vector with a single non-zero element.
 
         Examples
         --------
         >>> N = Network(sites_nb=1)
-        >>> self.get_state(state=2)
-        Quantum object: dims = [[2, 2], [1, 1]], shape = (4, 1), type = ket
-        Qobj data =
-        [[0.]
-         [0.]
-         [1.]
-         [0.]]
+        >>> N.get_state(state=2).toarray().ravel()
+        array([0., 0., 1., 0.])
         """
-        binairy = format(state, "b").zfill(self.sites * 2)
-        ket = [*binairy]
+        dim = 4**self.sites if sector is None else sector.dim
+        index = self.state_index([state], sector)[0]
 
-        vec_state = []
-        for presence in ket:
-            if int(presence):
-                vec_state.append(self.creation * self.vaccum)
-            else:
-                vec_state.append(self.vaccum)
+        if type == "bra":
+            return csr_matrix(([1.0], [index], [0, 1]), shape=(1, dim))
+
+        return csc_matrix(([1.0], [index], [0, 1]), shape=(dim, 1))
+
+    def basis_states(self, sector=None) -> np.ndarray:
+        """Fock states of a basis as integer bitmasks.
+
+        Parameters
+        ----------
+        sector: Sector, default=None
+            Basis (full Fock space if None).
+
+        Returns
+        -------
+        -: np.ndarray[np.uint64], size=dim
+            State at each position of the basis.
+        """
+        if sector is None:
+            return np.arange(4**self.sites, dtype=np.uint64)
+
+        return sector.states()
+
+    def state_index(self, states: np.ndarray, sector=None) -> np.ndarray:
+        """Positions of Fock states inside a basis (inverse of
+        'basis_states').
+
+        Parameters
+        ----------
+        states: np.ndarray, default=None
+            Integer representations of states.
+
+        sector: Sector, default=None
+            Basis (full Fock space if None).
+
+        Returns
+        -------
+        -: np.ndarray[np.int64]
+        """
+        if sector is None:
+            return np.asarray(states, dtype=np.int64)
+
+        return sector.index(states)
+
+    def matrix_element(self, bra, ket, U: float, t: float):
+        """Computes <bra|H|ket> of Hubbard hamiltonian directly from the bits
+        of both states, without building the hamiltonian.
+
+        Parameters
+        ----------
+        bra: int or np.ndarray, default=None
+            Integer representation(s) of the left state(s).
+
+        ket: int or np.ndarray, default=None
+            Integer representation(s) of the right state(s).
+
+        U: float, default=None
+            Module of interaction between fermions.
+
+        t: float, default=None
+            Probability amplitude for fermions to jump.
+
+        Returns
+        -------
+        -: float or np.ndarray
+            Matrix element(s), broadcast over 'bra' and 'ket'.
+
+        Examples
+        --------
+        >>> N = Network(sites_nb=2)
+        >>> N.matrix_element(bra=6, ket=5, U=2, t=1)
+        -1.0
+        """
+        bra, ket = np.broadcast_arrays(np.asarray(bra, dtype=np.uint64),
+                                       np.asarray(ket, dtype=np.uint64))
+        shift = np.uint64(self.sites)
+        word_mask = np.uint64(2**self.sites - 1)
+        up, down = ket >> shift, ket & word_mask
+
+        # Diagonal: interaction and on-site terms
+        densities = occupations(up, self.sites) \
+            + occupations(down, self.sites)
+        element = np.where(
+            bra == ket,
+            U * self._double_occupancy(up, down)
+            - t * (densities @ self.onsite),
+            0.0)
+
+        # A single hop of one spin species changes exactly two bits
+        for words, flips, other in (
+                (up, (bra >> shift) ^ up, (bra & word_mask) ^ down),
+                (down, (bra & word_mask) ^ down, (bra >> shift) ^ up)):
+            hop = (popcount(flips) == 2) & (other == 0) \
+                & (popcount(words & flips) == 1)
 
-        vec = tensor(*vec_state)
+            # Positions of both bits (dummy ones where there is no hop)
+            flips = np.where(hop, flips, np.uint64(3))
+            low = flips & (~flips + np.uint64(1))
+            p_low = np.log2(low.astype(np.float64)).astype(np.uint64)
+            p_high = np.log2((flips ^ low).astype(np.float64)).astype(
+                np.uint64)
 
-        return vec.dag() if type == "bra" else vec
+            # Fermions strictly between both sites give the sign
+            between = ((np.uint64(1) << p_high) - np.uint64(1)) \
+                ^ ((np.uint64(1) << (p_low + np.uint64(1))) - np.uint64(1))
+            signs = 1 - 2 * (popcount(words & between) & 1)
 
-    def get_hamiltonian(self, model: str, U: int, **kwargs) -> Qobj:
+            i = self.sites - 1 - p_low.astype(np.int64)
+            j = self.sites - 1 - p_high.astype(np.int64)
+            element = element + np.where(
+                hop, -t * self.amplitudes[i, j] * signs, 0.0)
+
+        return float(element) if element.ndim == 0 else element
+
+    def get_hamiltonian(self, model: str, U: int, **kwargs) -> csr_matrix:
         """Outputs the hamiltonian of fermion network using
         specified many-body model.
 
@@ -103,74 +222,649 @@ class Network:
 
         **kwargs:
             t: int, default=None
-                Probability amplitude for fermions to jump.
+                Probability amplitude for fermions to jump ('Hubbard').
+
+            energies, hybridizations, mu: default=None
+                Bath of the Anderson impurity model ('AIM', see
+                'AndersonImpurity'), site 0 being the impurity.
+
+            cache: nqft.cache.EDCache, default=None
+                Reads (or stores) hopping and interaction terms on disk.
 
         Returns
         -------
-        H: qutip.Qobj, shape=(4^SITES, 4^SITES)
-            Tensor object representing hamitonian for given 'model'.
+        H: scipy.sparse.csr_matrix, shape=(4^SITES, 4^SITES)
+            Sparse matrix representing hamitonian for given 'model' in the
+            basis of 'get_state' (row n is the Fock state of integer n).
 
         Examples
         --------
         >>> N = Network(sites_nb=4)
         >>> N.get_hamiltonian(model="Hubbard", U=1, t=1)
-        Quantum object: dims = [[2, 2, 2, 2, 2, 2, 2, 2],
-        [2, 2, 2, 2, 2, 2, 2, 2]], shape = (256, 256), type = oper,
-        isherm = True Qobj data =
-        [[ 0.  0.  0. ...  0.  0.  0.]
-         [ 0.  0. -1. ...  0.  0.  0.]
-         [ 0. -1.  0. ...  0.  0.  0.]
-         ...
-         [ 0.  0.  0. ...  3. -1.  0.]
-         [ 0.  0.  0. ... -1.  3.  0.]
-         [ 0.  0.  0. ...  0.  0.  4.]]
+        <Compressed Sparse Row sparse matrix of dtype 'float64'
+            with 943 stored elements and shape (256, 256)>
         """
-        # --------------------------------------------------------------------
-        # TODO: Replace list comprehensions by advanced indexing numpy arrays
-        # --------------------------------------------------------------------
+        cache = kwargs.pop("cache", None)
         if model == "Hubbard":
-            H1, H2 = 0, 0
             (t,) = kwargs.values()
+            H1, H2 = self.get_hamiltonian_terms() if cache is None \
+                else cache.hamiltonian_terms(self)
+            H = (U * H1 - t * H2).tocsr()
 
-            for idx in track(range(self.sites), description="Hamitonian"):
-                sites = [i for i in range(self.sites)]
-                ops_1 = [self.idty for i in range(self.sites * 2)]
+        elif model == "AIM":
+            impurity = AndersonImpurity(**kwargs)
+            if impurity.sites != self.sites:
+                raise ValueError(f"AIM needs {self.sites - 1} bath sites, "
+                                 f"got: {impurity.sites - 1}")
+            H1, H2 = impurity.get_hamiltonian_terms()
+            H = (U * H1 - H2).tocsr()
 
-                ops_1[idx] = self.number
-                ops_1[self.sites + idx] = self.number
+        else:
+            raise ValueError(f"Unknown model: {model}")
 
-                sites.remove(idx)
-                H1 += tensor(*ops_1)
+        return H
 
-                for ext in sites:
-                    ops_2_up = [self.idty for i in range(self.sites * 2)]
-                    ops_2_down = [self.idty for i in range(self.sites * 2)]
+    def get_hamiltonian_terms(self, sector=None) -> tuple[csr_matrix]:
+        """Outputs separately the interaction and hopping terms of Hubbard
+        hamiltonian (H = U * H1 - t * H2) so they can be reused for many
+        values of U and t.
 
-                    ops_2_up[idx] = self.creation
-                    ops_2_up[ext] = self.anihilation
+        Both terms are built directly in the occupation number basis: the
+        hopping acts on each spin word separately (H2 = T x I + I x T, with
+        fermionic signs) and the interaction is diagonal.
 
-                    ops_2_down[self.sites + idx] = self.creation
-                    ops_2_down[self.sites + ext] = self.anihilation
+        Parameters
+        ----------
+        sector: Sector, default=None
+            Restricts the terms to a (N_up, N_down) sector (see
+            'get_sector'). The full Fock space is used if None.
 
-                    H2 += tensor(*ops_2_up) + tensor(*ops_2_down)
+        Returns
+        -------
+        H1, H2: tuple[scipy.sparse.csr_matrix], shape=(dim, dim)
+            Interaction (double occupancy) and hopping operators.
+        """
+        T_up, T_down, up_words, down_words = self.get_spin_hoppings(sector)
 
-            H = U * H1 - t * H2
+        H2 = (kron(T_up, sparse_identity(down_words.size))
+              + kron(sparse_identity(up_words.size), T_down)).tocsr()
 
-        elif model != "Hubbard":
-            # -------------------------
-            # Potentially add AIM model
-            # -------------------------
-            pass
+        H1 = diags(self.get_diagonal(U=1.0, sector=sector), format='csr')
 
-        return H
+        return H1, H2
+
+    def get_spin_hoppings(self, sector=None) -> tuple:
+        """Outputs the hopping operators acting on spin up and spin down words
+        (sum over 'bonds' of amplitude * (c_i^dag c_j + h.c.) for one spin
+        species). They are tiny compared to the many-body hamiltonian, which
+        is their Kronecker sum.
+
+        Parameters
+        ----------
+        sector: Sector, default=None
+            Restricts the words to a (N_up, N_down) sector (see
+            'get_sector'). Every word is used if None.
+
+        Returns
+        -------
+        T_up, T_down, up_words, down_words: tuple, size=4
+            Hopping matrices (scipy.sparse.csr_matrix) and spin words
+            (np.ndarray[np.uint64]) of both spin species.
+        """
+        if sector is None:
+            words = np.arange(2**self.sites, dtype=np.uint64)
+            T = self._spin_hopping(words, ranked=False)
+            return T, T, words, words
+
+        T_up = self._spin_hopping(sector.up_words)
+        T_down = self._spin_hopping(sector.down_words)
+
+        return T_up, T_down, sector.up_words, sector.down_words
+
+    def _spin_hopping(self, words: np.ndarray, ranked=True) -> csr_matrix:
+        # Words of a sector are indexed by their combinatorial rank
+        def index(targets):
+            return rank(targets, self.sites)
+
+        T = hopping_matrix(self.sites, self.bonds, words,
+                           index if ranked else None)
+        if np.any(self.onsite):
+            T = T + diags(occupations(words, self.sites) @ self.onsite)
+
+        return T.tocsr()
+
+    def get_operator(self, U: float, t: float, sector=None):
+        """Outputs Hubbard hamiltonian as a matrix-free linear operator, to be
+        used with 'lanczos' or scipy solvers (ex: 'eigsh') when the sparse
+        matrix doesn't fit in memory.
+
+        Parameters
+        ----------
+        U: float, default=None
+            Module of interaction between fermions.
+
+        t: float, default=None
+            Probability amplitude for fermions to jump.
+
+        sector: Sector, default=None
+            Restricts the operator to a (N_up, N_down) sector (see
+            'get_sector'). The full Fock space is used if None.
+
+        Returns
+        -------
+        -: HubbardOperator, shape=(dim, dim)
+
+        Examples
+        --------
+        >>> N = Network(sites_nb=12)
+        >>> N.get_operator(U=8, t=1, sector=N.get_sector(6, 6))
+        <853776x853776 HubbardOperator with dtype=float64>
+        """
+        T_up, T_down, up_words, down_words = self.get_spin_hoppings(sector)
+
+        return HubbardOperator(-t * T_up, -t * T_down,
+                               self._double_occupancy(up_words[:, None],
+                                                      down_words), U)
+
+    def _double_occupancy(self, up_words: np.ndarray,
+                          down_words: np.ndarray) -> np.ndarray:
+        # Interacting doubly occupied sites of (broadcast) pairs of words
+        return popcount(up_words & down_words)
+
+    def _spin_words(self, sector=None) -> tuple[np.ndarray]:
+        # Spin words of a sector (or of the full Fock space)
+        if sector is None:
+            words = np.arange(2**self.sites, dtype=np.uint64)
+            return words, words
+
+        return sector.up_words, sector.down_words
+
+    def get_diagonal(self, U=0.0, mu=0.0, h=0.0, sector=None) -> np.ndarray:
+        """Diagonal of the interaction, chemical potential and magnetic field
+        terms,
+
+            U sum_i n_i,up n_i,down - mu sum_i n_i - h / 2 sum_i (n_i,up -
+            n_i,down),
+
+        evaluated on whole arrays of spin words with bitwise operations
+        (double occupancies are popcounts of up & down words).
+
+        Parameters
+        ----------
+        U: float, default=0.0
+            Module of interaction between fermions.
+
+        mu: float, default=0.0
+            Chemical potential.
+
+        h: float, default=0.0
+            Magnetic field (Zeeman term).
+
+        sector: Sector, default=None
+            Restricts the diagonal to a (N_up, N_down) sector (see
+            'get_sector'). The full Fock space is used if None.
+
+        Returns
+        -------
+        -: np.ndarray, size=dim
+            Diagonal in the order of the basis states.
+
+        Examples
+        --------
+        >>> N = Network(sites_nb=2)
+        >>> N.get_diagonal(U=4, mu=2, sector=N.get_sector(1, 1))
+        array([ 0., -4., -4.,  0.])
+        """
+        up_words, down_words = self._spin_words(sector)
+        n_up = popcount(up_words).astype(np.float64)
+        n_down = popcount(down_words).astype(np.float64)
+
+        diagonal = (-mu - h / 2) * n_up[:, None] + (-mu + h / 2) * n_down
+        if U:
+            diagonal = diagonal + U * self._double_occupancy(
+                up_words[:, None], down_words)
+
+        return diagonal.ravel()
+
+    def diagonal_averages(self, state: np.ndarray, sector=None) -> dict:
+        """Expectation values of diagonal (occupation) operators in a state,
+        computed from its probabilities and the bits of the basis states
+        without building any operator.
+
+        Parameters
+        ----------
+        state: np.ndarray, size=dim, default=None
+            Normalized state.
+
+        sector: Sector, default=None
+            Basis of the state (see 'get_sector'). The full Fock space is
+            used if None.
+
+        Returns
+        -------
+        -: dict
+            Arrays over sites: 'n_up', 'n_down', 'density', 'sz' and
+            'double_occupancy' (<n_i,up n_i,down>).
+
+        Examples
+        --------
+        >>> N = Network(sites_nb=2)
+        >>> sector = N.get_sector(1, 1)
+        >>> _, state, _ = lanczos(N.get_operator(U=4, t=1, sector=sector))
+        >>> N.diagonal_averages(state, sector)['double_occupancy']
+        array([0.0732233, 0.0732233])
+        """
+        up_words, down_words = self._spin_words(sector)
+        bits_up = occupations(up_words, self.sites).astype(np.float64)
+        bits_down = occupations(down_words, self.sites).astype(np.float64)
+
+        # Probabilities as a (up, down) table: sites are summed word-wise
+        P = np.abs(np.asarray(state).ravel())**2
+        P = P.reshape(up_words.size, down_words.size)
+        n_up = P.sum(axis=1) @ bits_up
+        n_down = P.sum(axis=0) @ bits_down
+
+        return {
+            'n_up': n_up,
+            'n_down': n_down,
+            'density': n_up + n_down,
+            'sz': (n_up - n_down) / 2,
+            'double_occupancy': (bits_up * (P @ bits_down)).sum(axis=0)
+        }
+
+    def get_sector(self, n_up: int, n_down: int) -> Sector:
+        """Gives the basis of states with fixed numbers of spin up and spin
+        down fermions, both conserved by Hubbard hamiltonian.
+
+        Parameters
+        ----------
+        n_up: int, default=None
+            Number of spin up fermions.
+
+        n_down: int, default=None
+            Number of spin down fermions.
+
+        Returns
+        -------
+        -: Sector
+
+        Examples
+        --------
+        >>> N = Network(sites_nb=12)
+        >>> N.get_sector(n_up=6, n_down=6)
+        Sector(n_sites=12, n_up=6, n_down=6, dim=853776)
+        """
+        return Sector(self.sites, n_up, n_down)
+
+    def get_sector_hamiltonian(self, sector: Sector, U: float,
+                               t: float) -> csr_matrix:
+        """Outputs Hubbard hamiltonian restricted to a sector.
+
+        Parameters
+        ----------
+        sector: Sector, default=None
+            Basis given by 'get_sector'.
+
+        U: float, default=None
+            Module of interaction between fermions.
+
+        t: float, default=None
+            Probability amplitude for fermions to jump.
+
+        Returns
+        -------
+        H: scipy.sparse.csr_matrix, shape=(sector.dim, sector.dim)
+        """
+        H1, H2 = self.get_hamiltonian_terms(sector)
+
+        return (U * H1 - t * H2).tocsr()
+
+    def diagonalize_sector(self, n_up: int, n_down: int, U: float, t: float,
+                           k=1) -> tuple:
+        """Gives the lowest eigenpairs of Hubbard hamiltonian inside a sector.
+
+        Parameters
+        ----------
+        n_up: int, default=None
+            Number of spin up fermions.
+
+        n_down: int, default=None
+            Number of spin down fermions.
+
+        U: float, default=None
+            Module of interaction between fermions.
+
+        t: float, default=None
+            Probability amplitude for fermions to jump.
+
+        k: int, default=1
+            Number of eigenpairs.
+
+        Returns
+        -------
+        energies, states, sector: tuple, size=3
+            Eigenvalues (increasing order), eigenvectors as columns (in the
+            sector basis) and the sector itself.
+
+        Examples
+        --------
+        >>> N = Network(sites_nb=2)
+        >>> N.diagonalize_sector(n_up=1, n_down=1, U=1, t=1)[0]
+        array([-1.56155281])
+        """
+        sector = self.get_sector(n_up, n_down)
+        H = self.get_sector_hamiltonian(sector, U, t)
+
+        if sector.dim <= max(64, k + 1):
+            energies, states = np.linalg.eigh(H.toarray())
+            return energies[:k], states[:, :k], sector
+
+        energies, states = eigsh(H, k=k, which='SA')
+        order = np.argsort(energies)
+
+        return energies[order], states[:, order], sector
+
+    def diagonalize_momenta(self, n_up: int, n_down: int, U: float, t: float,
+                            n_states=1, workers=None) -> dict:
+        """Lowest energies of every total momentum block of a sector of a
+        periodic network, the blocks being diagonalized in parallel (see
+        'nqft.symmetry.momentum_spectra').
+
+        Parameters
+        ----------
+        n_up: int, default=None
+            Number of spin up fermions.
 
-    def get_e(self, H: Qobj, states: list) -> float:
+        n_down: int, default=None
+            Number of spin down fermions.
+
+        U: float, default=None
+            Module of interaction between fermions.
+
+        t: float, default=None
+            Probability amplitude for fermions to jump.
+
+        n_states: int, default=1
+            Number of eigenvalues computed in each block.
+
+        workers: int, default=None
+            Number of processes (default is the number of processors).
+
+        Returns
+        -------
+        -: dict
+            Momenta (as tuples) as keys and lowest energies as values.
+
+        Examples
+        --------
+        >>> N = Network(shape=(2, 2), boundary="periodic")
+        >>> N.diagonalize_momenta(n_up=1, n_down=1, U=4, t=1)
+        {(0.0, 0.0): array([-7.25442601]), (0.0, 3.1415926536): array([-4.]),
+        (3.1415926536, 0.0): array([-4.]), (3.1415926536, 3.1415926536):
+        array([0.])}
+        """
+        return momentum_spectra(self, n_up, n_down, U, t, n_states, workers)
+
+    def diagonalize_sectors(self, U: float, t: float, k=1, mu=0.0,
+                            sectors=None, workers=None,
+                            memory_limit=None) -> tuple:
+        """Lowest energies of every (N_up, N_down) sector, largest sectors
+        being diagonalized first in parallel processes (see
+        'nqft.sectors.sector_spectra'), and ground state of the global
+        spectrum.
+
+        Parameters
+        ----------
+        U: float, default=None
+            Module of interaction between fermions.
+
+        t: float, default=None
+            Probability amplitude for fermions to jump.
+
+        k: int, default=1
+            Number of eigenvalues of each sector.
+
+        mu: float, default=0.0
+            Chemical potential used to compare sectors (E - mu N).
+
+        sectors: list[tuple], default=every sector
+            (N_up, N_down) sectors to diagonalize.
+
+        workers: int, default=None
+            Number of processes (default is the number of processors).
+
+        memory_limit: int, default=None
+            Address space limit of each worker in bytes.
+
+        Returns
+        -------
+        spectra, ground_state: tuple, size=2
+            Sectors as keys and lowest energies as values, and ground state
+            energy, sector and label (ex: 'R0:N4:S0').
+
+        Examples
+        --------
+        >>> N = Network(shape=(2, 2))
+        >>> N.diagonalize_sectors(U=8, t=1, mu=4)[1]
+        (-17.32023495827192, (2, 2), 'R0:N4:S0')
+        """
+        spectra = sector_spectra(self, U, t, k, sectors, workers,
+                                 memory_limit)
+
+        return spectra, ground_state_sector(spectra, mu)
+
+    def apply_fermion(self, state: np.ndarray, sector: Sector, site: int,
+                      spin="up", dagger=True) -> tuple:
+        """Applies a creation (or annihilation) operator on a state of a
+        sector.
+
+        Parameters
+        ----------
+        state: np.array, size=sector.dim, default=None
+            State in the sector basis.
+
+        sector: Sector, default=None
+            Sector of the state.
+
+        site: int, default=None
+            Site on which the operator acts.
+
+        spin: str, default='up'
+            Spin of the fermion ('up' or 'down').
+
+        dagger: bool, default=True
+            Applies c^dag if True, c otherwise.
+
+        Returns
+        -------
+        new_state, new_sector: tuple, size=2
+            Resulting state and its sector (None, None if the sector doesn't
+            exist).
+        """
+        step = 1 if dagger else -1
+        n_up = sector.n_up + step * (spin == "up")
+        n_down = sector.n_down + step * (spin == "down")
+        if not (0 <= n_up <= self.sites and 0 <= n_down <= self.sites):
+            return None, None
+
+        new_sector = self.get_sector(n_up, n_down)
+        operator = add_particle if dagger else remove_particle
+        V = state.reshape(sector.up_words.size, sector.down_words.size)
+        new_V = np.zeros((new_sector.up_words.size,
+                          new_sector.down_words.size), dtype=state.dtype)
+
+        if spin == "up":
+            allowed, words, signs = operator(sector.up_words, site,
+                                             self.sites)
+            new_V[rank(words, self.sites)] = signs[:, None] * V[allowed]
+        else:
+            # Spin down modes come after every spin up mode
+            allowed, words, signs = operator(sector.down_words, site,
+                                             self.sites)
+            signs = signs * (-1)**sector.n_up
+            new_V[:, rank(words, self.sites)] = signs * V[:, allowed]
+
+        return new_V.ravel(), new_sector
+
+    def get_green_function(self, U: float, t: float, n_up=None, n_down=None,
+                           mu=0.0, spin="up", iterations=100,
+                           tol=1e-10) -> LehmannGF:
+        """Computes the cluster Green's function
+
+            G_ij(z) = <c_i (z - H + E0)^-1 c_j^dag>
+                      + <c_j^dag (z + H - E0)^-1 c_i>
+
+        of the ground state of a sector with band Lanczos recursions started
+        from c_i^dag|GS> and c_i|GS> for every site at once. The block
+        tridiagonal matrices are diagonalized once so the result is stored
+        in Lehmann form: evaluating G(z) costs no matrix-vector product and
+        it can be used directly by 'nqft.cpt.CPTModel'.
+
+        Parameters
+        ----------
+        U: float, default=None
+            Module of interaction between fermions.
+
+        t: float, default=None
+            Probability amplitude for fermions to jump.
+
+        n_up: int, default=half filling
+            Number of spin up fermions of the ground state sector.
+
+        n_down: int, default=half filling
+            Number of spin down fermions of the ground state sector.
+
+        mu: float, default=0.0
+            Chemical potential (energies are measured from it).
+
+        spin: str, default='up'
+            Spin of the Green's function.
+
+        iterations: int, default=100
+            Maximum number of Lanczos blocks of each recursion.
+
+        tol: float, default=1e-10
+            Threshold of Lanczos convergence and deflation.
+
+        Returns
+        -------
+        -: LehmannGF
+            Green's function (dim = number of sites). Its 'info' attribute
+            contains 'U', 't', 'mu', 'GS_energy' and 'GS_sector'.
+
+        Examples
+        --------
+        >>> N = Network(sites_nb=4)
+        >>> G = N.get_green_function(U=8, t=1, mu=4)
+        >>> np.allclose(G.moments(order=0), np.identity(4))
+        True
+        """
+        n_up = self.sites // 2 if n_up is None else n_up
+        n_down = self.sites // 2 if n_down is None else n_down
+
+        sector = self.get_sector(n_up, n_down)
+        E0, ground_state, _ = lanczos(
+            self.get_operator(U=U, t=t, sector=sector), tol=tol)
+
+        energies, Q = [], []
+        for dagger in (True, False):
+            excited = [self.apply_fermion(ground_state, sector, site, spin,
+                                          dagger)
+                       for site in range(self.sites)]
+            new_sector = excited[0][1]
+            if new_sector is None:
+                continue
+
+            H = self.get_operator(U=U, t=t, sector=new_sector)
+            V0 = np.column_stack([state for state, _ in excited])
+            A, B, R0 = block_lanczos(H, V0, iterations, tol)
+
+            eigvals, eigvecs = np.linalg.eigh(block_tridiagonal(A, B))
+            amplitudes = eigvecs[:R0.shape[0]].conj().T @ R0
+
+            # Particle (hole) poles at E_n - E0 (E0 - E_n), measured from mu
+            if dagger:
+                energies.append(eigvals - E0 - mu)
+                Q.append(amplitudes.conj().T)
+            else:
+                energies.append(E0 - eigvals - mu)
+                Q.append(amplitudes.T)
+
+        energies, Q = np.concatenate(energies), np.concatenate(Q, axis=1)
+        keep = (np.abs(Q)**2).sum(axis=0) > tol**2
+
+        info = {
+            'U': U,
+            't': t,
+            'mu': mu,
+            'GS_energy': E0 - mu * (n_up + n_down),
+            'GS_sector': f"R0:N{n_up + n_down}:S{n_up - n_down}"
+        }
+
+        return LehmannGF(energies[keep], Q[:, keep], info=info)
+
+    def u_sweep(self, interactions: list[float], t: float, tol=1e-10,
+                init_state=None, sector=None) -> list[dict]:
+        """Computes Hubbard ground states along a grid of interactions U.
+        Each Lanczos search is seeded with the ground state of the
+        previous U and the hopping matrix is built once: only the interaction
+        diagonal is rescaled from one U to the next.
+
+        Parameters
+        ----------
+        interactions: list[float], default=None
+            Values of U, in the order they are walked through.
+
+        t: float, default=None
+            Probability amplitude for fermions to jump.
+
+        tol: float, default=1e-10
+            Convergence threshold on ground states residual norm.
+
+        init_state: np.array, size=dim, default=random
+            Initial state of the first search.
+
+        sector: Sector, default=None
+            Restricts the search to a (N_up, N_down) sector (see
+            'get_sector'). The full Fock space is used if None.
+
+        Returns
+        -------
+        results: list[dict]
+            For each U, a dict with keys 'U', 'energy', 'state' and 'matvecs'
+            (number of hamiltonian-vector products used by the search).
+
+        Examples
+        --------
+        >>> N = Network(sites_nb=2)
+        >>> [res['energy'] for res in N.u_sweep([0.0, 1.0], t=1)]
+        [-2.0000000000000004, -1.5615528128088303]
+        """
+        H = self.get_operator(U=interactions[0], t=t, sector=sector)
+
+        results, state = [], init_state
+        for U in interactions:
+            H.set_interaction(U)
+            H.matvecs = 0
+
+            energy, state, _ = lanczos(H, v0=state, tol=tol)
+
+            results.append({
+                'U': U,
+                'energy': energy,
+                'state': state,
+                'matvecs': H.matvecs
+            })
+
+        return results
+
+    def get_e(self, H: csr_matrix, states: list) -> float:
         """Outputs a matrix element (energy) from the hamiltonian using
         given kets on which perform projection.
 
         Parameters
         ----------
-        H: Qobj, shape=(4^self.sites, 4^self.sites), default=None
+        H: scipy.sparse.csr_matrix, shape=(4^self.sites, 4^self.sites)
             Fermions network hamiltonian.
 
         states: array-like, shape=(2, 1), default=None
@@ -188,99 +882,247 @@ class Network:
         >>> N = Network(sites_nb=2)
         >>> Hamiltonian = N.get_hamiltonian(model="Hubbard", U=2, t=1)
         >>> N.get_e(H=Hamiltonian, states=[15, 15])
-        2.0
+        4.0
         """
-        bra = self.get_state(states[0], type="bra")
-        ket = self.get_state(states[1])
-        E = bra * H * ket
-
-        return E.tr()
+        # Basis states are indexed by their integer representation
+        return float(H[states[0], states[1]])
 
-    def lanczos(self, H: Qobj, iterations: int, init_state=None) -> tuple:
-        """Implementation of Lanczos algorithm for Network hamiltonian.
+    def lanczos(self, H, iterations: int, init_state=None,
+                reorthogonalize=False) -> tuple:
+        """Implementation of Lanczos algorithm for Network hamiltonian (see
+        'nqft.krylov.lanczos').
 
         Parameters
         ----------
-        H: Qobj, shape=(4^self.sites, 4^self.sites), default=None
-            Fermions network hamiltonian.
+        H: scipy.sparse.csr_matrix or HubbardOperator, default=None
+            Fermions network hamiltonian (full space or sector).
 
         iterations: int, default=None
-            Number of iterations on which perform the algorithm.
+            Maximum number of iterations.
 
-        init_state: QObj, shape=(4^self.sites, 1) default=random
+        init_state: np.array, size=H.shape[0], default=random
             Initial quantum state to start the first iteration.
 
+        reorthogonalize: bool, default=False
+            Uses selective reorthogonalization.
+
         Returns
         -------
         -: tuple, shape=(1, 2)
-            Respectively the maximum eigenvalue and the associated eigenvector.
+            Respectively the ground state energy and the associated
+            eigenvector.
 
         Examples
         --------
         >>> N = Network(sites_nb=2)
         >>> Hamitonian = N.get_hamiltonian(model="Hubbard", U=1, t=1)
         >>> N.lanczos(H=Hamiltonian, iterations=10)
-        (2.561552779602264, Quantum object: dims = [[10], [1]],
-        shape = (10, 1), type = ket Qobj data =
-        [[0.43516215]
-         [0.78820544]
-         [0.43516215]
-         [0.        ]
-         [0.        ]
-         [0.        ]
-         [0.        ]
-         [0.        ]
-         [0.        ]
-         [0.        ]])
+        (-1.5615528128088307, array([...]))
         """
-        if not init_state:
-            dim = H.shape[0]
-            state = np.random.randint(dim - 1)
-            init = self.get_state(state=state)
-        else:
-            init = init_state
+        energy, state, info = lanczos(H, v0=init_state, max_iter=iterations,
+                                      reorthogonalize=reorthogonalize)
 
-        H_n = np.zeros((iterations, iterations), dtype=np.complex64)
-        for iter in track(range(iterations), description="Lanczos algorithm"):
-            if iter == 0:
-                a_n = H.matrix_element(init.dag(), init) / scalar(init)
-                b_n = 0
+        if not info['converged']:
+            print(f"Lanczos hasn't "
+                  f"converged with {iterations} iterations!\n")
+
+        return energy, state
 
-                phi_n_plus = H * init - a_n * init
-                phi_n_minus = init
-                phi_n = phi_n_plus
-            else:
-                a_n_minus = a_n
-                a_n = H.matrix_element(phi_n.dag(), phi_n) / scalar(phi_n)
 
-                b_n_minus = b_n
-                b_n = np.sqrt(scalar(phi_n) / scalar(phi_n_minus))
+class AndersonImpurity(Network):
+    """Anderson impurity model: an interacting site (site 0) hybridized with
+    a discrete bath of non-interacting sites,
 
-                phi_n_plus = H * phi_n - a_n * phi_n - b_n**2 * phi_n_minus
-                phi_n_minus = phi_n
-                phi_n = phi_n_plus
+        H = U n_0up n_0down - mu n_0 + sum_l e_l n_l
+            + sum_l V_l (c_0^dag c_l + h.c.),
 
-                for lgn in range(iter + 1):
-                    H_n[lgn, iter - 1] = (
-                        b_n * delta(lgn, iter)
-                        + a_n_minus * delta(lgn, iter - 1)
-                        + b_n_minus * delta(lgn, iter - 2)
-                    )
+    seen as a star shaped network so every 'Network' solver applies with
+    t = 1 (bonds and on-site amplitudes carry the bath parameters).
 
-                    H_n[lgn, iter] = a_n * delta(lgn, iter) + \
-                        b_n * delta(lgn, iter - 1)
+    Attributes
+    ----------
+    energies: np.array, size=L, default=None
+        Bath energies e_l.
 
-            H_phi = Qobj(H_n)
+    hybridizations: np.array, size=L, default=None
+        Hybridizations V_l between the impurity and bath sites.
 
-            if scalar(phi_n) == 0:
-                return H_phi.eigenenergies()[-1], H_phi.eigenstates()[-1][-1]
-            else:
-                pass
+    mu: float, default=0.0
+        Chemical potential of the impurity.
+    """
+
+    def __init__(self, energies: np.array, hybridizations: np.array,
+                 mu=0.0) -> None:
+        """Sets attributes to given values and builds the star network.
+        """
+        self.energies = np.asarray(energies, dtype=np.float64)
+        self.hybridizations = np.asarray(hybridizations, dtype=np.float64)
+        self.mu = mu
+        super().__init__(sites_nb=1 + self.energies.size)
+
+        # H = U * H1 - H2: amplitudes are minus the one-body energies
+        self.bonds = [(0, site + 1, -V)
+                      for site, V in enumerate(self.hybridizations)]
+        self.onsite = np.concatenate([[mu], -self.energies])
+        self.amplitudes = np.diag(self.onsite)
+        for i, j, amplitude in self.bonds:
+            self.amplitudes[i, j] = self.amplitudes[j, i] = amplitude
+        return
+
+    def _double_occupancy(self, up_words: np.ndarray,
+                          down_words: np.ndarray) -> np.ndarray:
+        # Only the impurity interacts
+        bit = np.uint64(site_bit(0, self.sites))
+        return ((up_words & down_words) >> bit) & np.uint64(1)
+
+    def ground_sectors(self, U: float, tol=1e-8) -> tuple:
+        """Finds the (possibly degenerate) ground state sectors.
+
+        Parameters
+        ----------
+        U: float, default=None
+            Module of interaction on the impurity.
+
+        tol: float, default=1e-8
+            Energy difference under which sectors are degenerate.
+
+        Returns
+        -------
+        energy, sectors: tuple, size=2
+            Ground state energy and list of (N_up, N_down) sectors.
+        """
+        energies = {
+            (n_up, n_down): self.diagonalize_sector(n_up, n_down, U, 1)[0][0]
+            for n_up in range(self.sites + 1)
+            for n_down in range(self.sites + 1)
+        }
+        energy = float(min(energies.values()))
+
+        return energy, [key for key, value in energies.items()
+                        if value - energy < tol]
+
+    def impurity_green_function(self, U: float, iterations=100,
+                                tol=1e-10) -> LehmannGF:
+        """Paramagnetic impurity Green's function G_00 at zero temperature,
+        averaged over spins and degenerate ground state sectors.
+
+        Parameters
+        ----------
+        U: float, default=None
+            Module of interaction on the impurity.
+
+        iterations: int, default=100
+            Maximum number of Lanczos blocks of each recursion.
+
+        tol: float, default=1e-10
+            Threshold of Lanczos convergence and deflation.
+
+        Returns
+        -------
+        -: LehmannGF
+            Green's function (dim = 1). Its 'info' attribute contains
+            'GS_energy', 'GS_sectors' and 'density' (impurity occupation).
+
+        Examples
+        --------
+        >>> aim = AndersonImpurity([-1, 1], [0.5, 0.5], mu=2)
+        >>> aim.impurity_green_function(U=4).info['density']
+        1.0
+        """
+        E0, sectors = self.ground_sectors(U)
+
+        energies, Q = [], []
+        for n_up, n_down in sectors:
+            for spin in ("up", "down"):
+                G = self.get_green_function(U, 1, n_up, n_down, spin=spin,
+                                            iterations=iterations, tol=tol)
+                energies.append(G.energies)
+                Q.append(G.Q[:1] / np.sqrt(2 * len(sectors)))
+
+        energies, Q = np.concatenate(energies), np.concatenate(Q, axis=1)
+        info = {
+            'GS_energy': E0,
+            'GS_sectors': sectors,
+            'density': float(2 * (np.abs(Q[0, energies < 0])**2).sum())
+        }
+
+        return LehmannGF(energies, Q, info=info)
+
+
+class HubbardOperator(LinearOperator):
+    """Matrix-free Hubbard hamiltonian acting on vectors of a product basis
+    (up words x down words). A vector is seen as a (D_up, D_down) matrix V
+    so that
+
+            H V = T_up V + V T_down^T + diagonal * V,
+
+    only the spin hopping matrices and the interaction diagonal are stored.
+
+    Attributes
+    ----------
+    T_up: scipy.sparse.csr_matrix, shape=(D_up, D_up), default=None
+        Hopping term acting on spin up words.
+
+    T_down: scipy.sparse.csr_matrix, shape=(D_down, D_down), default=None
+        Hopping term acting on spin down words.
+
+    double_occ: np.ndarray, shape=(D_up, D_down), default=None
+        Number of doubly occupied sites of each basis state.
+
+    U: float, default=None
+        Module of interaction between fermions.
+
+    matvecs: int
+        Number of hamiltonian-vector products computed so far.
+    """
+
+    def __init__(self, T_up: csr_matrix, T_down: csr_matrix,
+                 double_occ: np.ndarray, U: float) -> None:
+        """Sets attributes to given values and caches interaction diagonal.
+        """
+        self.T_up = T_up.tocsr()
+        self.T_down = T_down.tocsr()
+        self.double_occ = np.asarray(double_occ, dtype=np.uint8)
+        self.diagonal = np.empty(self.double_occ.shape, dtype=np.float64)
+        self.matvecs = 0
+        self.set_interaction(U)
+
+        dim = self.double_occ.size
+        super().__init__(dtype=np.dtype(np.float64), shape=(dim, dim))
+        return
+
+    def set_interaction(self, U: float) -> None:
+        """Changes the interaction (only the cached diagonal is rescaled).
+
+        Parameters
+        ----------
+        U: float, default=None
+            Module of interaction between fermions.
+        """
+        self.U = U
+        np.multiply(self.double_occ, U, out=self.diagonal)
+        return
+
+    def _matmat(self, X: np.ndarray) -> np.ndarray:
+        d_up, d_down = self.double_occ.shape
+        cols = X.shape[1]
+        self.matvecs += cols
+
+        V = X.reshape(d_up, d_down, cols)
+        out = (self.T_up @ V.reshape(d_up, -1)).reshape(d_up, d_down, cols)
+
+        V_t = np.ascontiguousarray(V.transpose(1, 0, 2))
+        out += (self.T_down @ V_t.reshape(d_down, -1)).reshape(
+            d_down, d_up, cols).transpose(1, 0, 2)
+        out += self.diagonal[..., None] * V
+
+        return out.reshape(-1, cols)
 
-        print(f"Lanczos hasn't "
-              f"converged with {iterations} iterations!\n")
+    def _matvec(self, x: np.ndarray) -> np.ndarray:
+        return self._matmat(x.reshape(-1, 1)).ravel()
 
-        return 0.0, basis(1)
+    def _adjoint(self) -> "HubbardOperator":
+        return self
 
 
 if __name__ == "__main__":
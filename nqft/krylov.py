@@ -0,0 +1,382 @@
+"""This module contains Krylov subspace solvers working on numpy vectors and
+any operator supporting 'H @ v' (scipy sparse matrices, LinearOperator such
+as 'HubbardOperator').
+"""
+
+import numpy as np
+from scipy.linalg import eigh_tridiagonal
+
+
+def lowest_ritz_pair(alphas: list, betas: list) -> tuple:
+    """Lowest eigenpair of the Lanczos tridiagonal matrix.
+
+    Parameters
+    ----------
+    alphas: list, size=m, default=None
+        Diagonal of the tridiagonal matrix.
+
+    betas: list, size=m - 1, default=None
+        Off-diagonal of the tridiagonal matrix.
+
+    Returns
+    -------
+    theta, s: tuple, size=2
+        Lowest eigenvalue and its eigenvector.
+    """
+    if len(alphas) == 1:
+        return alphas[0], np.ones(1)
+
+    theta, s = eigh_tridiagonal(np.asarray(alphas), np.asarray(betas),
+                                select='i', select_range=(0, 0))
+
+    return theta[0], s[:, 0]
+
+
+def lanczos(H, v0=None, tol=1e-10, max_iter=500, reorthogonalize=False,
+            return_state=True, seed=None) -> tuple:
+    """Lanczos ground state solver using a three-vector recurrence.
+
+    The lowest eigenpair of the tridiagonal matrix is recomputed at each
+    iteration (bisection and inverse iteration on that eigenvalue only,
+    O(m) for m iterations) and the search stops when the residual norm of
+    the ground state Ritz pair,
+
+                || H y - theta y || = beta_m+1 |s_m|,
+
+    falls below 'tol'. Without reorthogonalization the Lanczos vectors aren't
+    stored: the ground state vector is rebuilt by a second pass of the
+    recurrence. With selective reorthogonalization the Lanczos vectors are
+    kept (in a preallocated array) and new ones are orthogonalized against
+    converged Ritz vectors, which prevents ghost eigenvalues in long runs.
+    It needs every eigenpair of the tridiagonal matrix, O(m^2) per
+    iteration.
+
+    Parameters
+    ----------
+    H: scipy.sparse matrix or LinearOperator, shape=(n, n), default=None
+        Hermitian operator.
+
+    v0: np.array, size=n, default=random
+        Initial vector.
+
+    tol: float, default=1e-10
+        Convergence threshold on the residual norm.
+
+    max_iter: int, default=500
+        Maximum number of iterations.
+
+    reorthogonalize: bool, default=False
+        Uses selective reorthogonalization (stores the Lanczos vectors).
+
+    return_state: bool, default=True
+        Computes the ground state vector.
+
+    seed: int, default=None
+        Seed of the random initial vector.
+
+    Returns
+    -------
+    energy, state, info: tuple, size=3
+        Ground state energy, normalized ground state (or None) and a dict
+        with keys 'iterations', 'residual', 'converged' and 'matvecs'.
+
+    Examples
+    --------
+    >>> from nqft.hamiltonian import Network
+    >>> N = Network(sites_nb=2)
+    >>> lanczos(N.get_hamiltonian(model="Hubbard", U=1, t=1))[0]
+    -1.56155281280883
+    """
+    dim = H.shape[0]
+    if v0 is None:
+        v0 = np.random.default_rng(seed).standard_normal(dim)
+
+    dtype = np.result_type(H.dtype, np.asarray(v0).dtype)
+    v = np.asarray(v0, dtype=dtype).ravel() / np.linalg.norm(v0)
+    v_prev = np.zeros_like(v)
+
+    alphas, betas = [], []
+    steps = min(max_iter, dim)
+    if reorthogonalize:
+        basis = np.empty((dim, steps + 1), dtype=dtype)
+        basis[:, 0] = v
+    matvecs, residual, converged = 0, np.inf, False
+    theta, s = None, None
+    eps = np.finfo(np.float64).eps
+
+    for _ in range(steps):
+        w = H @ v
+        matvecs += 1
+
+        alpha = np.vdot(v, w).real
+        w -= alpha * v
+        if betas:
+            w -= betas[-1] * v_prev
+        alphas.append(alpha)
+
+        beta = np.linalg.norm(w)
+        theta, s = lowest_ritz_pair(alphas, betas)
+        residual = beta * abs(s[-1])
+
+        if residual < tol or beta < eps * max(1.0, abs(theta)):
+            converged = True
+            break
+
+        if reorthogonalize:
+            # Ritz vectors with small error bounds are the directions in which
+            # orthogonality is lost
+            m = len(alphas)
+            norm = max(np.abs(alphas).max(), beta)
+            _, S = eigh_tridiagonal(np.asarray(alphas), np.asarray(betas))
+            converged_ritz = beta * np.abs(S[-1]) < np.sqrt(eps) * norm
+            if converged_ritz.any():
+                Y = basis[:, :m] @ S[:, converged_ritz]
+                w -= Y @ (Y.conj().T @ w)
+                beta = np.linalg.norm(w)
+
+                # w may have been (nearly) in the span of the Ritz vectors
+                if beta < eps * max(1.0, abs(theta)):
+                    converged = True
+                    break
+
+        betas.append(beta)
+        v_prev, v = v, w / beta
+        if reorthogonalize:
+            basis[:, len(alphas)] = v
+
+    info = {
+        'iterations': len(alphas),
+        'residual': float(residual),
+        'converged': converged,
+        'matvecs': matvecs
+    }
+
+    if not return_state:
+        return float(theta), None, info
+
+    if reorthogonalize:
+        state = basis[:, :len(alphas)] @ s
+
+    else:
+        # Second pass of the recurrence accumulating the Ritz vector
+        v = np.asarray(v0, dtype=dtype)
+        state = lanczos_combination(H, v, alphas, betas, s)
+        info['matvecs'] += len(alphas) - 1
+
+    return float(theta), state / np.linalg.norm(state), info
+
+
+def lanczos_combination(H, v0: np.ndarray, alphas: list, betas: list,
+                        coefficients: np.ndarray) -> np.ndarray:
+    """Linear combination sum_i coefficients_i v_i of the Lanczos vectors of
+    a previous run, rebuilt by a second pass of the recurrence (so they
+    never have to be stored).
+
+    Parameters
+    ----------
+    H: scipy.sparse matrix or LinearOperator, shape=(n, n), default=None
+        Hermitian operator.
+
+    v0: np.array, size=n, default=None
+        Initial vector of the run.
+
+    alphas: list, size=m, default=None
+        Diagonal of the tridiagonal matrix.
+
+    betas: list, size>=m - 1, default=None
+        Off-diagonal of the tridiagonal matrix.
+
+    coefficients: np.ndarray, size=m, default=None
+        Coefficients of the Lanczos vectors.
+
+    Returns
+    -------
+    -: np.ndarray, size=n
+    """
+    v = np.asarray(v0).ravel() / np.linalg.norm(v0)
+    v_prev = np.zeros_like(v)
+    dtype = np.result_type(v.dtype, np.asarray(coefficients).dtype)
+
+    combination = coefficients[0] * v.astype(dtype)
+    for idx in range(len(alphas) - 1):
+        w = H @ v
+        w -= alphas[idx] * v
+        if idx:
+            w -= betas[idx - 1] * v_prev
+        v_prev, v = v, w / betas[idx]
+        combination += coefficients[idx + 1] * v
+
+    return combination
+
+
+def orthonormalize(W: np.ndarray, tol=1e-10) -> tuple:
+    """Orthonormal basis of the columns of a block, dropping (deflating)
+    directions of relative norm below 'tol'.
+
+    Parameters
+    ----------
+    W: np.ndarray, shape=(n, p), default=None
+        Block of vectors.
+
+    tol: float, default=1e-10
+        Relative deflation threshold.
+
+    Returns
+    -------
+    Q, R: tuple[np.ndarray], size=2
+        Orthonormal block (n, q) and coefficients (q, p) such that W = Q R,
+        with q <= p.
+    """
+    U, S, Vh = np.linalg.svd(W, full_matrices=False)
+    keep = S > tol * max(S[0], 1.0) if S.size else S > 0
+
+    return U[:, keep], S[keep, None] * Vh[keep]
+
+
+def block_lanczos(H, V0: np.ndarray, iterations=100, tol=1e-10) -> tuple:
+    """Block (band) Lanczos recursion started from several vectors at once.
+    It builds the block tridiagonal representation of H in the Krylov space
+    of V0,
+
+            H Q_j = Q_j-1 B_j^dag + Q_j A_j + Q_j+1 B_j+1,
+
+    keeping only three blocks of vectors in memory. Blocks shrink when
+    directions become linearly dependent (deflation).
+
+    Parameters
+    ----------
+    H: scipy.sparse matrix or LinearOperator, shape=(n, n), default=None
+        Hermitian operator.
+
+    V0: np.ndarray, shape=(n, p), default=None
+        Starting vectors.
+
+    iterations: int, default=100
+        Maximum number of blocks.
+
+    tol: float, default=1e-10
+        Relative deflation threshold.
+
+    Returns
+    -------
+    A, B, R0: tuple, size=3
+        Diagonal blocks A_j, subdiagonal blocks B_j+1 and coefficients of
+        the starting vectors in the first block (V0 = Q_0 R0).
+    """
+    Q, R0 = orthonormalize(np.asarray(V0), tol)
+    Q_prev, B_prev = None, None
+
+    A, B = [], []
+    for iteration in range(iterations):
+        if not Q.shape[1]:
+            break
+
+        W = H @ Q
+        A_j = Q.conj().T @ W
+        A_j = (A_j + A_j.conj().T) / 2
+        A.append(A_j)
+
+        W = W - Q @ A_j
+        if Q_prev is not None:
+            W -= Q_prev @ B_prev.conj().T
+
+        if iteration == iterations - 1:
+            break
+
+        Q_next, B_next = orthonormalize(W, tol)
+        if not Q_next.shape[1]:
+            break
+
+        B.append(B_next)
+        Q_prev, Q, B_prev = Q, Q_next, B_next
+
+    return A, B, R0
+
+
+def block_tridiagonal(A: list, B: list) -> np.ndarray:
+    """Assembles the dense block tridiagonal matrix of 'block_lanczos'.
+
+    Parameters
+    ----------
+    A: list[np.ndarray], default=None
+        Diagonal blocks.
+
+    B: list[np.ndarray], default=None
+        Subdiagonal blocks.
+
+    Returns
+    -------
+    T: np.ndarray, shape=(m, m)
+    """
+    sizes = [block.shape[0] for block in A]
+    starts = np.concatenate([[0], np.cumsum(sizes)])
+
+    T = np.zeros((starts[-1], starts[-1]), dtype=np.result_type(*A))
+    for j, A_j in enumerate(A):
+        T[starts[j]:starts[j + 1], starts[j]:starts[j + 1]] = A_j
+
+    for j, B_j in enumerate(B[:len(A) - 1]):
+        rows = slice(starts[j + 1], starts[j + 2])
+        cols = slice(starts[j], starts[j + 1])
+        T[rows, cols] = B_j
+        T[cols, rows] = B_j.conj().T
+
+    return T
+
+
+def lanczos_chain(H, v0: np.ndarray, steps: int, probes=None) -> tuple:
+    """Runs a fixed number of Lanczos iterations from a vector and keeps only
+    the tridiagonal coefficients (and, optionally, the overlaps of every
+    Lanczos vector with probe vectors).
+
+    Parameters
+    ----------
+    H: scipy.sparse matrix or LinearOperator, shape=(n, n), default=None
+        Hermitian operator.
+
+    v0: np.array, size=n, default=None
+        Initial vector.
+
+    steps: int, default=None
+        Maximum number of iterations (less if the Krylov space is
+        exhausted).
+
+    probes: np.ndarray, shape=(n, p), default=None
+        Vectors whose overlaps <probe|v_i> are recorded.
+
+    Returns
+    -------
+    alphas, betas, overlaps: tuple[np.ndarray], size=3
+        Diagonal (m,) and off-diagonal (m - 1,) of the tridiagonal matrix
+        followed by the norm of the last residual (so betas has size m),
+        and overlaps (m, p) (None without probes).
+    """
+    v = np.asarray(v0).ravel() / np.linalg.norm(v0)
+    v_prev = np.zeros_like(v)
+    eps = np.finfo(np.float64).eps
+
+    if probes is not None:
+        probes_h = np.asarray(probes).conj().T
+
+    alphas, betas, overlaps = [], [], []
+    for _ in range(min(steps, H.shape[0])):
+        if probes is not None:
+            overlaps.append(probes_h @ v)
+
+        w = H @ v
+        alpha = np.vdot(v, w).real
+        w -= alpha * v
+        if alphas:
+            w -= betas[-1] * v_prev
+        alphas.append(alpha)
+
+        beta = np.linalg.norm(w)
+        betas.append(beta)
+        if beta < eps * max(1.0, abs(alpha)):
+            break
+
+        v_prev, v = v, w / beta
+
+    overlaps = np.array(overlaps) if probes is not None else None
+
+    return np.array(alphas), np.array(betas), overlaps
@@ -0,0 +1,326 @@
+"""This module deals with cluster Green's functions in Lehmann (pole/residue)
+representation, such as the ones saved by 'pyqcm' in model files
+
+                G_ij(z) = sum_r Q_ir Q_jr^* / (z - w_r).
+
+It also provides a pole compression pass with a controllable error bound so
+later evaluations of G(z) are proportionally faster.
+"""
+
+import re
+import numpy as np
+
+
+class LehmannGF:
+    """Cluster Green's function in Lehmann representation.
+
+    Attributes
+    ----------
+    energies: np.array, size=M, default=None
+        Poles of the Green's function.
+
+    Q: np.ndarray, shape=(d, M), default=None
+        Residue amplitudes such that G(z) = Q (z - energies)^-1 Q^dag.
+
+    error_bound: float, default=0.0
+        Operator norm of the difference between this Green's function and
+        the one it was compressed from (for Im(z) >= eta), as measured by
+        'LehmannGF.compress'.
+
+    info: dict, default=None
+        Additional informations about the solution (ex: 'GS_energy').
+    """
+
+    def __init__(self, energies: np.array, Q: np.ndarray, error_bound=0.0,
+                 info=None) -> None:
+        """Sets attributes to given values.
+        """
+        self.energies = np.asarray(energies, dtype=np.float64)
+        self.Q = np.asarray(Q)
+        self.error_bound = error_bound
+        self.info = info if info else {}
+        return
+
+    @property
+    def dim(self) -> int:
+        """Number of cluster orbitals d.
+        """
+        return self.Q.shape[0]
+
+    @property
+    def poles(self) -> int:
+        """Number of poles M.
+        """
+        return self.energies.size
+
+    def __call__(self, z) -> np.ndarray:
+        """Evaluates the Green's function at complex frequencies.
+
+        Parameters
+        ----------
+        z: complex or array-like, shape=(K,), default=None
+            Complex frequencies.
+
+        Returns
+        -------
+        G: np.ndarray, shape=(d, d) or (K, d, d)
+            Green's function matrices.
+        """
+        z = np.asarray(z, dtype=np.complex128)
+        resolvent = 1 / (z[..., None] - self.energies)
+        G = (self.Q * resolvent[..., None, :]) @ self.Q.conj().T
+
+        return G
+
+    def moments(self, order=1) -> np.ndarray:
+        """Spectral moments M_n = sum_r w_r^n Q_r Q_r^dag.
+
+        Parameters
+        ----------
+        order: int, default=1
+            Order n of the moment (0 gives the anticommutator sum rule).
+
+        Returns
+        -------
+        -: np.ndarray, shape=(d, d)
+        """
+        return (self.Q * self.energies**order) @ self.Q.conj().T
+
+    def compress(self, eta: float, tol=1e-4) -> "LehmannGF":
+        """Merges nearly degenerate poles and drops negligible residues while
+        keeping the operator norm of the error on G(z) under 'tol' for every
+        frequency such that Im(z) >= eta.
+
+        The error is analytic for Im(z) > 0 and vanishes at infinity, so its
+        largest norm is reached on the line Im(z) = eta, where it is tracked
+        on a grid of spacing eta / 4 and every change is checked against it
+        (a posteriori, with the Frobenius norm). Half the tolerance is spent
+        on merging: adjacent groups of poles (in energy order) are merged,
+        closest first, into the leading eigen-components of their residue
+        matrix (rank truncated) placed at their own weighted mean energies.
+        Components are then dropped, smallest first, with the rest.
+
+        Parameters
+        ----------
+        eta: float, default=None
+            Smallest broadening at which the Green's function is evaluated.
+
+        tol: float, default=1e-4
+            Maximum error on G(z) (operator norm).
+
+        Returns
+        -------
+        -: LehmannGF
+            Compressed Green's function (its 'error_bound' attribute is the
+            error measured on the grid plus the bound of the current one).
+        """
+        order = np.argsort(self.energies)
+        energies, Q = self.energies[order], self.Q[:, order]
+        weights = (np.abs(Q)**2).sum(axis=0)
+        dim = self.dim
+
+        # Error on the line Im(z) = eta, as flattened (d, d) matrices. A pole
+        # term peaks at most a factor 'slack' above its largest sample.
+        z = np.arange(energies[0] - 10 * eta, energies[-1] + 10 * eta,
+                      eta / 4) + 1j * eta
+        error = np.zeros((z.size, dim**2), dtype=np.complex128)
+        slack = np.hypot(1, 1 / 8)
+
+        def change(old, new):
+            # Change of the error when terms 'old' are replaced by 'new'
+            e = np.concatenate([term[0] for term in old + new])
+            V = np.concatenate([term[1] for term in old + new], axis=1)
+            sign = np.repeat([1] * len(old) + [-1] * len(new),
+                             [term[0].size for term in old + new])
+            outer = (sign * V)[:, None, :] * V.conj()[None]
+            return (1 / (z[:, None] - e)) @ outer.reshape(dim**2, -1).T
+
+        def within(trial, budget):
+            return (np.abs(trial)**2).sum(axis=1).max() <= (budget / slack)**2
+
+        def components(start, stop):
+            # Eigen-components of the residue matrix of a group of poles
+            if stop - start == 1:
+                return energies[start:stop], Q[:, start:stop]
+
+            R = Q[:, start:stop] @ Q[:, start:stop].conj().T
+            vals, vecs = np.linalg.eigh(R)
+            # Rank truncation within a quarter of the tolerance
+            keep = (vals > 1e-12 * vals[-1]) \
+                & (np.cumsum(vals) > 0.25 * tol * eta)
+            vecs = vecs[:, keep]
+            overlaps = np.abs(vecs.conj().T @ Q[:, start:stop])**2
+            centers = overlaps @ energies[start:stop] / overlaps.sum(axis=1)
+
+            return centers, vecs * np.sqrt(vals[keep])
+
+        def spread(idx):
+            start, stop = groups[idx][0], groups[idx + 1][1]
+            w, e = weights[start:stop], energies[start:stop]
+            center = (w * e).sum() / w.sum() if w.sum() else e.mean()
+            return (w * np.abs(e - center)).sum()
+
+        # Merging adjacent groups of poles, closest first
+        groups = [(idx, idx + 1) for idx in range(energies.size)]
+        terms = [components(*group) for group in groups]
+        costs = [spread(idx) for idx in range(len(groups) - 1)]
+        while costs and min(costs) < np.inf:
+            idx = int(np.argmin(costs))
+            group = (groups[idx][0], groups[idx + 1][1])
+            term = components(*group)
+            trial = error + change(terms[idx:idx + 2], [term])
+            if not within(trial, 0.5 * tol):
+                costs[idx] = np.inf
+                continue
+
+            error = trial
+            groups[idx:idx + 2] = [group]
+            terms[idx:idx + 2] = [term]
+
+            # Only merges involving the new group have changed
+            del costs[idx]
+            for jdx in (idx - 1, idx):
+                if 0 <= jdx < len(costs):
+                    costs[jdx] = spread(jdx)
+
+        new_energies = np.concatenate([term[0] for term in terms])
+        vectors = np.concatenate([term[1] for term in terms], axis=1)
+
+        # Dropping smallest components within the whole tolerance
+        keep = np.ones(new_energies.size, dtype=bool)
+        for idx in np.argsort((np.abs(vectors)**2).sum(axis=0)):
+            term = (new_energies[idx:idx + 1], vectors[:, idx:idx + 1])
+            trial = error + change([term], [])
+            if within(trial, tol):
+                error = trial
+                keep[idx] = False
+
+        bound = slack * np.linalg.norm(
+            error.reshape(-1, dim, dim), ord=2, axis=(1, 2)).max()
+
+        return LehmannGF(
+            energies=new_energies[keep],
+            Q=vectors[:, keep],
+            error_bound=self.error_bound + bound,
+            info=self.info
+        )
+
+    def save(self, file: str) -> None:
+        """Saves the Green's function as a numpy archive.
+
+        Parameters
+        ----------
+        file: str, default=None
+            Path of the '.npz' archive.
+        """
+        np.savez(file, energies=self.energies, Q=self.Q,
+                 error_bound=self.error_bound)
+        return
+
+    @staticmethod
+    def load(file: str) -> "LehmannGF":
+        """Reads a Green's function saved with 'LehmannGF.save'.
+
+        Parameters
+        ----------
+        file: str, default=None
+            Path of the '.npz' archive.
+
+        Returns
+        -------
+        -: LehmannGF
+        """
+        with np.load(file) as archive:
+            return LehmannGF(archive['energies'], archive['Q'],
+                             float(archive['error_bound']))
+
+
+def read_solution(file: str, cluster=0) -> LehmannGF:
+    """Reads the Lehmann representation of a cluster Green's function inside
+    a model file saved by 'pyqcm' (ex: './nqft/Data/model_3x4/*.py').
+
+    Parameters
+    ----------
+    file: str, default=None
+        Path to model file.
+
+    cluster: int, default=0
+        Index of the cluster solution to read.
+
+    Returns
+    -------
+    -: LehmannGF
+        Cluster Green's function. Its 'info' attribute contains model
+        parameters, 'GS_energy' and 'GS_sector'.
+    """
+    with open(file, "r") as model:
+        text = model.read()
+
+    solutions = re.findall(r'solution\[\d+\] = """(.*?)"""', text, re.S)
+    lines = solutions[cluster].strip().split('\n')
+
+    info = {}
+    for idx, line in enumerate(lines):
+        items = line.split()
+
+        if not items:
+            continue
+
+        elif items[0] == 'GS_energy:':
+            info['GS_energy'] = float(items[1])
+            info['GS_sector'] = items[3]
+
+        elif len(items) == 2 and items[0] not in ('state', 'mixing'):
+            try:
+                info[items[0]] = float(items[1])
+            except ValueError:
+                pass
+
+        elif items[0] == 'w':
+            dim, poles = int(items[1]), int(items[2])
+            table = np.array(
+                [row.split() for row in lines[idx + 1:idx + 1 + poles]],
+                dtype=np.float64).reshape(poles, dim + 1)
+
+            return LehmannGF(table[:, 0], table[:, 1:].T, info=info)
+
+    raise ValueError(f"No Green's function found in: {file}")
+
+
+def compress_solution(file: str, eta=0.1, tol=1e-4, cluster=0) -> LehmannGF:
+    """Compresses the cluster Green's function of a model file and stores it
+    alongside the original as '<model file>_compressed.npz'.
+
+    Parameters
+    ----------
+    file: str, default=None
+        Path to model file.
+
+    eta: float, default=0.1
+        Smallest broadening at which the Green's function is evaluated.
+
+    tol: float, default=1e-4
+        Maximum error on G(z) (operator norm).
+
+    cluster: int, default=0
+        Index of the cluster solution to compress.
+
+    Returns
+    -------
+    compressed: LehmannGF
+        Compressed Green's function.
+    """
+    compressed = read_solution(file, cluster).compress(eta=eta, tol=tol)
+    compressed.save(f"{file.removesuffix('.py')}_compressed.npz")
+
+    return compressed
+
+
+if __name__ == "__main__":
+    gf = read_solution('./nqft/Data/model_3x4/model_3x4_n12_U8.py')
+    small = gf.compress(eta=0.1, tol=1e-3)
+
+    z = np.linspace(-6, 6, 500) + 0.1j
+    error = np.linalg.norm(gf(z) - small(z), ord=2, axis=(1, 2)).max()
+    print(f"{gf.poles} -> {small.poles} poles, error {error:.2e} "
+          f"(bound {small.error_bound:.2e})")
@@ -1,21 +1,35 @@
-"""Docs
+"""This module contains the disorder averaging of spectral functions of
+periodic square lattices with random on-site energies (Anderson disorder),
+
+        h = h_0 + sum_i epsilon_i c_i^dag c_i,   epsilon_i ~ N(mu, std),
+
+where h_0 is the t-tp-tpp hopping matrix ('build_h'). Each realization
+breaks translation invariance: its momentum resolved spectral weight
+A(k, w) = -Im <k|G(w + i eta)|k> / pi is averaged over realizations, which
+restores it.
 """
 
 import numpy as np
 from numpy.fft import fft2
 import matplotlib.pyplot as plt
-from numpy.random import normal
 from numpy.linalg import eigh, inv
-from scipy.signal import convolve2d
+from concurrent.futures import ProcessPoolExecutor
+from scipy.sparse import coo_matrix, csr_matrix, diags, identity
+from scipy.sparse.linalg import splu
 
 from nqft.functions import timeit
 
 
 @timeit
-def build_h(shape: tuple, hops: np.array = (0.0, 0.0, 0.0)) -> np.ndarray:
+def build_h(shape: tuple, hops: np.array = (0.0, 0.0, 0.0),
+            sparse=False) -> np.ndarray:
     """Generates the hamiltonian of a periodic square cluster using circular
     boundary conditions for hopping amplitudes.
 
+    Every (t, t', t'') link is an offset of site coordinates: its rows and
+    columns are computed for all sites at once with modular arithmetic
+    (links folded onto the same pair of sites are summed).
+
     Parameters
     ----------
     shape: tuple[int], size=2, default=None
@@ -24,71 +38,450 @@ def build_h(shape: tuple, hops: np.array = (0.0, 0.0, 0.0)) -> np.ndarray:
     hops: np.array[float], size=3, default=(0.0, 0.0, 0.0)
         Hopping amplitudes of the system.
 
+    sparse: bool, default=False
+        Returns a scipy.sparse.csr_matrix (large lattices).
+
     Returns
     -------
     h: np.ndarray[float], shape=(shape[0]*shape[1], shape[0]*shape[1])
         Hamiltonian of the system.
+
+    Examples
+    --------
+    >>> build_h((300, 300), hops=(1.0, -0.3, 0.2), sparse=True)
+    <Compressed Sparse Row sparse matrix of dtype 'float64'
+        with 1080000 stored elements and shape (90000, 90000)>
     """
     t, tp, tpp = hops
     n_sites = shape[0] * shape[1]
-    cluster = np.zeros(shape=shape)
-    h = np.zeros(shape=(n_sites, n_sites))
-    t_ij_kernel = np.array([
-        [0, 0, tpp, 0, 0],
-        [0, tp, t, tp, 0],
-        [tpp, t, 0, t, tpp],
-        [0, tp, t, tp, 0],
-        [0, 0, tpp, 0, 0]
-    ])
+    offsets = [
+        ((1, 0), t), ((-1, 0), t), ((0, 1), t), ((0, -1), t),
+        ((1, 1), tp), ((1, -1), tp), ((-1, 1), tp), ((-1, -1), tp),
+        ((2, 0), tpp), ((-2, 0), tpp), ((0, 2), tpp), ((0, -2), tpp)
+    ]
+    offsets = [(offset, amp) for offset, amp in offsets if amp != 0]
+
+    rows_idx, cols_idx = np.indices(shape).reshape(2, -1)
+    rows, cols, data = [], [], []
+    for (di, dj), amp in offsets:
+        rows.append((rows_idx + di) % shape[0] * shape[1]
+                    + (cols_idx + dj) % shape[1])
+        cols.append(np.arange(n_sites))
+        data.append(np.full(n_sites, amp, dtype=np.float64))
 
-    colmn = 0
-    for coords in np.ndindex(shape):
-        i, j = coords
-        cluster[i, j] = 1.0
+    if not offsets:
+        h = csr_matrix((n_sites, n_sites))
+    else:
+        h = coo_matrix((np.concatenate(data), (np.concatenate(rows),
+                                               np.concatenate(cols))),
+                       shape=(n_sites, n_sites)).tocsr()
 
-        h[:, colmn] = convolve2d(
-            cluster, t_ij_kernel, mode='same', boundary='wrap').ravel()
+    return h if sparse else h.toarray()
 
-        cluster[i, j] = 0.0
-        colmn += 1
 
-    return h
+def plane_waves(shape: tuple, momenta: np.ndarray) -> np.ndarray:
+    """Normalized plane waves |k> = exp(i k.r) / sqrt(N) of a periodic
+    lattice, k = 2 pi (m / shape[0], n / shape[1]).
+
+    Parameters
+    ----------
+    shape: tuple[int], size=2, default=None
+        Shape of the lattice (sites are numbered row by row).
 
+    momenta: np.ndarray[int], shape=(n_k, 2), default=None
+        Grid indices (m, n) of the wavevectors.
 
-def r(idx: int, shape: tuple) -> np.array:
-    """Docs
+    Returns
+    -------
+    -: np.ndarray[complex], shape=(N, n_k)
     """
-    return np.array([idx % shape[1], idx // shape[1]])
+    rows, cols = np.indices(shape).reshape(2, -1)
+    momenta = np.asarray(momenta).reshape(-1, 2)
+    phases = np.outer(rows, momenta[:, 0]) / shape[0] \
+        + np.outer(cols, momenta[:, 1]) / shape[1]
 
+    return np.exp(2j * np.pi * phases) / np.sqrt(rows.size)
 
-@timeit
-# ------------------
-# Return type needed
-# ------------------
-def monte_carlo(h: np.ndarray, shape: tuple, omega: float, eta: float,
-                mu: float, std: float):
-    """Docs
+
+def _eigh_spectra(h: csr_matrix, shape: tuple, omegas: np.ndarray,
+                  eta: float, momenta=None) -> tuple:
+    """Spectral weights of one realization from its eigenvectors: their
+    lattice Fourier transforms give |<k|n>|^2 and every frequency only costs
+    a sum over eigenvalues.
+    """
+    energies, states = eigh(h.toarray())
+    weights = np.abs(fft2(states.reshape(*shape, -1), axes=(0, 1)))**2 \
+        / states.shape[0]
+    if momenta is not None:
+        weights = weights[momenta[:, 0], momenta[:, 1]]
+
+    lorentzians = eta / np.pi / ((omegas[:, None] - energies)**2 + eta**2)
+
+    return (np.tensordot(lorentzians, weights, axes=(1, -1)),
+            lorentzians.mean(axis=1))
+
+
+def _solve_spectra(h: csr_matrix, waves: np.ndarray, probes: np.ndarray,
+                   omegas: np.ndarray, eta: float) -> np.ndarray:
+    """Diagonal elements <v|G(w + i eta)|v> / <v|v> of the columns of
+    'waves' and 'probes' from one sparse LU factorization per frequency.
+    """
+    vectors = np.column_stack([waves, probes])
+    norms = (np.abs(vectors)**2).sum(axis=0)
+    unit = identity(h.shape[0], format='csc')
+
+    spectra = np.empty((omegas.size, vectors.shape[1]))
+    for idx, omega in enumerate(omegas):
+        lu = splu(((omega + 1j * eta) * unit - h).tocsc())
+        G = (vectors.conj() * lu.solve(vectors)).sum(axis=0) / norms
+        spectra[idx] = -G.imag / np.pi
+
+    return spectra
+
+
+def _kpm_spectra(h: csr_matrix, waves: np.ndarray, probes: np.ndarray,
+                 omegas: np.ndarray, eta: float, kernel=4.0) -> np.ndarray:
+    """Local densities <v|delta(w - h)|v> / <v|v> of the columns of
+    'waves' and 'probes' with the kernel polynomial method. The Lorentz
+    kernel (lambda = 'kernel') broadens peaks into Lorentzians of width
+    eta at the center of the spectrum (narrower towards its edges), which
+    sets the number of Chebyshev moments, M = lambda a / eta.
+    """
+    # Gershgorin bounds of the spectrum, mapped to [-1, 1]
+    centers = h.diagonal()
+    radii = np.asarray(abs(h).sum(axis=1)).ravel() - np.abs(centers)
+    low, high = (centers - radii).min(), (centers + radii).max()
+    a, b = 1.01 * (high - low) / 2, (high + low) / 2
+    h_scaled = (h - b * identity(h.shape[0], format='csr')) / a
+
+    moments_nb = 2 * int(np.ceil(kernel * a / eta / 2))
+    vectors = np.column_stack([waves, probes]).astype(np.complex128)
+    norms = (np.abs(vectors)**2).sum(axis=0)
+
+    # Products of Chebyshev vectors give two moments each
+    moments = np.empty((moments_nb, vectors.shape[1]))
+    previous, current = vectors, h_scaled @ vectors
+    moments[0] = norms
+    moments[1] = (vectors.conj() * current).sum(axis=0).real
+    for n in range(1, moments_nb // 2):
+        moments[2 * n] = 2 * (np.abs(current)**2).sum(axis=0) - moments[0]
+        previous, current = current, 2 * (h_scaled @ current) - previous
+        moments[2 * n + 1] = 2 * (current.conj() * previous).sum(
+            axis=0).real - moments[1]
+    moments /= norms
+
+    m = np.arange(moments_nb)
+    damping = np.sinh(kernel * (1 - m / moments_nb)) / np.sinh(kernel)
+    damping[1:] *= 2
+
+    x = np.clip((omegas - b) / a, -1, 1)
+    inside = np.abs((omegas - b) / a) < 1
+    chebyshev = np.cos(np.outer(np.arccos(x), m))
+    spectra = chebyshev @ (damping[:, None] * moments)
+    spectra /= np.pi * a * np.sqrt(np.where(inside, 1 - x**2, 1.0))[:, None]
+
+    return np.where(inside[:, None], spectra, 0.0)
+
+
+def _disorder_batch(task: tuple) -> tuple[np.ndarray]:
+    """Sums of spectral weights over a batch of disorder realizations (run
+    in a separate process).
+
+    Parameters
+    ----------
+    task: tuple, size=11, default=None
+        Hopping matrix, lattice shape, frequencies, broadening, mean and
+        standard deviation of on-site energies, method, momenta, number of
+        random vectors, number of realizations and seed.
+
+    Returns
+    -------
+    A, A2, dos, dos2: tuple[np.ndarray], size=4
+        Sums of A(k, w) and DOS(w) and of their squares.
+    """
+    (h0, shape, omegas, eta, mu, std, method, momenta, probes, size,
+     seed) = task
+    n_sites = h0.shape[0]
+    disorder_rng, probe_rng = (np.random.default_rng(s)
+                               for s in seed.spawn(2))
+
+    sums = None
+    for _ in range(size):
+        h = (h0 + diags(disorder_rng.normal(mu, std, n_sites))).tocsr()
+        if method == "eigh":
+            A, dos = _eigh_spectra(h, shape, omegas, eta, momenta)
+
+        else:
+            spectra = _solve_spectra if method == "solve" else _kpm_spectra
+            grid = momenta if momenta is not None else np.argwhere(
+                np.ones(shape, dtype=bool))
+            vectors = probe_rng.choice([-1.0, 1.0], size=(n_sites, probes))
+
+            # Plane waves are built in chunks (N x N for the whole grid)
+            chunks = [spectra(h, plane_waves(shape, chunk),
+                              np.empty((n_sites, 0)), omegas, eta)
+                      for chunk in np.array_split(
+                          grid, max(1, len(grid) // 256))]
+            A = np.concatenate(chunks, axis=1)
+            if momenta is None:
+                A = A.reshape(omegas.size, *shape)
+            dos = spectra(h, np.empty((n_sites, 0)), vectors, omegas,
+                          eta).mean(axis=1)
+
+        terms = (A, A**2, dos, dos**2)
+        sums = terms if sums is None else tuple(
+            total + term for total, term in zip(sums, terms))
+
+    return sums
+
+
+def disorder_average(shape: tuple, hops: np.array, omegas: np.ndarray,
+                     eta=0.1, mu=0.0, std=1.0, realizations=100, batch=10,
+                     method=None, momenta=None, probes=16, workers=None,
+                     seed=None) -> dict:
+    """Disorder averaged spectral weight A(k, w) and density of states of a
+    periodic lattice with random on-site energies.
+
+    Realizations are computed in batches by parallel processes with one of
+    three routes, all giving Lorentzian broadened spectra:
+
+        - 'eigh': dense diagonalization (the Fourier transforms of the
+          eigenvectors give every momentum and frequency),
+        - 'solve': one sparse LU factorization of w + i eta - h per
+          frequency (few frequencies),
+        - 'kpm': Chebyshev expansion (kernel polynomial method) of the
+          plane waves (large lattices, many frequencies).
+
+    With 'solve' and 'kpm' the density of states is a stochastic trace
+    over 'probes' random vectors.
+
+    Parameters
+    ----------
+    shape: tuple[int], size=2, default=None
+        Shape of the lattice.
+
+    hops: np.array[float], size=3, default=None
+        Hopping amplitudes (t, tp, tpp).
+
+    omegas: np.ndarray, default=None
+        Real frequencies.
+
+    eta: float, default=0.1
+        Lorentzian broadening.
+
+    mu: float, default=0.0
+        Mean on-site energy.
+
+    std: float, default=1.0
+        Standard deviation of on-site energies (disorder strength).
+
+    realizations: int, default=100
+        Number of disorder realizations.
+
+    batch: int, default=10
+        Number of realizations per process task.
+
+    method: str, default='eigh' up to 2500 sites, else 'solve' for up to
+    4 frequencies, else 'kpm'
+        Route used for each realization.
+
+    momenta: np.ndarray[int], shape=(n_k, 2), default=whole grid
+        Grid indices (m, n) of the wavevectors k = 2 pi (m / shape[0],
+        n / shape[1]).
+
+    probes: int, default=16
+        Number of random vectors of the stochastic traces.
+
+    workers: int, default=None
+        Number of processes (default is the number of processors).
+
+    seed: int, default=None
+        Seed of the disorder (and random vectors).
+
+    Returns
+    -------
+    -: dict
+        Keys 'omega', 'A_kw' (shape (n_w, *shape), or (n_w, n_k) with
+        'momenta'), 'dos', their '_err' (standard errors of the averages),
+        'realizations' and 'method'.
+
+    Examples
+    --------
+    >>> omegas = np.linspace(-5, 5, 201)
+    >>> result = disorder_average((20, 20), (1.0, -0.3, 0.2), omegas,
+    ...                           std=0.5, realizations=40)
+    >>> result['A_kw'].shape
+    (201, 20, 20)
     """
-    # length = h.shape[0]
-    # mus = normal(loc=mu, scale=std, size=(length,))
-    # epsilon_ij = np.diag(v=mus)
-    # h += epsilon_ij
+    omegas = np.atleast_1d(np.asarray(omegas, dtype=np.float64))
+    n_sites = shape[0] * shape[1]
+    if method is None:
+        method = "eigh" if n_sites <= 2500 else \
+            "solve" if omegas.size <= 4 else "kpm"
+    if method not in ("eigh", "solve", "kpm"):
+        raise ValueError(f"Unknown method: {method}")
+    if momenta is not None:
+        momenta = np.asarray(momenta).reshape(-1, 2)
+
+    h0 = build_h(shape, hops, sparse=True)
+    sizes = [min(batch, realizations - start)
+             for start in range(0, realizations, batch)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(h0, shape, omegas, eta, mu, std, method, momenta, probes,
+              size, seed) for size, seed in zip(sizes, seeds)]
+
+    sums = None
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for batch_sums in executor.map(_disorder_batch, tasks):
+            sums = batch_sums if sums is None else tuple(
+                total + term for total, term in zip(sums, batch_sums))
+
+    def average(total, squares):
+        mean = total / realizations
+        if realizations == 1:
+            return mean, np.zeros_like(mean)
+        variance = np.maximum(squares / realizations - mean**2, 0)
+        return mean, np.sqrt(variance / (realizations - 1))
+
+    A_kw, A_kw_err = average(*sums[:2])
+    dos, dos_err = average(*sums[2:])
+
+    return {
+        'omega': omegas,
+        'A_kw': A_kw,
+        'A_kw_err': A_kw_err,
+        'dos': dos,
+        'dos_err': dos_err,
+        'realizations': realizations,
+        'method': method
+    }
+
+
+def translation_average(G: np.ndarray, shape: tuple) -> np.ndarray:
+    """Averages a function of pairs of sites over lattice translations,
+
+            G(dr) = 1 / N sum_i G(r_i, r_i - dr),
+
+    with periodic boundary conditions.
+
+    Parameters
+    ----------
+    G: np.ndarray, shape=(..., N, N), default=None
+        Function of pairs of sites (ex: G_ij(w)), batched over leading
+        axes.
+
+    shape: tuple[int], size=2, default=None
+        Shape of the lattice (sites are numbered row by row).
+
+    Returns
+    -------
+    -: np.ndarray, shape=(..., *shape)
+        Function of the displacement dr (grid indices modulo 'shape').
+    """
+    n0, n1 = shape
+    G = np.asarray(G).reshape(*np.shape(G)[:-2], n0, n1, n0, n1)
+
+    # Column (a - d0, b - d1) of row (a, b), for every displacement (d0, d1)
+    a = np.arange(n0)[:, None, None, None]
+    b = np.arange(n1)[None, :, None, None]
+    columns = (a - np.arange(n0)[:, None]) % n0, \
+        (b - np.arange(n1)) % n1
+
+    return G[..., a, b, columns[0], columns[1]].mean(axis=(-4, -3))
+
+
+def momentum_transform(G: np.ndarray, shape: tuple) -> np.ndarray:
+    """Momentum diagonal of a function of pairs of sites,
 
-    # vals, vects = eigh(h)
+            G(k) = 1 / N sum_ij exp(-i k.(r_i - r_j)) G_ij
+                 = sum_dr exp(-i k.dr) G(dr),
 
-    z = omega + eta * 1j
-    G_ij = inv(z - h)
+    k = 2 pi (m / shape[0], n / shape[1]), computed with a 2D FFT of the
+    translation average G(dr) (O(N^2) instead of O(N^3) for N sites).
+
+    Parameters
+    ----------
+    G: np.ndarray, shape=(..., N, N) or (..., *shape), default=None
+        G_ij or its translation average G(dr) (output of
+        'translation_average'), batched over leading axes (ex: frequencies,
+        realizations).
+
+    shape: tuple[int], size=2, default=None
+        Shape of the lattice.
+
+    Returns
+    -------
+    -: np.ndarray, shape=(..., *shape)
+        G(k) on the grid of wavevectors.
+
+    Examples
+    --------
+    >>> h = build_h((30, 30), hops=(1.0, -0.3, 0.2))
+    >>> z = np.array([0.1j, 1 + 0.1j])[:, None, None]
+    >>> G = np.linalg.inv(z * np.identity(900) - h)
+    >>> momentum_transform(G, shape=(30, 30)).shape
+    (2, 30, 30)
+    """
+    G = np.asarray(G)
     n_sites = shape[0] * shape[1]
-    G_kw = np.zeros(shape=shape, dtype=np.complex128)
-    # for i in range(n_sites):
-    #     r_i = r(i, shape)
-    #     for j in range(n_sites):
-    #         r_j = r(j, shape)
-    #         delta_r = r_i - r_j
-    #         for k in range(n_sites):
-    #             k_vec = r(k, shape)
-    #             G_kw[k_vec[0], k_vec[1]
-    #                  ] += np.exp(1j * np.dot(k_vec, delta_r)) * G_ij[i, j]
+    if G.shape[-2:] != tuple(shape):
+        if G.shape[-2:] != (n_sites, n_sites):
+            raise ValueError(f"Expected (..., {n_sites}, {n_sites}) or "
+                             f"(..., *{tuple(shape)}) array, got: {G.shape}")
+        G = translation_average(G, shape)
+
+    return fft2(G, axes=(-2, -1))
+
+
+@timeit
+def monte_carlo(h: np.ndarray, shape: tuple, omega: float, eta: float,
+                mu: float, std: float, realizations=1,
+                seed=None) -> np.ndarray:
+    """Spectral weight A(k, w) of a lattice with random on-site energies
+    N(mu, std), averaged over realizations, from the inverses of
+    w + i eta - h (batched over frequencies and realizations) and their
+    momentum transforms. See 'disorder_average' for large lattices.
+
+    Parameters
+    ----------
+    h: np.ndarray, shape=(N, N), default=None
+        Hopping matrix (output of 'build_h').
+
+    shape: tuple[int], size=2, default=None
+        Shape of the lattice.
+
+    omega: float or np.ndarray, default=None
+        Real frequency (or frequencies).
+
+    eta: float, default=None
+        Lorentzian broadening.
+
+    mu: float, default=None
+        Mean on-site energy.
+
+    std: float, default=None
+        Standard deviation of on-site energies.
+
+    realizations: int, default=1
+        Number of disorder realizations.
+
+    seed: int, default=None
+        Seed of the disorder.
+
+    Returns
+    -------
+    A_kw: np.ndarray, shape=(*np.shape(omega), *shape)
+        Averaged spectral weight on the grid of wavevectors.
+    """
+    length = h.shape[0]
+    mus = np.random.default_rng(seed).normal(loc=mu, scale=std,
+                                             size=(realizations, length))
+    unit = np.identity(length)
+    h = np.asarray(h)[None] + mus[:, :, None] * unit
+
+    z = np.asarray(omega, dtype=np.float64) + eta * 1j
+    G_ij = inv(z[..., None, None, None] * unit - h)
+    G_kw = momentum_transform(G_ij, shape).mean(axis=-3)
 
     A_kw = -1 / np.pi * G_kw.imag
 
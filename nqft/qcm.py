@@ -7,8 +7,8 @@ import sys
 import numpy as np
 from rich import print
 import importlib as iplib
+from inspect import signature
 from matplotlib import cm
-from numpy import sin, cos
 from scipy.constants import pi
 import matplotlib.pyplot as plt
 
@@ -22,44 +22,29 @@ from pyqcm import (
     sectors,
     cluster_averages,
     new_model_instance,
+    set_parameter,
     set_parameters
 )
 from pyqcm.spectral import mdc
 
-from nqft.functions import read_fermi_arc
-
-
-def build_matrix(shape: tuple) -> list:
-    """Gives a coordinates matrix of a cluster having
-    shape[0]*shape[1] sites.
-
-    Parameters
-    ----------
-    shape: tuple, shape=(2, 1), default=None
-        Shape of sites network.
-
-    Returns
-    -------
-    array: list, shape=(*shape)
-        Nested lists of coordinates.
-
-    Examples
-    --------
-    >>> build_matrix(shape=(2, 2))
-    [[0, 0, 0], [1, 0, 0], [0, 1, 0], [1, 1, 0]]
-    """
-    array, idty = [], np.identity(3, dtype=np.int16)
-    for i in range(shape[0]):
-        for j in range(shape[1]):
-            elem = i * idty[1] + j * idty[0]
-            array.append(elem.tolist())
-
-    return array
+from nqft.functions import (
+    build_matrix,
+    build_superlattice,
+    read_fermi_arc,
+    irreducible_quadrant,
+    unfold_quadrant,
+    append_lines
+)
+from nqft.hall_effect import get_hall_numbers
+from nqft.cache import DiskCache, hash_params
 
 
 class QcmModel:
     """QcmModel instance to make the usage of 'pyqcm' easier.
 
+    Spectral weight, lattice averages and cluster averages are computed on
+    first access and memoized until model parameters change (see 'update').
+
     Attributes
     ----------
     shape: tuple[int], size=2, default=None
@@ -84,7 +69,11 @@ class QcmModel:
         Chemical potential.
 
     resolution: int, default=None
-        Resolution of phase space (k_x, k_y).
+        Resolution of phase space (k_x, k_y). With odd resolutions only the
+        irreducible quadrant is computed by 'pyqcm' (when its 'mdc' accepts
+        'quadrant'); even ones don't share grid points with the quadrant
+        grid, so the full grid is computed (no speedup) and the quadrant
+        sliced from it.
 
     tiling_shift: bool, default=None
         Determines if super-vectors are shifted or exactly orthogonals.
@@ -96,12 +85,16 @@ class QcmModel:
     overwrite: bool, default=False
         Determines if the script reuses an already computed model to do further
         calcultations or if the script computes it from scratch.
+
+    cache: DiskCache, default=None
+        On-disk cache in which spectral functions are looked up before being
+        computed by 'pyqcm.spectral.mdc' and stored after.
     """
 
     def __init__(self, shape: tuple[int], filling: int, interaction: float,
                  hoppings: tuple[float], broadening: float, w: float,
                  mu: float, resolution: int, tiling_shift: bool,
-                 show_spectrum=False, overwrite=False) -> None:
+                 show_spectrum=False, overwrite=False, cache=None) -> None:
         """Initialiazing specified attributes.
         """
         # Cluster geometry related attributes
@@ -135,11 +128,7 @@ class QcmModel:
             add_cluster(name="clus", pos=[0, 0, 0], sites=build_matrix(shape))
 
             # Initialiazing lattice using built cluster
-            if tiling_shift:
-                super_vecs = [[shape[1], 0, 0], [1, shape[0], 0]]
-            else:
-                super_vecs = [[shape[1], 0, 0], [0, shape[0], 0]]
-
+            super_vecs = build_superlattice(shape, tiling_shift)
             lattice_model(name=self.file_name, superlattice=super_vecs)
 
             # Interaction operator U
@@ -199,24 +188,163 @@ class QcmModel:
         self.t, self.tp, self.tpp = hoppings
         self.eta = broadening
         self.res = resolution
+        self.tiling_shift = tiling_shift
 
-        # Computing spectral weight
-        spectral = mdc(
-            freq=w,
-            nk=resolution,
-            eta=broadening,
-            sym='RXY',
-            # data_file=f'{self.model_path}/{self.spectrum_file}',
-            data_file=None,
-            show=show_spectrum
-        )
+        # Observables are computed on first access and memoized
+        self.cache = cache
+        self.show_spectrum = show_spectrum
+        self._memo = {}
+
+        return
+
+    @property
+    def params(self) -> dict:
+        """Full parameter set identifying the spectral function.
+        """
+        return {
+            'shape': self.shape,
+            'filling': self.filling,
+            'interaction': self.u,
+            'hoppings': (self.t, self.tp, self.tpp),
+            'broadening': self.eta,
+            'w': self.w,
+            'mu': self.mu,
+            'resolution': self.res,
+            'tiling_shift': self.tiling_shift
+        }
+
+    @property
+    def cache_key(self) -> str:
+        """Key of the spectral function inside the on-disk cache.
+        """
+        return hash_params(kind='quadrant', **self.params)
+
+    def update(self, interaction=None, hoppings=None, mu=None, w=None,
+               broadening=None, resolution=None) -> None:
+        """Changes model parameters. Memoized observables depending on them
+        are invalidated and recomputed on next access.
+
+        Parameters
+        ----------
+        interaction: float, default=None
+            Coefficient of interation operator.
+
+        hoppings: tuple[float], default=None
+            Hopping amplitudes coefficients.
+
+        mu: float, default=None
+            Chemical potential.
+
+        w: float, default=None
+            Frequency at which we observe the fermi surfaces.
+
+        broadening: float, default=None
+            Lorentzian broadening module.
 
-        self.spectrum = spectral / pi
+        resolution: int, default=None
+            Resolution of phase space (k_x, k_y).
+        """
+        self.w = self.w if w is None else w
+        self.eta = self.eta if broadening is None else broadening
+        self.res = self.res if resolution is None else resolution
+
+        old_values = self._model_state()
+        self.u = self.u if interaction is None else interaction
+        self.mu = self.mu if mu is None else mu
+        if hoppings is not None:
+            self.t, self.tp, self.tpp = hoppings
+
+        # Parameters are already defined: only changed values are set
+        changed = [(name, new) for name, old, new in zip(
+            ("U", "t", "tp", "tpp", "mu"), old_values, self._model_state())
+            if new != old]
+        for name, value in changed:
+            set_parameter(name, value)
+        if changed:
+            new_model_instance()
 
         return
 
+    def _memoized(self, name: str, state: tuple, compute):
+        """Gives observable 'name' computed for parameter 'state', calling
+        'compute' only if it isn't memoized yet for this state.
+        """
+        entry = self._memo.get(name)
+        if entry is None or entry[0] != state:
+            self._memo[name] = (state, compute())
+
+        return self._memo[name][1]
+
+    def _model_state(self) -> tuple:
+        return (self.u, self.t, self.tp, self.tpp, self.mu)
+
+    def _spectral_state(self) -> tuple:
+        return self._model_state() + (self.w, self.eta, self.res)
+
+    @property
+    def quadrant(self) -> np.ndarray:
+        """Spectral weight on the irreducible quadrant of the Brillouin zone
+        ('RXY' symmetry). It is computed on first access only.
+        """
+        return self._memoized(
+            'quadrant', self._spectral_state(), self._compute_quadrant)
+
+    @property
+    def spectrum(self) -> np.ndarray:
+        """Spectral weight over the full Brillouin zone. It is rebuilt from
+        the irreducible quadrant on first access only.
+        """
+        return self._memoized(
+            'spectrum', self._spectral_state(),
+            lambda: unfold_quadrant(self.quadrant, self.res))
+
+    def _compute_quadrant(self) -> np.ndarray:
+        """Computes spectral weight on the irreducible quadrant or reads it
+        from cache.
+        """
+        quadrant = None
+        if self.cache is not None:
+            quadrant = self.cache.get_spectrum(self.cache_key)
+
+        if quadrant is None:
+            # Quadrant grid linspace(0, pi, N // 2 + 1) is part of the full
+            # grid linspace(-pi, pi, N) only if N is odd. On that grid the
+            # 'X' and 'Y' mirrors of 'mdc' would average k with pi - k, so
+            # only the 'R' transpose is applied there.
+            if self.res % 2 and "quadrant" in signature(mdc).parameters:
+                quadrant = mdc(
+                    freq=self.w,
+                    nk=self.res // 2 + 1,
+                    eta=self.eta,
+                    sym='R',
+                    quadrant=True,
+                    data_file=None,
+                    show=self.show_spectrum
+                )
+
+            else:
+                quadrant = irreducible_quadrant(mdc(
+                    freq=self.w,
+                    nk=self.res,
+                    eta=self.eta,
+                    sym='RXY',
+                    # data_file=f'{self.model_path}/{self.spectrum_file}',
+                    data_file=None,
+                    show=self.show_spectrum
+                )).copy()
+
+            if self.cache is not None:
+                self.cache.put_spectrum(self.cache_key, quadrant, self.params)
+
+        else:
+            self.cache.flush()
+            print(f"Spectrum '{self.file_name}' read from cache.")
+
+        return quadrant / pi
+
     def get_lattice_averages(self, operators: list[str]) -> dict:
-        """Computes lattice operator averages.
+        """Computes lattice operator averages. They are memoized until a
+        parameter changes.
 
         Parameters
         ----------
@@ -229,10 +357,13 @@ class QcmModel:
             Dictionnary containing operator names as keys and average as
             values.
         """
-        return averages(ops=operators)
+        return self._memoized(
+            f'lattice_averages:{",".join(operators)}', self._model_state(),
+            lambda: averages(ops=operators))
 
     def get_cluster_averages(self, operators: list[str]) -> dict:
-        """Computes single cluster operator averages.
+        """Computes single cluster operator averages. They are memoized until
+        a parameter changes.
 
         Parameters
         ----------
@@ -245,7 +376,8 @@ class QcmModel:
             Dictionnary containing operator names as keys and tuples as values
             representing operator average and it's variance.
         """
-        avgs = cluster_averages()
+        avgs = self._memoized(
+            'cluster_averages', self._model_state(), cluster_averages)
         out_dict = {i: j for i, j in avgs.items() if i in operators}
 
         return out_dict
@@ -384,7 +516,8 @@ class QcmModel:
 
 
 def get_hall_coeff(spectral_weight: np.ndarray, hoppings: tuple[float],
-                   x_coord=None, file="./nqft/Data/hall.txt") -> float:
+                   x_coord=None, file="./nqft/Data/hall.txt", cache=None,
+                   spectrum_key=None, resolution=None) -> float:
     """Computes Hall coefficient for given parameters and writes it to a file
     using specified x coordinate.
 
@@ -403,60 +536,121 @@ def get_hall_coeff(spectral_weight: np.ndarray, hoppings: tuple[float],
     file: str, default="./nqft/Data/hall.txt"
         Path to file in which write Hall coefficient and given x coord.
 
+    cache: DiskCache, default=None
+        On-disk cache in which Hall coefficient is looked up (using
+        'spectrum_key' and hoppings as key) before being computed.
+
+    spectrum_key: str, default=None
+        Parameter key of the spectral function (ex: 'QcmModel.cache_key'),
+        needed with 'cache'.
+
+    resolution: int, default=None
+        Resolution N of the full momentum grid when 'spectral_weight' is only
+        its irreducible quadrant (see 'QcmModel.quadrant'). Sums are then
+        computed on the reduced domain using multiplicity weights.
+
     Returns
     -------
     n_h: float
         Hall coefficient as a float.
     """
-    # Model's energy derivatives
-    t, tp, tpp = hoppings
-    normalize = 1 / spectral_weight.shape[0]**2
-    momentum = np.linspace(-pi, pi, spectral_weight.shape[0])
-    k_x, k_y = np.meshgrid(momentum, momentum)
+    if cache is not None and spectrum_key is None:
+        raise ValueError("Caching Hall coefficient needs 'spectrum_key'.")
+
+    key = hash_params(
+        kind='hall', spectrum=spectrum_key, hoppings=hoppings,
+        resolution=resolution)
+    record = cache.get_record(key) if cache is not None else None
+
+    if record is None:
+        n_h = _hall_coeff(spectral_weight, hoppings, resolution)
+        if cache is not None:
+            cache.put_record(key, {'n_h': n_h}, {'hoppings': hoppings})
+    else:
+        n_h = record['n_h']
+        cache.flush()
+
+    if file and x_coord:
+        with open(file, "a") as file:
+            file.write(f'{x_coord} {n_h}\n')
+            file.close()
+    else:
+        print(f"User must give 'x coordinate' to write data in: {file}")
 
-    # Ex derivatives
-    dE_dx = 2 * (t * sin(k_x) +
-                 tp * (sin(k_x - k_y) + sin(k_x + k_y)) +
-                 2 * tpp * sin(2 * k_x))
+    return n_h
 
-    ddE_dxx = 2 * (t * cos(k_x) +
-                   tp * (cos(k_x - k_y) + cos(k_x + k_y)) +
-                   4 * tpp * cos(2 * k_x))
 
-    # Ey derivatives
-    dE_dy = 2 * (t * sin(k_y) +
-                 tp * (sin(k_x + k_y) - sin(k_x - k_y)) +
-                 2 * tpp * sin(2 * k_y))
+def get_hall_coeffs(spectral_weights, hoppings: tuple[float],
+                    x_coords=None, file="./nqft/Data/hall.txt",
+                    resolution=None, chunk_size=64) -> np.array:
+    """Computes Hall coefficients of many spectral weights at once and writes
+    them to a file using specified x coordinates.
 
-    ddE_dyy = 2 * (t * cos(k_y) +
-                   tp * (cos(k_x + k_y) + cos(k_x - k_y)) +
-                   4 * tpp * cos(2 * k_y))
+    Parameters
+    ----------
+    spectral_weights: np.ndarray or iterable, shape=(M, N, N), default=None
+        Stack of spectral functions (or an iterator yielding them) used to
+        compute Hall coefficients.
 
-    # Mixed derivative
-    ddE_dxdy = 2 * tp * (cos(k_x + k_y) - cos(k_x - k_y))
+    hoppings: tuple[float], size=3, default=None
+        Hopping amplitudes corresponding to spectral functions.
 
-    # Conductivities (ii)
-    sigma_xx = -(dE_dx**2 * spectral_weight**2).sum()
-    sigma_yy = -(dE_dy**2 * spectral_weight**2).sum()
+    x_coords: array-like, size=M, default=None
+        X coordinates to use when writting Hall coefficients to a file.
 
-    # Conductivity (ij)
-    xy_1 = -2 * dE_dx * dE_dy * ddE_dxdy
-    xy_2 = (dE_dx**2 * ddE_dyy) + (dE_dy**2 * ddE_dxx)
-    sigma_xy = -((xy_1 + xy_2) * spectral_weight**3).sum()
+    file: str, default="./nqft/Data/hall.txt"
+        Path to file in which append Hall coefficients and given x coords.
+        All lines are appended in a single write.
 
-    # Hall coefficient
-    n_h = 6 * normalize * sigma_xx * sigma_yy / sigma_xy
+    resolution: int, default=None
+        Resolution N of the full momentum grid when spectral weights are only
+        irreducible quadrants (see 'QcmModel.quadrant').
+
+    chunk_size: int, default=64
+        Number of spectral functions reduced together when reading them from
+        an iterator.
+
+    Returns
+    -------
+    n_h: np.array, size=M
+        Hall coefficients.
+    """
+    if isinstance(spectral_weights, np.ndarray):
+        n_h = get_hall_numbers(spectral_weights, hoppings, resolution)
 
-    if file and x_coord:
-        with open(file, "a") as file:
-            file.write(f'{x_coord} {n_h}\n')
-            file.close()
     else:
-        print(f"User must give 'x coordinate' to write data in: {file}")
+        n_h, chunk = [], []
+        for spectral_weight in spectral_weights:
+            chunk.append(spectral_weight)
+            if len(chunk) == chunk_size:
+                n_h.append(get_hall_numbers(chunk, hoppings, resolution))
+                chunk = []
+
+        if chunk:
+            n_h.append(get_hall_numbers(chunk, hoppings, resolution))
+
+        n_h = np.concatenate(n_h) if n_h else np.array([])
+
+    if file and x_coords is not None:
+        if len(x_coords) != len(n_h):
+            raise ValueError(f"Got {len(x_coords)} x coordinates for "
+                             f"{len(n_h)} Hall coefficients.")
+        append_lines(file, [f'{x} {n}' for x, n in zip(x_coords, n_h)])
+    else:
+        print(f"User must give 'x coordinates' to write data in: {file}")
 
     return n_h
 
 
+def _hall_coeff(spectral_weight: np.ndarray, hoppings: tuple[float],
+                resolution=None) -> float:
+    """Computes Hall coefficient of given spectral weight (see
+    'get_hall_coeff').
+    """
+    return float(get_hall_numbers(
+        spectral_weight[None, ...], hoppings, resolution)[0])
+
+
 if __name__ == "__main__":
     u = 2.0
     mu = float(sys.argv[1])
@@ -471,10 +665,11 @@ if __name__ == "__main__":
         broadening=0.1,
         w=0.0,
         mu=mu,
-        resolution=400,
+        resolution=401,
         tiling_shift=True,
         show_spectrum=False,
-        overwrite=True
+        overwrite=True,
+        cache=DiskCache()
     )
 
     # Plots
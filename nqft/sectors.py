@@ -0,0 +1,226 @@
+"""This module contains a scheduler diagonalizing the (N_up, N_down) sectors
+of a 'nqft.hamiltonian.Network' in parallel processes.
+
+Sectors are independent problems of very different sizes: they are sized
+first, then submitted largest first so the longest ones don't end the run
+alone, each worker process having a limited address space. The lowest
+eigenvalues of every sector form a global spectrum in which the ground
+state sector is found (as 'pyqcm' reports it: 'R0:N12:S0').
+"""
+
+import resource
+import numpy as np
+from rich import print
+from concurrent.futures import ProcessPoolExecutor
+from scipy.sparse.linalg import eigsh
+
+from nqft.krylov import lanczos
+
+
+def sector_memory(dim: int, k=1, dense_dim=64) -> int:
+    """Rough peak memory needed to diagonalize a sector.
+
+    Parameters
+    ----------
+    dim: int, default=None
+        Dimension of the sector.
+
+    k: int, default=1
+        Number of eigenpairs.
+
+    dense_dim: int, default=64
+        Sectors up to this dimension are diagonalized as dense matrices.
+
+    Returns
+    -------
+    -: int
+        Number of bytes.
+    """
+    if dim <= max(dense_dim, k + 1):
+        return 3 * 8 * dim**2
+
+    # Lanczos (or ARPACK) vectors, 'HubbardOperator' buffers and diagonal
+    vectors = 6 if k == 1 else max(2 * k + 1, 20) + k
+    return (8 * (vectors + 4) + 9) * dim
+
+
+def _limit_memory(limit: int) -> None:
+    # Worker initializer: caps the address space of the process
+    if limit is not None:
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+    return
+
+
+def _solve_sector(task: tuple) -> tuple:
+    """Lowest eigenpairs of a sector (run in a worker process).
+
+    Returns
+    -------
+    energies, states: tuple, size=2
+        Energies and eigenvectors as columns (None if not requested), or
+        (None, None) if the worker ran out of memory.
+    """
+    network, n_up, n_down, U, t, k, return_states, dense_dim = task
+    try:
+        sector = network.get_sector(n_up, n_down)
+        H = network.get_operator(U, t, sector)
+
+        if sector.dim <= max(dense_dim, k + 1):
+            energies, states = np.linalg.eigh(H @ np.eye(sector.dim))
+            energies, states = energies[:k], states[:, :k]
+
+        elif k == 1:
+            energy, state, _ = lanczos(H, return_state=return_states,
+                                       seed=sector.dim)
+            energies = np.array([energy])
+            states = state[:, None] if return_states else None
+
+        else:
+            energies, states = eigsh(H, k=k, which='SA')
+            order = np.argsort(energies)
+            energies, states = energies[order], states[:, order]
+
+    except MemoryError:
+        return None, None
+
+    return energies, states if return_states else None
+
+
+def sector_spectra(network, U: float, t: float, k=1, sectors=None,
+                   workers=None, memory_limit=None, return_states=False,
+                   dense_dim=64) -> dict:
+    """Lowest eigenpairs of many sectors, diagonalized in parallel.
+
+    Sectors (N_down, N_up) are deduced from (N_up, N_down) by spin flip.
+
+    Parameters
+    ----------
+    network: Network, default=None
+        Fermions network.
+
+    U: float, default=None
+        Module of interaction between fermions.
+
+    t: float, default=None
+        Probability amplitude for fermions to jump.
+
+    k: int, default=1
+        Number of eigenpairs of each sector.
+
+    sectors: list[tuple], default=every sector
+        (N_up, N_down) sectors to diagonalize.
+
+    workers: int, default=None
+        Number of processes (default is the number of processors).
+
+    memory_limit: int, default=None
+        Address space limit of each worker in bytes (RLIMIT_AS, interpreter
+        and libraries included). Sectors whose estimate ('sector_memory')
+        exceeds it are skipped, workers running out of memory skip theirs.
+
+    return_states: bool, default=False
+        Also returns eigenvectors (in the sector basis).
+
+    dense_dim: int, default=64
+        Sectors up to this dimension are diagonalized as dense matrices.
+
+    Returns
+    -------
+    -: dict
+        (N_up, N_down) as keys and energies as values (or (energies,
+        states) tuples if 'return_states'). Skipped sectors are missing.
+    """
+    n = network.sites
+    if sectors is None:
+        sectors = [(n_up, n_down) for n_up in range(n + 1)
+                   for n_down in range(n + 1)]
+
+    # Spin flipped sectors have the same spectrum (states are transposed)
+    unique = sorted({(max(s), min(s)) for s in sectors})
+    dims = {s: network.get_sector(*s).dim for s in unique}
+    unique.sort(key=lambda s: dims[s], reverse=True)
+
+    if memory_limit is not None:
+        skipped = [s for s in unique
+                   if sector_memory(dims[s], k, dense_dim) > memory_limit]
+        if skipped:
+            print(f"Sectors {skipped} exceed the memory limit, skipped.")
+        unique = [s for s in unique if s not in skipped]
+
+    tasks = [(network, n_up, n_down, U, t, k, return_states, dense_dim)
+             for n_up, n_down in unique]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_limit_memory,
+                             initargs=(memory_limit,)) as executor:
+        results = dict(zip(unique, executor.map(_solve_sector, tasks)))
+
+    spectra = {}
+    for n_up, n_down in sectors:
+        key = (max(n_up, n_down), min(n_up, n_down))
+        if key not in results:
+            continue
+
+        energies, states = results[key]
+        if energies is None:
+            print(f"Sector {key} ran out of memory, skipped.")
+            continue
+
+        if return_states and n_up < n_down:
+            states = _flip_spins(states, network.get_sector(*key))
+        spectra[(n_up, n_down)] = (energies, states) if return_states \
+            else energies
+
+    return spectra
+
+
+def _flip_spins(states: np.ndarray, sector) -> np.ndarray:
+    """Eigenvectors of sector (N_down, N_up) from the ones of (N_up, N_down).
+    Exchanging spins reorders the fermionic modes, which gives the sign
+    (-1)^(N_up N_down).
+    """
+    d_up, d_down = sector.up_words.size, sector.down_words.size
+    flipped = states.reshape(d_up, d_down, -1).transpose(1, 0, 2)
+
+    return (-1)**(sector.n_up * sector.n_down) * flipped.reshape(
+        d_up * d_down, -1)
+
+
+def ground_state_sector(spectra: dict, mu=0.0) -> tuple:
+    """Ground state of a global spectrum in the grand canonical ensemble.
+
+    Parameters
+    ----------
+    spectra: dict, default=None
+        Output of 'sector_spectra'.
+
+    mu: float, default=0.0
+        Chemical potential (energies are E - mu N).
+
+    Returns
+    -------
+    energy, sector, label: tuple, size=3
+        Ground state energy (E - mu N), its (N_up, N_down) sector and the
+        'pyqcm' label of the sector (ex: 'R0:N12:S0').
+    """
+    def grand_energy(item):
+        (n_up, n_down), value = item
+        energies = value[0] if isinstance(value, tuple) else value
+        return energies[0] - mu * (n_up + n_down)
+
+    # Among degenerate sectors, the one of lowest total spin is reported
+    sector, value = min(spectra.items(),
+                        key=lambda item: (round(grand_energy(item), 10),
+                                          abs(item[0][0] - item[0][1]),
+                                          -item[0][0]))
+    n_up, n_down = sector
+
+    return (float(grand_energy((sector, value))), sector,
+            f"R0:N{n_up + n_down}:S{n_up - n_down}")
+
+
+if __name__ == "__main__":
+    from nqft.hamiltonian import Network
+
+    N = Network(shape=(2, 2))
+    spectra = sector_spectra(N, U=8, t=1, k=2)
+    print(ground_state_sector(spectra, mu=4))
@@ -0,0 +1,467 @@
+"""This module contains the translation symmetry of periodic clusters used to
+block diagonalize the Hubbard hamiltonian of 'nqft.hamiltonian.Network' by
+total momentum.
+
+Each momentum block is spanned by Bloch states
+
+        |r, k> = N_r^-1/2 sum_g exp(-i k.a_g) T_g |r>,
+
+built on one representative Fock state r per translation orbit. T_g moves
+every fermion by a_g and reorders creation operators, which gives the
+fermionic signs of the matrix elements.
+"""
+
+import copy
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from scipy.sparse import coo_matrix, csr_matrix
+from scipy.sparse.linalg import eigsh
+
+from nqft.krylov import lanczos
+from nqft.basis import popcount, site_bit
+from nqft.functions import build_matrix, build_superlattice
+
+
+def translations(shape: tuple, tiling_shift: bool) -> np.ndarray:
+    """Site permutations of the translations of a periodic cluster.
+
+    Parameters
+    ----------
+    shape: tuple[int], size=2, default=None
+        Shape of the cluster as: (rows, columns).
+
+    tiling_shift: bool, default=None
+        Determines if super-vectors are shifted or exactly orthogonals.
+
+    Returns
+    -------
+    perms: np.ndarray[np.int64], shape=(N, N)
+        perms[g, i] is the site reached from site i by the translation of
+        vector r_g (position of site g), so perms[g, 0] = g.
+    """
+    positions = np.array(build_matrix(shape))[:, :2]
+    super_vecs = np.array(build_superlattice(shape, tiling_shift))[:, :2]
+
+    # Coordinates in the super-vectors basis, reduced to the unit cell
+    inverse = np.linalg.inv(super_vecs.T)
+
+    def fold(r):
+        frac = inverse @ r.T
+        return np.rint((r.T - super_vecs.T @ np.floor(frac + 1e-9)).T)
+
+    lookup = {tuple(r): site for site, r in enumerate(fold(positions))}
+    perms = np.array([[lookup[tuple(r)] for r in fold(positions + a)]
+                      for a in positions], dtype=np.int64)
+
+    return perms
+
+
+def cluster_momenta(shape: tuple, tiling_shift: bool) -> np.ndarray:
+    """Wavevectors allowed by the periodic boundary conditions of a cluster
+    (exp(i k.R) = 1 for every super-vector R), reduced to [0, 2 pi)^2.
+
+    Parameters
+    ----------
+    shape: tuple[int], size=2, default=None
+        Shape of the cluster as: (rows, columns).
+
+    tiling_shift: bool, default=None
+        Determines if super-vectors are shifted or exactly orthogonals.
+
+    Returns
+    -------
+    -: np.ndarray, shape=(N, 2)
+
+    Examples
+    --------
+    >>> cluster_momenta((2, 2), False) / np.pi
+    array([[0., 0.],
+           [0., 1.],
+           [1., 0.],
+           [1., 1.]])
+    """
+    sites = shape[0] * shape[1]
+    super_vecs = np.array(build_superlattice(shape, tiling_shift))[:, :2]
+    reciprocal = 2 * np.pi * np.linalg.inv(super_vecs).T
+
+    m = np.array(np.meshgrid(range(sites), range(sites))).reshape(2, -1).T
+    k = np.mod(m @ reciprocal, 2 * np.pi)
+    k[np.isclose(k, 2 * np.pi)] = 0.0
+
+    # Duplicates are found on rounded values, exact ones give the phases
+    _, first = np.unique(np.round(k, 10), axis=0, return_index=True)
+
+    return k[first]
+
+
+def translate_words(words: np.ndarray, perm: np.ndarray,
+                    n_sites: int) -> tuple[np.ndarray]:
+    """Applies a site permutation on spin words.
+
+    Parameters
+    ----------
+    words: np.ndarray[np.uint64], default=None
+        Spin words.
+
+    perm: np.ndarray, size=N, default=None
+        Site reached from each site.
+
+    n_sites: int, default=None
+        Number of sites.
+
+    Returns
+    -------
+    new_words, signs: tuple[np.ndarray], size=2
+        Permuted words and signs of the reordering of creation operators
+        (parity of the pairs of occupied sites whose order is reversed).
+    """
+    new_words = np.zeros_like(words)
+    parity = np.zeros(words.shape, dtype=np.int64)
+    for site in range(n_sites):
+        bit = np.uint64(site_bit(site, n_sites))
+        occupied = (words >> bit) & np.uint64(1)
+        new_words |= occupied << np.uint64(site_bit(perm[site], n_sites))
+
+        # Sites after 'site' sent before it
+        mask = 0
+        for other in range(site + 1, n_sites):
+            if perm[other] < perm[site]:
+                mask |= 1 << site_bit(other, n_sites)
+        parity += occupied.astype(np.int64) \
+            * popcount(words & np.uint64(mask))
+
+    return new_words, 1 - 2 * (parity & 1)
+
+
+class MomentumBasis:
+    """Translation orbits of a (N_up, N_down) sector of a periodic Network.
+
+    Orbit representatives are the states (u, d) whose up word u is the
+    smallest of its orbit and whose down word d is the smallest among its
+    images by the translations leaving u unchanged.
+
+    Attributes
+    ----------
+    network: Network, default=None
+        Periodic (or tilted) fermions network.
+
+    n_up: int, default=None
+        Number of spin up fermions.
+
+    n_down: int, default=None
+        Number of spin down fermions.
+    """
+
+    def __init__(self, network, n_up: int, n_down: int) -> None:
+        """Builds translation tables of spin words and orbit representatives.
+        """
+        if network.boundary not in ("periodic", "tilted"):
+            raise ValueError("Momentum blocks need periodic boundaries, got: "
+                             f"{network.boundary}")
+
+        self.network = network
+        self.n_up = n_up
+        self.n_down = n_down
+        self.sector = network.get_sector(n_up, n_down)
+
+        tiling_shift = network.boundary == "tilted"
+        self.perms = translations(network.shape, tiling_shift)
+        self.momenta = cluster_momenta(network.shape, tiling_shift)
+        self.vectors = np.array(build_matrix(network.shape))[:, :2]
+        self.group = self.perms.shape[0]
+
+        # compose[g, h]: translation by r_g + r_h (site reached from h by g)
+        self.compose = self.perms.T.copy()
+
+        self.up_images, self.up_signs = self._tables(self.sector.up_words)
+        self.down_images, self.down_signs = self._tables(
+            self.sector.down_words)
+
+        # Up words orbits: smallest image and a translation reaching it
+        self.up_rep_move = np.argmin(self.up_images, axis=0)
+        up_rep = self.up_images.min(axis=0)
+        self.up_reps = np.flatnonzero(up_rep == np.arange(up_rep.size))
+        self.up_rep_of = up_rep
+
+        # Stabilizers of up representatives (padded with the identity)
+        fixed = self.up_images[:, self.up_reps] == self.up_reps
+        self.stabilizers = np.where(fixed.T, np.arange(self.group), 0)
+        self.symmetric = fixed.sum(axis=0) > 1
+
+        reps_up, reps_down = [], []
+        for idx, up in enumerate(self.up_reps):
+            images = self.down_images[self.stabilizers[idx]]
+            canonical = images.min(axis=0) == np.arange(images.shape[1])
+            downs = np.flatnonzero(canonical)
+            reps_up.append(np.full(downs.size, up))
+            reps_down.append(downs)
+
+        self.reps_up = np.concatenate(reps_up)
+        self.reps_down = np.concatenate(reps_down)
+        self.keys = self.reps_up * self.down_images.shape[1] + self.reps_down
+        return
+
+    def _tables(self, words: np.ndarray) -> tuple[np.ndarray]:
+        n_sites = self.network.sites
+        images, signs = [], []
+        for perm in self.perms:
+            new_words, sign = translate_words(words, perm, n_sites)
+            images.append(np.searchsorted(words, new_words))
+            signs.append(sign)
+
+        return np.array(images), np.array(signs)
+
+    def __len__(self) -> int:
+        return self.reps_up.size
+
+    def restrict(self, k_index: int) -> "MomentumBasis":
+        """Copy of the basis keeping only the representatives of the Bloch
+        states of a momentum, which is all 'block' needs (translation tables
+        of spin words are shared). Positions of Bloch states given by
+        'block' then refer to the restricted representatives.
+
+        Parameters
+        ----------
+        k_index: int, default=None
+            Index of the momentum in 'momenta'.
+
+        Returns
+        -------
+        -: MomentumBasis
+        """
+        states = np.flatnonzero(self.norms(k_index))
+        basis = copy.copy(self)
+        basis.reps_up = self.reps_up[states]
+        basis.reps_down = self.reps_down[states]
+        basis.keys = self.keys[states]
+
+        return basis
+
+    def representative(self, up: np.ndarray, down: np.ndarray) -> tuple:
+        """Finds the orbit representatives of states given by the ranks of
+        their spin words.
+
+        Parameters
+        ----------
+        up: np.ndarray[np.int64], default=None
+            Up words ranks.
+
+        down: np.ndarray[np.int64], default=None
+            Down words ranks.
+
+        Returns
+        -------
+        index, move, sign: tuple[np.ndarray], size=3
+            Position of the representative in the basis (-1 if the state
+            isn't in the basis), translation g and sign such that
+            T_g |state> = sign |representative>.
+        """
+        move = self.up_rep_move[up]
+        sign = self.up_signs[move, up] * self.down_signs[move, down]
+        up_rep = self.up_rep_of[up]
+        down = self.down_images[move, down]
+
+        # Smallest down word among the images by the stabilizer of up_rep
+        # (only up representatives left unchanged by some translation)
+        rep_index = np.searchsorted(self.up_reps, up_rep)
+        symmetric = np.flatnonzero(self.symmetric[rep_index])
+        if symmetric.size:
+            stab = self.stabilizers[rep_index[symmetric]]
+            images = self.down_images[stab, down[symmetric, None]]
+            best = np.argmin(images, axis=1)
+            h = stab[np.arange(best.size), best]
+
+            sign[symmetric] *= self.up_signs[h, up_rep[symmetric]] \
+                * self.down_signs[h, down[symmetric]]
+            move[symmetric] = self.compose[h, move[symmetric]]
+            down[symmetric] = images[np.arange(best.size), best]
+
+        keys = up_rep * self.down_images.shape[1] + down
+        index = np.searchsorted(self.keys, keys)
+        index[index == self.keys.size] = 0
+        index[self.keys[index] != keys] = -1
+
+        return index, move, sign
+
+    def norms(self, k_index: int) -> np.ndarray:
+        """Squared norms N_r / N of the Bloch states of a momentum (zero for
+        representatives incompatible with it).
+
+        Parameters
+        ----------
+        k_index: int, default=None
+            Index of the momentum in 'momenta'.
+
+        Returns
+        -------
+        -: np.array, size=len(self)
+        """
+        phases = np.exp(-1j * self.vectors @ self.momenta[k_index])
+
+        norms = np.zeros(len(self))
+        for g in range(self.group):
+            fixed = (self.up_images[g, self.reps_up] == self.reps_up) \
+                & (self.down_images[g, self.reps_down] == self.reps_down)
+            sign = self.up_signs[g, self.reps_up] \
+                * self.down_signs[g, self.reps_down]
+            norms += np.where(fixed, (phases[g] * sign).real, 0.0)
+
+        return np.where(norms > 1e-8, norms, 0.0)
+
+    def block(self, k_index: int, U: float, t: float,
+              chunk_size=2**16) -> tuple:
+        """Hubbard hamiltonian in the Bloch states of a momentum.
+
+        Parameters
+        ----------
+        k_index: int, default=None
+            Index of the momentum in 'momenta'.
+
+        U: float, default=None
+            Module of interaction between fermions.
+
+        t: float, default=None
+            Probability amplitude for fermions to jump.
+
+        chunk_size: int, default=2**16
+            Number of representatives treated at once.
+
+        Returns
+        -------
+        H, states: tuple, size=2
+            Block (scipy.sparse.csr_matrix) and positions of its Bloch states
+            in the representatives list.
+        """
+        norms = self.norms(k_index)
+        states = np.flatnonzero(norms)
+        position = np.full(len(self), -1)
+        position[states] = np.arange(states.size)
+        phases = np.exp(-1j * self.vectors @ self.momenta[k_index])
+
+        T_up, T_down, up_words, down_words = \
+            self.network.get_spin_hoppings(self.sector)
+        T_up, T_down = (-t * T_up).tocsc(), (-t * T_down).tocsc()
+
+        rows, cols, vals = [], [], []
+        for start in range(0, states.size, chunk_size):
+            chunk = states[start:start + chunk_size]
+            up, down = self.reps_up[chunk], self.reps_down[chunk]
+
+            # Interaction is invariant under translations
+            double_occ = popcount(up_words[up] & down_words[down])
+            rows.append(position[chunk])
+            cols.append(position[chunk])
+            vals.append(U * double_occ.astype(np.complex128))
+
+            for T, spin_up in ((T_up, True), (T_down, False)):
+                source = up if spin_up else down
+                # Non-zero entries of the columns of the source words
+                counts = np.diff(T.indptr)[source]
+                origin = np.repeat(np.arange(chunk.size), counts)
+                where = np.arange(counts.sum()) + np.repeat(
+                    T.indptr[source] - np.cumsum(counts) + counts, counts)
+
+                new_up = T.indices[where] if spin_up else up[origin]
+                new_down = down[origin] if spin_up else T.indices[where]
+                index, move, sign = self.representative(new_up, new_down)
+
+                valid = (index >= 0) & (position[np.maximum(index, 0)] >= 0)
+                origin, index = origin[valid], index[valid]
+                amplitude = T.data[where][valid] * sign[valid] \
+                    * phases[move[valid]] \
+                    * np.sqrt(norms[index] / norms[chunk[origin]])
+
+                rows.append(position[index])
+                cols.append(position[chunk[origin]])
+                vals.append(amplitude)
+
+        H = coo_matrix((np.concatenate(vals),
+                        (np.concatenate(rows), np.concatenate(cols))),
+                       shape=(states.size, states.size))
+
+        return csr_matrix(H), states
+
+    def ground_state(self, k_index: int, U: float, t: float) -> tuple:
+        """Lowest eigenpair of a momentum block.
+
+        Parameters
+        ----------
+        k_index: int, default=None
+            Index of the momentum in 'momenta'.
+
+        U: float, default=None
+            Module of interaction between fermions.
+
+        t: float, default=None
+            Probability amplitude for fermions to jump.
+
+        Returns
+        -------
+        energy, state, states: tuple, size=3
+            Energy, state in the Bloch basis and positions of the Bloch
+            states in the representatives list.
+        """
+        H, states = self.block(k_index, U, t)
+        energy, state, _ = lanczos(H, seed=k_index)
+
+        return energy, state, states
+
+
+def _block_spectrum(args: tuple) -> np.ndarray:
+    basis, k_index, U, t, n_states = args
+    H, _ = basis.block(k_index, U, t)
+
+    if H.shape[0] <= max(64, n_states + 1):
+        return np.linalg.eigvalsh(H.toarray())[:n_states]
+
+    elif n_states == 1:
+        return np.array([lanczos(H, return_state=False, seed=k_index)[0]])
+
+    return np.sort(eigsh(H, k=n_states, which='SA')[0])
+
+
+def momentum_spectra(network, n_up: int, n_down: int, U: float, t: float,
+                     n_states=1, workers=None) -> dict:
+    """Lowest energies of every momentum block of a sector, each block being
+    built and diagonalized in a separate process. Translation orbits are
+    found once, each process only receives the representatives of its
+    block.
+
+    Parameters
+    ----------
+    network: Network, default=None
+        Periodic (or tilted) fermions network.
+
+    n_up: int, default=None
+        Number of spin up fermions.
+
+    n_down: int, default=None
+        Number of spin down fermions.
+
+    U: float, default=None
+        Module of interaction between fermions.
+
+    t: float, default=None
+        Probability amplitude for fermions to jump.
+
+    n_states: int, default=1
+        Number of eigenvalues computed in each block.
+
+    workers: int, default=None
+        Number of processes (default is the number of processors).
+
+    Returns
+    -------
+    -: dict
+        Momenta (as tuples) as keys and lowest energies as values.
+    """
+    basis = MomentumBasis(network, n_up, n_down)
+    momenta = basis.momenta
+    tasks = [(basis.restrict(k_index), k_index, U, t, n_states)
+             for k_index in range(len(momenta))]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        spectra = list(executor.map(_block_spectrum, tasks))
+
+    return {tuple(float(k_i) for k_i in k): spectrum
+            for k, spectrum in zip(momenta, spectra)}
@@ -1,5 +1,93 @@
+import os
+import sys
+import types
+import importlib
+import pytest
+import numpy as np
+
 from nqft import __version__
-from nqft.hamiltonian import Network
+from nqft.hamiltonian import AndersonImpurity, Network
+from nqft.cache import DiskCache, EDCache, hash_params
+from nqft.hall_effect import Model, get_hall_numbers, path_spectral_weight
+from nqft.lehmann import LehmannGF, read_solution
+from nqft.cpt import CPTModel, MatsubaraEngine
+from nqft.monte_carlo import (build_h, disorder_average, momentum_transform,
+                              monte_carlo, plane_waves, translation_average)
+from nqft.krylov import lanczos
+from nqft.ftlm import FTLM
+from nqft.dynamics import fourier_transform, time_green_function
+from nqft.dmft import DMFT, bath_hybridization, fit_bath
+from nqft.sectors import sector_spectra
+from nqft.basis import _swar_popcount, popcount
+from nqft.symmetry import MomentumBasis
+from nqft.functions import (
+    irreducible_quadrant,
+    unfold_quadrant,
+    quadrant_weights,
+    high_symmetry_path,
+    network_bonds
+)
+
+
+def stub_spectrum(k_x, k_y):
+    # Mirror symmetric ('XY') but neither under k -> pi - k nor k_x <-> k_y
+    return 2 + np.cos(k_x) + 0.5 * np.cos(2 * k_y)
+
+
+@pytest.fixture
+def qcm(monkeypatch, tmp_path):
+    """'nqft.qcm' imported against a stub of 'pyqcm' recording its calls.
+    """
+    pyqcm = types.ModuleType('pyqcm')
+    pyqcm.calls = []
+
+    def record(name, output=None):
+        def function(*args, **kwargs):
+            pyqcm.calls.append((name, args, kwargs))
+            return output
+        return function
+
+    for name in ('averages', 'new_cluster_model', 'add_cluster',
+                 'lattice_model', 'interaction_operator', 'hopping_operator',
+                 'sectors', 'set_parameters', 'set_parameter'):
+        setattr(pyqcm, name, record(name))
+    pyqcm.cluster_averages = record('cluster_averages', {'mu': (1.0, 0.0)})
+    model = types.SimpleNamespace(print=lambda filename: None)
+    pyqcm.new_model_instance = record('new_model_instance', model)
+
+    # Momentum grid of 'mdc': linspace(0, pi) for quadrants, rows are k_y.
+    # Symmetries are averaged over the grid as 'pyqcm' does.
+    def mdc(freq, nk, eta, sym=None, quadrant=False, data_file=None,
+            show=False):
+        pyqcm.calls.append(
+            ('mdc', (), {'nk': nk, 'sym': sym, 'quadrant': quadrant}))
+        k = np.linspace(0 if quadrant else -np.pi, np.pi, nk)
+        A = stub_spectrum(*np.meshgrid(k, k))
+        if sym is not None and 'R' in sym:
+            A = 0.5 * (A + A.T)
+        if sym is not None and 'X' in sym:
+            A = 0.5 * (A + np.flip(A, 0))
+        if sym is not None and 'Y' in sym:
+            A = 0.5 * (A + np.flip(A, 1))
+        return A
+
+    spectral = types.ModuleType('pyqcm.spectral')
+    spectral.mdc = mdc
+    pyqcm.spectral = spectral
+
+    monkeypatch.setitem(sys.modules, 'pyqcm', pyqcm)
+    monkeypatch.setitem(sys.modules, 'pyqcm.spectral', spectral)
+    monkeypatch.chdir(tmp_path)
+    sys.modules.pop('nqft.qcm', None)
+    yield importlib.import_module('nqft.qcm')
+    sys.modules.pop('nqft.qcm', None)
+
+
+def qcm_model(qcm, resolution):
+    return qcm.QcmModel(
+        shape=(2, 2), filling=4, interaction=8.0, hoppings=(1.0, -0.3, 0.2),
+        broadening=0.1, w=0.0, mu=1.0, resolution=resolution,
+        tiling_shift=True, overwrite=True)
 
 
 def test_version():
@@ -11,3 +99,532 @@ def test_hamiltonian():
     network = Network(sites_nb=sites)
     H = network.get_hamiltonian(model="Hubbard", U=1, t=1)
     assert H.shape == (4**sites, 4**sites)
+
+
+def test_fermion_signs():
+    # Jordan-Wigner operators built with dense tensor products
+    sites, U, t = 3, 2.0, 0.5
+    network = Network(shape=(1, sites), hoppings=(1.0, 0.0, 0.2))
+    c, z = np.array([[0, 1], [0, 0]]), np.diag([1, -1])
+
+    def annihilate(mode):
+        ops = [z] * mode + [c] + [np.eye(2)] * (2 * sites - mode - 1)
+        out = np.ones((1, 1))
+        for op in ops:
+            out = np.kron(out, op)
+        return out
+
+    modes = [annihilate(m) for m in range(2 * sites)]
+    H = sum(U * modes[i].T @ modes[i] @ modes[sites + i].T @ modes[sites + i]
+            for i in range(sites))
+    H = H - t * sum(amp * (modes[i + s].T @ modes[j + s]
+                           + modes[j + s].T @ modes[i + s])
+                    for i, j, amp in network.bonds for s in (0, sites))
+
+    assert np.allclose(
+        network.get_hamiltonian(model="Hubbard", U=U, t=t).toarray(), H)
+
+
+def test_matrix_elements():
+    network = Network(shape=(2, 2), hoppings=(1.0, -0.3, 0.2),
+                      boundary="periodic")
+    H = network.get_hamiltonian(model="Hubbard", U=3, t=0.7).toarray()
+    states = network.basis_states()
+
+    elements = network.matrix_element(states[:, None], states[None], 3, 0.7)
+    assert np.allclose(elements, H)
+
+    sector = network.get_sector(2, 1)
+    state = network.basis_states(sector)[5]
+    assert network.get_state(int(state), sector=sector).indices[0] == 5
+
+
+def test_sectors():
+    network = Network(sites_nb=3)
+    H = network.get_hamiltonian(model="Hubbard", U=2, t=1).toarray()
+
+    energies = []
+    for n_up in range(4):
+        for n_down in range(4):
+            sector = network.get_sector(n_up, n_down)
+            states = sector.states().astype(np.int64)
+            H_sector = network.get_sector_hamiltonian(sector, U=2, t=1)
+
+            assert np.array_equal(sector.index(states), np.arange(sector.dim))
+            assert np.allclose(H_sector.toarray(), H[np.ix_(states, states)])
+            energies.extend(np.linalg.eigvalsh(H_sector.toarray()))
+
+    assert np.allclose(np.sort(energies), np.linalg.eigvalsh(H))
+
+    # 0b111 has 0 up and 3 down fermions
+    with pytest.raises(ValueError):
+        network.state_index([0b111], network.get_sector(1, 2))
+
+
+def test_matrix_free_operator():
+    network = Network(sites_nb=4)
+    for sector in (None, network.get_sector(2, 1)):
+        H = network.get_operator(U=2, t=1, sector=sector)
+        matrix = network.get_sector_hamiltonian(sector, U=2, t=1) \
+            if sector else network.get_hamiltonian("Hubbard", U=2, t=1)
+
+        vectors = np.random.rand(H.shape[0], 3)
+        assert np.allclose(H @ vectors, matrix @ vectors)
+        assert np.allclose(H.matvec(vectors[:, 0]), matrix @ vectors[:, 0])
+
+
+def test_lanczos():
+    network = Network(sites_nb=4)
+    sector = network.get_sector(2, 2)
+    H = network.get_operator(U=4, t=1, sector=sector)
+    exact = np.linalg.eigvalsh(
+        network.get_sector_hamiltonian(sector, U=4, t=1).toarray())[0]
+
+    for reorthogonalize in (False, True):
+        energy, state, info = lanczos(H, reorthogonalize=reorthogonalize,
+                                      seed=0)
+        assert info['converged'] and np.isclose(energy, exact)
+        assert np.linalg.norm(H @ state - energy * state) < 1e-8
+
+    # Krylov space exhausted after 3 vectors: the recurrence stops there
+    v0 = np.zeros(50)
+    v0[[0, 10, 20]] = 1
+    energy, state, info = lanczos(np.diag(np.arange(50.0)), v0, tol=0,
+                                  reorthogonalize=True)
+    assert info['iterations'] == 3 and np.all(np.isfinite(state))
+    assert np.isclose(energy, 0)
+
+
+def test_green_function():
+    sites, U, t, mu = 4, 8.0, 1.0, 1.0
+    network = Network(shape=(2, 2), hoppings=(1.0, -0.3, 0.0))
+    G = network.get_green_function(U, t, mu=mu)
+
+    # Sum rules: M0 = identity and M1 = hopping + (U <n_down> - mu) delta_ij
+    hopping = np.zeros((sites, sites))
+    for i, j, amp in network.bonds:
+        hopping[i, j] = hopping[j, i] = -t * amp
+
+    assert np.allclose(G.moments(order=0), np.identity(sites))
+    assert np.allclose(G.moments(order=1),
+                       hopping + (U / 2 - mu) * np.identity(sites))
+
+
+@pytest.mark.parametrize("shape", [(2, 2), (3, 4)])
+def test_pyqcm_ground_state(shape):
+    sites = shape[0] * shape[1]
+    info = read_solution(f'./nqft/Data/model_{shape[0]}x{shape[1]}/'
+                         f'model_{shape[0]}x{shape[1]}_n{sites}_U8.py').info
+    network = Network(shape=shape, hoppings=(1.0, info['tp'],
+                                             info.get('tpp', 0.0)))
+    H = network.get_operator(U=info['U'], t=info['t'],
+                             sector=network.get_sector(sites // 2, sites // 2))
+
+    energy = lanczos(H, seed=0)[0] - info['mu'] * network.sites
+    assert np.isclose(energy, info['GS_energy'], atol=1e-4)
+
+
+def test_momentum_blocks():
+    network = Network(shape=(2, 3), hoppings=(1.0, -0.3, 0.2),
+                      boundary="tilted")
+    H = network.get_sector_hamiltonian(network.get_sector(2, 1), U=4, t=1)
+
+    basis = MomentumBasis(network, n_up=2, n_down=1)
+    energies = []
+    for k_index in range(len(basis.momenta)):
+        block = basis.block(k_index, U=4, t=1)[0].toarray()
+        assert np.abs(block - block.conj().T).max() < 1e-13
+        assert np.array_equal(
+            basis.restrict(k_index).block(k_index, U=4, t=1)[0].toarray(),
+            block)
+        energies.extend(np.linalg.eigvalsh(block))
+
+    assert np.allclose(np.sort(energies), np.linalg.eigvalsh(H.toarray()))
+
+    spectra = network.diagonalize_momenta(2, 1, U=4, t=1, workers=2)
+    assert np.isclose(min(spectra.values())[0], min(energies))
+
+
+def test_ftlm():
+    network = Network(shape=(2, 2), hoppings=(1.0, -0.3, 0.0))
+    temperatures = np.array([0.5, 1.0, 4.0])
+    H1, H2 = network.get_hamiltonian_terms()
+    particles = popcount(np.arange(2**8, dtype=np.uint64))
+    grand, states = np.linalg.eigh((4 * H1 - H2).toarray()
+                                   - 2 * np.diag(particles))
+    density = np.abs(states.T)**2 @ particles
+    double_occ = np.abs(states.T)**2 @ H1.diagonal()
+    energies = grand + 2 * density
+
+    boltzmann = np.exp(-np.outer(1 / temperatures, grand - grand.min()))
+    Z = boltzmann.sum(axis=1)
+
+    exact = FTLM(network, U=4, t=1, steps=40, samples=2).run(workers=2)
+    sampled = FTLM(network, U=4, t=1, steps=8, samples=20, seed=0).run()
+    for ftlm, tol in ((exact, 1e-10), (sampled, 0.02)):
+        obs = ftlm.thermodynamics(temperatures, mu=2)
+        assert np.allclose(obs['energy'], boltzmann @ energies / Z / 4,
+                           atol=tol)
+        assert np.allclose(obs['double_occupancy'],
+                           boltzmann @ double_occ / Z / 4, atol=tol)
+        assert np.allclose(obs['density'], boltzmann @ density / Z / 4,
+                           atol=tol)
+    assert np.all(obs['energy_err'] > 0)
+
+
+def test_time_green_function():
+    network = Network(shape=(2, 2), hoppings=(1.0, -0.3, 0.0))
+    times = np.linspace(0, 40, 2001)
+    G_t = time_green_function(network, U=4, t=1, times=times, mu=1.5,
+                              sites=[0, 1])
+    assert np.allclose(1j * G_t[0], np.eye(4)[:, :2])
+
+    omega, G_w = fourier_transform(times, G_t, eta=0.4)
+    window = np.abs(omega) < 10
+    G = network.get_green_function(U=4, t=1, mu=1.5)
+    assert np.allclose(G_w[window], G(omega[window] + 0.4j)[:, :, :2],
+                       atol=1e-3)
+
+
+def test_anderson_impurity():
+    bath = {'energies': [-1.0, 0.5, 2.0], 'hybridizations': [0.5, 0.3, 0.7]}
+    H = Network(sites_nb=4).get_hamiltonian("AIM", U=0, mu=0.4, **bath)
+    impurity = AndersonImpurity(mu=0.4, **bath)
+    assert np.isclose(np.linalg.eigvalsh(H.toarray())[0],
+                      impurity.ground_sectors(U=0)[0])
+
+    # Non-interacting impurity: G(z) = 1 / (z + mu - Delta(z))
+    z = np.array([0.1 + 0.3j, 1j, 2 + 0.5j])
+    delta = bath_hybridization(z, **bath)
+    G = impurity.impurity_green_function(U=0)
+    assert np.allclose(G(z)[:, 0, 0], 1 / (z + 0.4 - delta))
+
+
+def test_dmft():
+    dmft = DMFT(U=4, mu=2, n_bath=5)
+    energies, hybridizations = np.array([-2, -0.5, 0, 0.5, 2]), np.ones(5)
+    target = bath_hybridization(dmft.iw, energies, hybridizations)
+    fit = fit_bath(dmft.iw, target, energies + 0.1, hybridizations * 0.8)
+    assert fit[2] < 1e-10
+    assert np.allclose(fit[0], energies, atol=1e-4)
+
+    # Half filling: particle-hole symmetric self-energy
+    solution = dmft.run()
+    assert solution['converged'] and solution['solves'] < 8
+    assert np.isclose(solution['density'], 1, atol=1e-3)
+    assert np.allclose(solution['sigma'].real, 2, atol=1e-2)
+
+
+def test_sector_scheduler():
+    info = read_solution('./nqft/Data/model_2x2/model_2x2_n4_U8.py').info
+    network = Network(shape=(2, 2), hoppings=(1.0, info['tp'], 0.0))
+    spectra, ground_state = network.diagonalize_sectors(
+        U=info['U'], t=info['t'], mu=info['mu'], workers=2)
+    assert len(spectra) == 25
+    assert np.isclose(ground_state[0], info['GS_energy'], atol=1e-4)
+    assert info['GS_sector'].rsplit(':', 1)[0] == ground_state[2]
+
+    # Spin flipped sectors come with transposed eigenvectors
+    spectra = sector_spectra(network, U=8, t=1, k=2, sectors=[(1, 3)],
+                             return_states=True, memory_limit=2**34)
+    energies, states = spectra[(1, 3)]
+    H = network.get_sector_hamiltonian(network.get_sector(1, 3), U=8, t=1)
+    assert np.allclose(H @ states, states * energies)
+
+
+def test_disk_cache(tmp_path):
+    cache = DiskCache(path=str(tmp_path), max_size=10**6)
+    spectrum = np.random.rand(50, 50)
+    key = hash_params(kind='spectrum', U=2, hoppings=(1, -0.3, 0.2))
+
+    assert cache.get_spectrum(key) is None
+    cache.put_spectrum(key, spectrum)
+    assert np.array_equal(DiskCache(path=str(tmp_path)).get_spectrum(key),
+                          spectrum)
+
+    # Reads don't rewrite the index until it is flushed
+    with open(cache.index_file) as file:
+        index = file.read()
+    cache.get_spectrum(key)
+    with open(cache.index_file) as file:
+        assert file.read() == index
+    cache.flush()
+    with open(cache.index_file) as file:
+        assert file.read() != index
+
+    # A record replacing a spectrum doesn't leave its file behind
+    cache.put_spectrum('hall', spectrum)
+    cache.put_record('hall', {'n_h': 0.5})
+    assert set(os.listdir(tmp_path)) == {f'{key}.npz', 'index.json'}
+
+    cache.max_size = cache.index['hall']['size']
+    cache.evict()
+    assert key not in cache and cache.get_record('hall') == {'n_h': 0.5}
+
+
+def test_ed_cache(tmp_path):
+    network = Network(shape=(2, 2), hoppings=(1.0, -0.3, 0.0))
+    sector = network.get_sector(2, 2)
+    cache = EDCache(path=str(tmp_path))
+
+    H = network.get_hamiltonian("Hubbard", U=4, t=1, cache=cache)
+    assert len(cache) == 2
+    assert abs(H - network.get_hamiltonian("Hubbard", U=4, t=1)).max() == 0
+
+    energy, state = cache.ground_state(network, U=8, t=1, sector=sector)
+    warm = EDCache(path=str(tmp_path))
+    assert isinstance(warm.ground_state(network, 8, 1, sector)[1], np.memmap)
+    assert np.isclose(energy, network.diagonalize_sector(2, 2, 8, 1)[0][0])
+
+    # Cached calls keep read access times on disk
+    assert EDCache(path=str(tmp_path)).index == warm.index
+
+    # A new U reuses the hopping term
+    H = warm.hamiltonian(network, U=2, t=1)
+    assert len(warm) == 3
+    assert abs(H - network.get_hamiltonian("Hubbard", U=2, t=1)).max() == 0
+
+    warm.max_size = warm.size() - 1
+    warm.evict()
+    assert len(warm) == 2
+
+
+def test_bitwise_diagonal():
+    words = np.random.default_rng(0).integers(0, 2**63, 1000, np.uint64)
+    assert np.array_equal(popcount(words), _swar_popcount(words))
+
+    network = Network(shape=(2, 2), hoppings=(1.0, -0.3, 0.0))
+    sector = network.get_sector(3, 2)
+    diagonal = network.get_diagonal(U=4, mu=1, h=0.5, sector=sector)
+    pairs = [(up, down) for up in sector.up_words
+             for down in sector.down_words]
+    for idx, (up, down) in enumerate(pairs):
+        n_up, n_down = bin(up).count('1'), bin(down).count('1')
+        assert np.isclose(diagonal[idx], 4 * bin(up & down).count('1')
+                          - (n_up + n_down) - 0.25 * (n_up - n_down))
+
+    _, state, _ = lanczos(network.get_operator(U=4, t=1, sector=sector))
+    averages = network.diagonal_averages(state, sector)
+    H1, _ = network.get_hamiltonian_terms(sector)
+    assert np.isclose(averages['double_occupancy'].sum(), state @ H1 @ state)
+    assert np.allclose(averages['density'].sum(), 5)
+    assert np.allclose(averages['sz'].sum(), 0.5)
+
+
+def test_lattice_hamiltonian():
+    hops = (1.0, -0.3, 0.2)
+    for shape in ((2, 3), (4, 4)):
+        bonds, onsite = network_bonds(shape, hops, boundary="periodic")
+        h = np.diag(onsite)
+        for i, j, amp in bonds:
+            h[i, j] += amp
+            h[j, i] += amp
+
+        assert np.allclose(build_h(shape, hops), h)
+        assert np.allclose(build_h(shape, hops, sparse=True).toarray(), h)
+
+
+def test_disorder_average():
+    omegas = np.linspace(-4, 4, 9)
+    results = {method: disorder_average(
+        (4, 6), (1.0, -0.3, 0.2), omegas, eta=0.2, std=0.5, realizations=3,
+        batch=2, method=method, probes=64, seed=0)
+        for method in ("eigh", "solve", "kpm")}
+    exact = results['eigh']
+
+    # Plane waves are a basis: the DOS is the momentum average of A(k, w)
+    assert exact['A_kw'].shape == (9, 4, 6)
+    assert np.allclose(exact['A_kw'].mean(axis=(1, 2)), exact['dos'])
+    assert np.all(exact['A_kw_err'] > 0)
+
+    assert np.allclose(results['solve']['A_kw'], exact['A_kw'])
+    for method in ("solve", "kpm"):
+        assert np.allclose(results[method]['dos'], exact['dos'], atol=0.03)
+
+    momenta = np.array([[0, 0], [2, 3]])
+    subset = disorder_average((4, 6), (1.0, -0.3, 0.2), omegas, eta=0.2,
+                              std=0.5, realizations=3, batch=2,
+                              method="solve", momenta=momenta, seed=0)
+    assert np.allclose(subset['A_kw'], exact['A_kw'][:, [0, 2], [0, 3]])
+
+
+def test_momentum_transform():
+    shape = (4, 6)
+    rng = np.random.default_rng(0)
+    G = rng.standard_normal((2, 3, 24, 24)) + 1j * rng.standard_normal(
+        (2, 3, 24, 24))
+
+    waves = plane_waves(shape, np.argwhere(np.ones(shape, dtype=bool)))
+    exact = np.einsum('ik,...ij,jk->...k', waves.conj(), G, waves)
+    G_k = momentum_transform(G, shape)
+    assert np.allclose(G_k.reshape(2, 3, 24), exact)
+    assert np.allclose(momentum_transform(translation_average(G, shape),
+                                          shape), G_k)
+
+    # Without disorder A(k, w) is a Lorentzian at each band energy
+    h = build_h(shape, (1.0, -0.3, 0.2))
+    A_kw = monte_carlo(h, shape, omega=[0.0, 0.5], eta=0.1, mu=0.0, std=0.0)
+    energies = np.real(np.diag(waves.conj().T @ h @ waves)).reshape(shape)
+    lorentzians = 0.1 / np.pi / ((np.array([0.0, 0.5])[:, None, None]
+                                  - energies)**2 + 0.01)
+    assert np.allclose(A_kw, lorentzians)
+
+
+def test_qcm_quadrant(qcm, monkeypatch):
+    pyqcm, mdc = sys.modules['pyqcm'], sys.modules['pyqcm.spectral'].mdc
+    spectra = {res: mdc(0.0, res, 0.1, 'RXY') / np.pi for res in (7, 8)}
+    pyqcm.calls.clear()
+    for resolution in (7, 8):
+        model = qcm_model(qcm, resolution)
+        assert np.allclose(model.spectrum, spectra[resolution])
+
+    # Only odd resolutions ask 'pyqcm' for the quadrant alone, where the
+    # mirrors 'X' and 'Y' don't hold (A(k) != A(pi - k))
+    calls = [kwargs for name, _, kwargs in pyqcm.calls if name == 'mdc']
+    assert calls == [{'nk': 4, 'sym': 'R', 'quadrant': True},
+                     {'nk': 8, 'sym': 'RXY', 'quadrant': False}]
+    assert not np.allclose(mdc(0.0, 4, 0.1, 'RXY', quadrant=True),
+                           mdc(0.0, 4, 0.1, 'R', quadrant=True))
+
+    # Without a 'quadrant' keyword in 'mdc' the full grid is sliced
+    def full_mdc(freq, nk, eta, sym=None, data_file=None, show=False):
+        return mdc(freq, nk, eta, sym, data_file=data_file, show=show)
+
+    monkeypatch.setattr(qcm, 'mdc', full_mdc)
+    model = qcm_model(qcm, 7)
+    assert np.allclose(model.spectrum, spectra[7])
+    assert pyqcm.calls[-1][2]['nk'] == 7
+
+
+def test_qcm_memoization(qcm):
+    model = qcm_model(qcm, 7)
+    calls = sys.modules['pyqcm'].calls
+
+    def count(name):
+        return sum(call[0] == name for call in calls)
+
+    quadrant = model.quadrant
+    model.get_cluster_averages(['mu'])
+    model.update(w=0.0)
+    assert model.quadrant is quadrant and model.spectrum is model.spectrum
+    model.get_cluster_averages(['mu'])
+    assert count('mdc') == 1 and count('cluster_averages') == 1
+    assert count('set_parameter') == 0
+
+    # A new mu sets that parameter only and recomputes observables
+    model.update(mu=2.0, interaction=8.0)
+    assert [call[1] for call in calls if call[0] == 'set_parameter'] \
+        == [('mu', 2.0)]
+    assert count('set_parameters') == 1
+    model.quadrant
+    model.get_cluster_averages(['mu'])
+    assert count('mdc') == 2 and count('cluster_averages') == 2
+
+
+def test_hall_file(qcm, tmp_path):
+    model = Model(hoppings=(1.0, -0.3, 0.2), broadening=0.1,
+                  mus=(-1, 1, 0.5), resolution=41)
+    file = str(tmp_path / "hall.txt")
+    for _ in range(2):
+        n_h = qcm.get_hall_coeffs(model.A, model.hops, [1, 2, 3, 4], file)
+    assert np.allclose(np.loadtxt(file)[:, 1], np.tile(n_h, 2))
+
+    with pytest.raises(ValueError):
+        qcm.get_hall_coeffs(model.A, model.hops, [1, 2], file)
+
+
+def test_quadrant_symmetry():
+    for res in (7, 8):
+        k = np.linspace(-np.pi, np.pi, res)
+        k_x, k_y = np.meshgrid(k, k)
+        spectrum = np.cos(k_x) + np.cos(2 * k_y) + np.cos(k_x) * np.cos(k_y)
+
+        quadrant = irreducible_quadrant(spectrum)
+        assert np.allclose(unfold_quadrant(quadrant, res), spectrum)
+        assert np.isclose((quadrant_weights(res) * quadrant).sum(),
+                          spectrum.sum())
+
+
+def test_batched_hall_numbers():
+    model = Model(hoppings=(1.0, -0.3, 0.2), broadening=0.1,
+                  mus=(-1, 1, 0.5), resolution=41)
+    n_h = get_hall_numbers(model.A, model.hops)
+    assert np.allclose(n_h, model.get_hall_nb())
+
+    quadrants = irreducible_quadrant(model.A)
+    assert np.allclose(get_hall_numbers(quadrants, model.hops, 41), n_h)
+
+
+def test_lehmann_compression():
+    gf = read_solution('./nqft/Data/model_3x4/model_3x4_n12_U8.py')
+    assert gf.info['GS_energy'] == -24.1414
+    assert np.allclose(gf.moments(order=0), np.identity(12), atol=1e-6)
+
+    small = gf.compress(eta=0.1, tol=5e-2)
+    assert small.poles < gf.poles / 2
+
+    # Error on a finer grid, over the whole spectrum and above the line
+    for eta in (0.1, 0.3):
+        error = max(
+            np.linalg.norm(gf(z) - small(z), ord=2, axis=(1, 2)).max()
+            for z in np.split(np.linspace(-30, 30, 6000) + 1j * eta, 12))
+        assert error <= small.error_bound <= 5e-2
+    assert error < 0.5 * small.error_bound
+
+
+@pytest.fixture
+def free_cpt():
+    """Factory of 2x2 CPT lattices embedding the non-interacting cluster
+    Green's function (CPT is then exact).
+    """
+    def build(hops=(1.0, -0.3, 0.2), mu=0.0):
+        lattice = CPTModel(None, (2, 2), hops, tiling_shift=True)
+        T_c = lattice.hopping_matrix(np.zeros((1, 2)), inter=False)[0] - \
+            lattice.hopping_matrix(np.zeros((1, 2)))[0]
+        lattice.cluster_gf = LehmannGF(
+            *np.linalg.eigh(T_c.real - mu * np.identity(4)))
+        return lattice
+
+    return build
+
+
+def test_matsubara_density(free_cpt):
+    mu, beta = -0.5, 20.0
+    lattice = free_cpt(mu=mu)
+    engine = MatsubaraEngine(lattice, beta=beta, n_matsubara=512, nk=8)
+
+    eps = np.linalg.eigvalsh(lattice.hopping_matrix(engine.k, inter=False))
+    exact = 2 * (1 / (1 + np.exp(beta * (eps - mu)))).mean()
+    assert np.isclose(engine.density(), exact, atol=1e-4)
+
+
+def test_path_spectrum(free_cpt):
+    hops = (1.0, -0.3, 0.2)
+    lattice = free_cpt(hops)
+
+    k, _ = high_symmetry_path(n_points=10)
+    omegas = np.linspace(-4, 4, 41)
+    cpt_rows = lattice.spectral_path(k, omegas, eta=0.1)
+    free_rows = path_spectral_weight(hops, k, omegas, eta=0.1)
+
+    for cpt_row, free_row in zip(cpt_rows, free_rows):
+        assert np.allclose(cpt_row, free_row)
+
+
+def test_u_sweep():
+    network = Network(sites_nb=3)
+    sweep = network.u_sweep([0.0, 1.0, 2.0], t=1)
+
+    for result in sweep:
+        H = network.get_hamiltonian(model="Hubbard", U=result['U'], t=1)
+        assert np.isclose(result['energy'], np.linalg.eigvalsh(H.toarray())[0])
+
+    # Warm starts need fewer products than random initial vectors
+    network = Network(shape=(2, 3))
+    sector = network.get_sector(3, 3)
+    interactions = np.linspace(4, 5, 6)
+    sweep = network.u_sweep(interactions, t=1, sector=sector)
+    cold = [lanczos(network.get_operator(U, 1, sector), seed=0)[2]
+            for U in interactions[1:]]
+    assert sum(result['matvecs'] for result in sweep[1:]) \
+        < sum(info['matvecs'] for info in cold) / 2